@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'capstone.settings')
+os.environ.setdefault('CAPSTONE_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.PRELOAD_ON_STARTUP:
+    from .startup import warm_up
+    warm_up()
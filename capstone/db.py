@@ -0,0 +1,58 @@
+"""SQLite connection tuning and read routing for the production profile.
+
+apply_sqlite_pragmas runs settings.SQLITE_PRAGMAS on every new SQLite
+connection (WebsiteConfig.ready() connects it). Connections whose
+DATABASES entry has READ_ONLY set skip journal_mode, which a read-only
+connection cannot change, and are switched to query_only.
+
+ReadReplicaRouter sends reads to the 'replica' alias, a read-only
+connection to the same database file, unless the default connection is
+inside a transaction, where reads must see its uncommitted writes.
+"""
+from django.conf import settings
+from django.db import connections
+
+REPLICA = 'replica'
+
+"""Pragmas used by capstone.settings_production. WAL lets readers run
+alongside a writer, and a writer that finds the database busy waits
+(busy_timeout) instead of failing with "database is locked"."""
+PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Durable at every checkpoint rather than every commit; safe with WAL.
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    # Negative sizes are KiB: 64 MiB of page cache per connection.
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    read_only = connection.settings_dict.get('READ_ONLY', False)
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            if read_only and pragma == 'journal_mode':
+                continue
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if REPLICA not in settings.DATABASES or connections['default'].in_atomic_block:
+            return 'default'
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
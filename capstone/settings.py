@@ -7,6 +7,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,16 +44,24 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'website.staticfiles.StaticFilesMiddleware',
+    'website.profiling.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'planner.audit.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'capstone.urls'
+# capstone.asgi sets CAPSTONE_ASYNC_VIEWS=1 so the read-only pages are served
+# by async views; WSGI and runserver keep the sync ones.
+if os.environ.get('CAPSTONE_ASYNC_VIEWS') == '1':
+    ROOT_URLCONF = 'capstone.urls_async'
+else:
+    ROOT_URLCONF = 'capstone.urls'
 
 TEMPLATES = [
     {
@@ -65,6 +74,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'planner.context_processors.roles',
             ],
         },
     },
@@ -83,6 +93,36 @@ DATABASES = {
     }
 }
 
+# PRAGMA name -> value run on every new SQLite connection (see capstone.db).
+# Empty in development; capstone.settings_production turns on WAL and friends.
+SQLITE_PRAGMAS = {}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Local memory by default. Set CAPSTONE_CACHE=file to share one file-based
+# cache between worker processes.
+
+if os.environ.get('CAPSTONE_CACHE') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'capstone',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Rendered pages and fragments are kept for at most this many seconds; any
+# change to the data they show expires them sooner.
+PLANNER_CACHE_TIMEOUT = 600
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -120,7 +160,95 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# collectstatic copies the files here. With SERVE_STATIC on,
+# website.staticfiles.StaticFilesMiddleware serves them (capstone.settings_production);
+# in development runserver serves the app directories directly.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+SERVE_STATIC = False
+
+# Widths of the resized copies PipelineStaticFilesStorage makes of images.
+STATIC_IMAGE_WIDTHS = [640, 1280]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Welcome dashboard
+# Each box on the welcome page is paged by id cursor. Set DASHBOARD_PAGINATED
+# to False to render every row as before (only sensible on tiny databases).
+
+DASHBOARD_PAGINATED = True
+
+DASHBOARD_PAGE_SIZES = {
+    'member': 25,
+    'team': 25,
+    'manager': 25,
+    'location': 25,
+}
+
+# Upper bound for page sizes requested through the query string.
+MAX_PAGE_SIZE = 200
+
+# Box totals are counted at most once per this many seconds.
+DASHBOARD_COUNT_CACHE_TIMEOUT = 300
+
+
+# Role checks
+# Group names per user are cached for this many seconds; membership changes
+# invalidate the entry immediately, in every process when the cache is shared
+# (capstone.settings_production).
+
+ROLE_CACHE_TIMEOUT = 600
+
+
+# Authentication
+# With planner.auth.CachedAuthenticationMiddleware in place of Django's
+# AuthenticationMiddleware (capstone.settings_production), each process keeps
+# up to USER_CACHE_SIZE logged-in users for USER_CACHE_TIMEOUT seconds.
+
+USER_CACHE_TIMEOUT = 60
+
+USER_CACHE_SIZE = 1000
+
+
+# Analytics
+# The headcount report and hires per month are cached under versions that
+# change with the data (planner.analytics); this only bounds how long an
+# unused entry stays in the cache.
+
+ANALYTICS_CACHE_TIMEOUT = 3600
+
+
+# Background jobs
+# Cascading deletes of locations and managers, and imports larger than
+# IMPORT_INLINE_MAX_BYTES, are queued as planner.jobs and run by
+# `manage.py run_jobs`. With BACKGROUND_JOBS off they run inside the request.
+
+BACKGROUND_JOBS = True
+
+JOB_CHUNK_SIZE = 1000
+
+JOB_FILES_DIR = BASE_DIR / 'jobs'
+
+IMPORT_INLINE_MAX_BYTES = 1024 * 1024
+
+
+# Request profiling
+# website.profiling.RequestProfilingMiddleware records wall time and SQL per
+# view and adds a Server-Timing header; see the profiling/ report. Each view
+# keeps its last PROFILING_WINDOW samples for percentiles.
+
+REQUEST_PROFILING = True
+
+PROFILING_WINDOW = 1000
+
+
+# Startup
+# Set PRELOAD_ON_STARTUP to import every view and compile every template when
+# the WSGI/ASGI application is created (see capstone.startup) rather than on
+# the first requests.
+
+PRELOAD_ON_STARTUP = False
\ No newline at end of file
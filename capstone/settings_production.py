@@ -0,0 +1,171 @@
+"""
+Production settings for capstone.
+Use with DJANGO_SETTINGS_MODULE=capstone.settings_production. Everything not
+set here comes from capstone.settings.
+
+Environment:
+    CAPSTONE_SECRET_KEY      secret key (required)
+    CAPSTONE_ALLOWED_HOSTS   comma-separated host names
+    CAPSTONE_DB_PATH         SQLite database file, default BASE_DIR / db.sqlite3
+    CAPSTONE_READ_REPLICA    set to 1 to send reads to a read-only connection
+    CAPSTONE_ADMIN           set to 1 to keep the admin (and the messages it needs)
+    CAPSTONE_PRELOAD         set to 1 to warm up when the application is loaded,
+                             e.g. in the master of gunicorn --preload
+    CAPSTONE_SESSIONS        cached_db (default; db with CAPSTONE_CACHE=locmem),
+                             db or signed_cookies
+    CAPSTONE_CACHE           file (default), shared by every worker on the host,
+                             or locmem, only with CAPSTONE_SINGLE_PROCESS=1
+    CAPSTONE_CACHE_DIR       directory of the file cache, default BASE_DIR / cache
+    CAPSTONE_SINGLE_PROCESS  set to 1 when the server runs a single process
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, INSTALLED_APPS, MIDDLEWARE, TEMPLATES
+from .db import PRODUCTION_PRAGMAS
+
+DEBUG = False
+
+SECRET_KEY = os.environ['CAPSTONE_SECRET_KEY']
+
+ALLOWED_HOSTS = [host for host in os.environ.get('CAPSTONE_ALLOWED_HOSTS', 'localhost').split(',') if host]
+
+
+# Database
+# SQLite in WAL mode: readers no longer block on a writer, and a writer that
+# finds the database busy waits (busy_timeout) instead of failing with
+# "database is locked". Connections are kept for CONN_MAX_AGE seconds and
+# checked before reuse.
+
+DB_PATH = os.environ.get('CAPSTONE_DB_PATH', str(BASE_DIR / 'db.sqlite3'))
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DB_PATH,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+        },
+    },
+}
+
+if os.environ.get('CAPSTONE_READ_REPLICA') == '1':
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{DB_PATH}?mode=ro",
+        'READ_ONLY': True,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['capstone.db.ReadReplicaRouter']
+
+SQLITE_PRAGMAS = PRODUCTION_PRAGMAS
+
+
+# Cache
+# Role sets, sessions, the version numbers behind cached pages and API ETags,
+# and the org chart version are all kept in the default cache, and a change
+# made by one worker reaches the others only through it. So the cache must be
+# shared by every worker process: a file-based cache in CAPSTONE_CACHE_DIR
+# serves all the workers on this host, which is every worker SQLite allows.
+# A per-process cache is refused unless the server runs one process.
+
+CACHE_BACKEND = os.environ.get('CAPSTONE_CACHE', 'file')
+
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CAPSTONE_CACHE_DIR', str(BASE_DIR / 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+elif CACHE_BACKEND != 'locmem':
+    raise ImproperlyConfigured(f"Unknown CAPSTONE_CACHE {CACHE_BACKEND!r}: use file or locmem.")
+elif os.environ.get('CAPSTONE_SINGLE_PROCESS') != '1':
+    raise ImproperlyConfigured(
+        "CAPSTONE_CACHE=locmem keeps a separate cache in each worker process, so workers would "
+        "keep revoked roles and sessions and serve stale pages. Use CAPSTONE_CACHE=file, or set "
+        "CAPSTONE_SINGLE_PROCESS=1 if the server runs a single process.")
+
+
+# Lean profile
+# Workers only load what the site serves. The messages framework is unused
+# outside the admin, and the admin is left out unless CAPSTONE_ADMIN=1.
+# Templates are compiled once per process by the cached loader, and the
+# debug context processor is dropped. `manage.py measure_startup` compares
+# the cold start and memory of this profile with the development one.
+
+ADMIN_ENABLED = os.environ.get('CAPSTONE_ADMIN') == '1'
+
+if not ADMIN_ENABLED:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS
+                      if app not in ('django.contrib.admin', 'django.contrib.messages')]
+    MIDDLEWARE = [middleware for middleware in MIDDLEWARE
+                  if middleware != 'django.contrib.messages.middleware.MessageMiddleware']
+
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        'context_processors': [
+            processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+            if processor != 'django.template.context_processors.debug'
+            and (ADMIN_ENABLED or processor != 'django.contrib.messages.context_processors.messages')
+        ],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+PRELOAD_ON_STARTUP = os.environ.get('CAPSTONE_PRELOAD') == '1'
+
+
+# Static files
+# `manage.py collectstatic` writes hashed, pre-compressed and resized copies
+# (see website.staticfiles) to STATIC_ROOT, which the application then serves
+# with year-long cache headers.
+
+STATICFILES_STORAGE = 'website.staticfiles.PipelineStaticFilesStorage'
+
+SERVE_STATIC = True
+
+
+# Sessions and authentication
+# Sessions are read from the shared cache and only fall back to the database
+# on a miss (cached_db), so logging out in one worker ends the session in all
+# of them. With a per-process cache the default is plain database sessions
+# instead, so a session never outlives its logout in another process's cache.
+# With CAPSTONE_SESSIONS=signed_cookies sessions live entirely in a signed
+# cookie: no session storage at all, but a session cannot be revoked on the
+# server before it expires, other than by changing the password. Logged-in
+# users are kept per process (planner.auth), but only for sessions that still
+# name them. `manage.py benchmark_auth` measures what each combination costs
+# a request.
+
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'db': 'django.contrib.sessions.backends.db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+SESSIONS = os.environ.get('CAPSTONE_SESSIONS', 'cached_db' if CACHE_BACKEND == 'file' else 'db')
+
+if SESSIONS not in SESSION_ENGINES:
+    raise ImproperlyConfigured(f"Unknown CAPSTONE_SESSIONS {SESSIONS!r}: use {', '.join(SESSION_ENGINES)}.")
+
+SESSION_ENGINE = SESSION_ENGINES[SESSIONS]
+
+MIDDLEWARE = ['planner.auth.CachedAuthenticationMiddleware'
+              if middleware == 'django.contrib.auth.middleware.AuthenticationMiddleware' else middleware
+              for middleware in MIDDLEWARE]
@@ -0,0 +1,43 @@
+"""
+Work done once per server process before it takes requests.
+
+capstone.wsgi and capstone.asgi call warm_up() when settings.PRELOAD_ON_STARTUP
+is on. Under a pre-forking server that loads the application before forking
+(gunicorn --preload), the imported views, compiled templates and built forms
+are then shared copy-on-write by every worker instead of being rebuilt, and
+paid for on a first request, in each of them.
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.template import engines
+from django.urls import get_resolver
+
+from planner.forms import MODEL_FORM_OPTIONS, model_form
+
+
+def project_template_names(engine):
+    """Names of the .html templates under this project's template directories."""
+    base_dir = Path(settings.BASE_DIR).resolve()
+    names = set()
+    for loader in engine.template_loaders:
+        for inner in getattr(loader, 'loaders', [loader]):
+            for directory in inner.get_dirs():
+                directory = Path(directory).resolve()
+                if base_dir in directory.parents:
+                    names.update(str(path.relative_to(directory)) for path in directory.rglob('*.html'))
+    return sorted(names)
+
+
+def warm_up():
+    """Load the URLconf (importing every view), compile the project's templates
+    into the cached loader and build the model forms."""
+    get_resolver().url_patterns
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue
+        for name in project_template_names(engine):
+            engine.get_template(name)
+    for model in MODEL_FORM_OPTIONS:
+        model_form(model)
@@ -12,18 +12,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path
-from website.views import welcome, date, about
+from website.views import welcome, date, about, profiling_report
 from planner.views import manager_detail, team_detail, location_detail, manager_list, location_list, member_detail
 from planner.views import new_member, update_member, delete_member, new_location, update_location, delete_location
 from planner.views import new_manager, update_manager, delete_manager, new_team, update_team, delete_team
 from planner.views import create_member, create_admin, login_view, logout_view, admin_group
-from planner.views import user_group, access_denied
+from planner.views import user_group, access_denied, org_chart, manager_org_chart, import_data, export_data
+from planner.views import search_view, lookup_view, cache_stats, bulk_members, bulk_members_api, analytics_view
+from planner.views import job_list, job_detail, history, schedule_members, snapshot_list, snapshot_diff
+from planner.api import api_list, api_detail
 
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('', welcome, name="welcome"),
     path('date', date),
     path('about', about),
@@ -49,8 +51,32 @@ urlpatterns = [
     path('create-admin/', create_admin, name='create_admin'),
     path('login/login.html', login_view, name='login'),
     path('login/access_denied.html', access_denied, name="access_denied"),
-    path('login/login.html', login_view, name='login'),
     path('logout/', logout_view, name='logout'),
     path('admin_group/', admin_group, name='admin_group'),
     path('user_group/', user_group, name='user_group'),
-]
\ No newline at end of file
+    path('org-chart/', org_chart, name='org_chart'),
+    path('org-chart/manager/<int:id>/', manager_org_chart, name='manager_org_chart'),
+    path('import/', import_data, name='import_data'),
+    path('export/<str:model>/', export_data, name='export_data'),
+    path('search/', search_view, name='search'),
+    path('lookup/<str:kind>/', lookup_view, name='lookup'),
+    path('cache-stats/', cache_stats, name='cache_stats'),
+    path('profiling/', profiling_report, name='profiling_report'),
+    path('bulk/members/', bulk_members, name='bulk_members'),
+    path('api/members/bulk/', bulk_members_api, name='bulk_members_api'),
+    path('schedule/members/', schedule_members, name='schedule_members'),
+    path('analytics/', analytics_view, name='analytics'),
+    path('jobs/', job_list, name='job_list'),
+    path('jobs/<int:id>/', job_detail, name='job_detail'),
+    path('snapshots/', snapshot_list, name='snapshots'),
+    path('snapshots/diff/', snapshot_diff, name='snapshot_diff'),
+    path('history/<str:model>/<int:id>/', history, name='history'),
+    path('api/<str:resource>/', api_list, name='api_list'),
+    path('api/<str:resource>/<int:id>/', api_detail, name='api_detail'),
+]
+
+# The lean production profile leaves the admin out unless CAPSTONE_ADMIN=1;
+# only import it when it is installed.
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
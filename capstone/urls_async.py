@@ -0,0 +1,27 @@
+"""capstone URL Configuration for ASGI.
+The same routes as capstone.urls, with the read-only pages served by the
+async views in website.async_views and planner.async_views. Selected by
+ROOT_URLCONF when CAPSTONE_ASYNC_VIEWS=1, which capstone.asgi sets.
+"""
+from django.urls import path
+from website import async_views as website_views
+from planner import async_views as planner_views
+from .urls import urlpatterns as sync_urlpatterns
+
+
+"""URL name -> async view replacing the sync one."""
+ASYNC_VIEWS = {
+    'welcome': website_views.welcome,
+    'manager_detail': planner_views.manager_detail,
+    'member': planner_views.member_detail,
+    'team': planner_views.team_detail,
+    'location_detail': planner_views.location_detail,
+    'manager': planner_views.manager_list,
+    'location': planner_views.location_list,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+    if getattr(pattern, 'name', None) in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]
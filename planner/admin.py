@@ -1,9 +1,210 @@
+"""ModelAdmins for the planner models, built for tables of 100k+ rows.
+
+- Foreign key columns are joined into the changelist query
+  (list_select_related) and child counts are the ones planner.counters
+  keeps, so a page of any size is one query.
+- Searching goes through the planner.search index, and so do the
+  autocomplete widgets used for every foreign key and for groups: no change
+  form lists a whole table.
+- A changelist's total is counted once per change to its table
+  (versioned_count) and the unfiltered total is not counted separately.
+- "Delete selected" is set-based: members and teams go with a few DELETE
+  statements (planner.bulk) without being loaded, and locations and
+  managers, which cascade widely, are queued as the same background jobs
+  the site uses (planner.jobs). The confirmation page counts what will go
+  instead of listing it. Deletes are recorded in the audit log, not as
+  admin LogEntries per row.
+"""
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.contrib.auth import get_permission_codename
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import QuerySet
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
+from django.utils.text import capfirst
 
+from planner import bulk, jobs, search
 from planner.models import Manager, Location, Member, Team
+from planner.pagination import versioned_count
+from planner.signals import rows_changed
+
+"""How many of the objects being deleted the confirmation page names."""
+DELETE_SHOWN = 20
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator whose count is cached until the table changes."""
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            return versioned_count(self.object_list)
+        return len(self.object_list)
+
+
+def plain(queryset):
+    """``queryset`` without the joins and ordering the changelist adds, for
+    UPDATE and DELETE statements."""
+    return queryset.select_related(None).order_by()
+
+
+def deletion_summary(request, objs, related):
+    """get_deleted_objects() without loading what is deleted: the first few
+    of ``objs`` by name, and a count per model of ``objs`` and of the
+    querysets in ``related`` that are deleted with them."""
+    if isinstance(objs, QuerySet):
+        model, count, shown = objs.model, objs.count(), list(objs[:DELETE_SHOWN])
+    else:
+        model, count, shown = type(objs[0]), len(objs), list(objs[:DELETE_SHOWN])
+    to_delete = [f"{capfirst(model._meta.verbose_name)}: {obj}" for obj in shown]
+    if count > len(shown):
+        to_delete.append(f"and {count - len(shown)} more")
+    model_count = {model._meta.verbose_name_plural: count}
+    perms_needed = set()
+    for queryset in related:
+        opts = queryset.model._meta
+        model_count[opts.verbose_name_plural] = model_count.get(opts.verbose_name_plural, 0) + queryset.count()
+        if not request.user.has_perm(f"{opts.app_label}.{get_permission_codename('delete', opts)}"):
+            perms_needed.add(opts.verbose_name)
+    model_count = {name: total for name, total in model_count.items() if total}
+    return to_delete, model_count, perms_needed, []
+
+
+class PlannerAdmin(admin.ModelAdmin):
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+    list_per_page = 100
+    search_fields = ['name']
+    ordering = ['-pk']
+    actions = ['delete_selected']
+
+    def get_search_results(self, request, queryset, search_term):
+        if search.enabled() and search.match_expression(search_term):
+            kind = search.KIND_BY_MODEL[self.model]
+            return queryset.filter(pk__in=search.matching_ids(search_term, kind)), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def related_deletions(self, objs):
+        """Querysets of the rows deleting ``objs`` also removes."""
+        return []
+
+    def get_deleted_objects(self, objs, request):
+        return deletion_summary(request, objs, self.related_deletions(objs))
+
+    def delete_queryset(self, request, queryset):
+        """Delete the rows related_deletions() names, then ``queryset``, with
+        planner.bulk in one transaction; return a message for the user."""
+        queryset = plain(queryset)
+        deleted = []
+        with transaction.atomic():
+            for related in self.related_deletions(queryset):
+                deleted.append((related.model, bulk.delete_rows(related)))
+            deleted.insert(0, (self.model, bulk.delete_rows(queryset)))
+            for model, count in deleted:
+                if count:
+                    rows_changed.send(sender=model)
+        counts = [f"{count} {model._meta.verbose_name_plural}" for model, count in deleted]
+        return f"Deleted {' and '.join(counts)}."
+
+    @admin.action(permissions=['delete'], description="Delete selected %(verbose_name_plural)s")
+    def delete_selected(self, request, queryset):
+        deletable_objects, model_count, perms_needed, protected = self.get_deleted_objects(queryset, request)
+        if request.POST.get('post') and not perms_needed:
+            self.message_user(request, self.delete_queryset(request, queryset))
+            return None
+        opts = self.model._meta
+        return TemplateResponse(request, 'admin/planner/delete_selected_confirmation.html', {
+            **self.admin_site.each_context(request),
+            'title': "Are you sure?",
+            'subtitle': None,
+            'objects_name': opts.verbose_name_plural,
+            'deletable_objects': [deletable_objects],
+            'model_count': model_count.items(),
+            'perms_lacking': perms_needed,
+            'protected': protected,
+            'opts': opts,
+            'media': self.media,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across') == '1',
+        })
+
+
+class CascadeJobAdmin(PlannerAdmin):
+    """Deletes rows that cascade widely with background jobs, one per row.
+    Subclasses set ``job_kind``, the planner.jobs handler, ``id_param``, the
+    handler's argument for the row's id, and ``cascade``, the function giving
+    the delete_cascade() steps for deleting some rows."""
+    job_kind = None
+    id_param = None
+    cascade = None
+
+    def queue_delete(self, request, obj):
+        return jobs.enqueue(self.job_kind, f"Delete {self.model._meta.verbose_name} {obj.name}", request.user,
+                            **{self.id_param: obj.pk})
+
+    def related_deletions(self, objs):
+        return [queryset for _, queryset in self.cascade(plain(objs) if isinstance(objs, QuerySet) else objs)]
+
+    def delete_model(self, request, obj):
+        request.planner_job = self.queue_delete(request, obj)
+
+    def response_delete(self, request, obj_display, obj_id):
+        self.message_user(request, f"Deleting {obj_display} in the background.")
+        return redirect('job_detail', id=request.planner_job.pk)
+
+    def delete_queryset(self, request, queryset):
+        queued = [self.queue_delete(request, obj) for obj in plain(queryset).only('pk', 'name')]
+        return f"Deleting {len(queued)} {self.model._meta.verbose_name_plural} in the background."
+
+
+@admin.register(Location)
+class LocationAdmin(CascadeJobAdmin):
+    list_display = ['name', 'member_count', 'team_count', 'manager_count']
+    job_kind = 'delete_location'
+    id_param = 'location_id'
+    cascade = staticmethod(jobs.location_cascade)
+
+
+@admin.register(Manager)
+class ManagerAdmin(CascadeJobAdmin):
+    list_display = ['name', 'role', 'location', 'member_count', 'team_count', 'span_limit']
+    list_select_related = ['location']
+    list_filter = ['location']
+    autocomplete_fields = ['location', 'groups']
+    job_kind = 'delete_manager'
+    id_param = 'manager_id'
+    cascade = staticmethod(jobs.manager_cascade)
+
+
+@admin.register(Team)
+class TeamAdmin(PlannerAdmin):
+    list_display = ['name', 'location', 'manager', 'member_count', 'target_size']
+    list_select_related = ['location', 'manager']
+    list_filter = ['location', ('manager', admin.EmptyFieldListFilter)]
+    autocomplete_fields = ['location', 'manager']
+
+    def related_deletions(self, objs):
+        return [Member.objects.filter(team__in=plain(objs) if isinstance(objs, QuerySet) else objs)]
+
+
+@admin.register(Member)
+class MemberAdmin(PlannerAdmin):
+    list_display = ['name', 'role', 'location', 'team', 'manager', 'start_date']
+    list_select_related = ['location', 'team', 'manager']
+    list_filter = ['location', ('team', admin.EmptyFieldListFilter), ('manager', admin.EmptyFieldListFilter)]
+    autocomplete_fields = ['location', 'team', 'manager', 'groups']
+    actions = ['delete_selected', 'clear_team', 'clear_manager']
 
+    @admin.action(permissions=['change'], description="Take selected members off their team")
+    def clear_team(self, request, queryset):
+        changed = bulk.reassign_members(plain(queryset), {'team': None})
+        self.message_user(request, f"Took {changed} members off their team.")
 
-admin.site.register(Manager)
-admin.site.register(Location)
-admin.site.register(Member)
-admin.site.register(Team)
+    @admin.action(permissions=['change'], description="Take selected members off their manager")
+    def clear_manager(self, request, queryset):
+        changed = bulk.reassign_members(plain(queryset), {'manager': None})
+        self.message_user(request, f"Took {changed} members off their manager.")
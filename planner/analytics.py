@@ -0,0 +1,102 @@
+"""Headcount analytics: members per team, location and manager, and hires
+per month of start_date.
+
+Headcounts per team, location and manager are the member_count columns
+planner.counters keeps in the database, updated in the transaction of every
+change, so they are read together with the names, one query per table, and
+never drift. The members with no team or manager are the rest of the total.
+Hires per month need a GROUP BY over the member table, so they are cached
+under a version that is bumped when a member is created or deleted, changes
+start_date, or is written in bulk.
+
+The whole report is cached under the planner.cache versions of the team,
+location and manager tables (which the counters bump whenever they move)
+and the hires version. Every version is a new key rather than a change to
+a cached value, so workers sharing the cache cannot lose each other's
+updates, and a report computed while something changed is stored under
+versions nobody reads again.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+from .cache import current_versions, model_key
+from .models import Manager, Member, Team, Location
+
+HIRES_VERSION_KEY = 'planner:analytics:hires:version'
+
+"""Member foreign key -> the model its headcount is reported against."""
+DIMENSIONS = {'team': Team, 'location': Location, 'manager': Manager}
+
+
+def month_key(start_date):
+    start_date = Member._meta.get_field('start_date').to_python(start_date)
+    return start_date.strftime('%Y-%m') if start_date else None
+
+
+def compute_hires():
+    """{'YYYY-MM': members who started that month}, straight from the database."""
+    months = (Member.objects.order_by().annotate(month=TruncMonth('start_date'))
+              .values('month').annotate(hires=Count('id')))
+    return {month_key(row['month']): row['hires'] for row in months}
+
+
+def get_hires():
+    version, = current_versions([HIRES_VERSION_KEY])
+    key = f"planner:analytics:hires:{version}"
+    hires = cache.get(key)
+    if hires is None:
+        hires = compute_hires()
+        cache.set(key, hires, settings.ANALYTICS_CACHE_TIMEOUT)
+    return hires
+
+
+def hires_changed():
+    cache.set(HIRES_VERSION_KEY, time.time_ns(), None)
+
+
+def hires_moved(member, created):
+    """True if saving ``member`` (from its post_save receiver) changed the
+    hires per month."""
+    return created or ('start_date' in member.__dict__ and
+                       month_key(member._loaded_values.get('start_date')) != month_key(member.start_date))
+
+
+def _rows(model, total=None):
+    """Headcount rows for ``model``, plus the members not assigned to any
+    row if ``total`` is given."""
+    rows = [{"id": pk, "name": name, "headcount": headcount}
+            for pk, name, headcount in model.objects.values_list('id', 'name', 'member_count')]
+    unassigned = 0 if total is None else total - sum(row["headcount"] for row in rows)
+    if unassigned:
+        rows.append({"id": None, "name": "Unassigned", "headcount": unassigned})
+    rows.sort(key=lambda row: (-row["headcount"], row["name"]))
+    return rows
+
+
+def compute_report():
+    # Every member has a location.
+    locations = _rows(Location)
+    total = sum(row["headcount"] for row in locations)
+    return {
+        "total": total,
+        "team": _rows(Team, total),
+        "location": locations,
+        "manager": _rows(Manager, total),
+        "month": [{"month": month, "hires": hires}
+                  for month, hires in sorted(get_hires().items(), key=lambda item: item[0] or '') if hires],
+    }
+
+
+def report():
+    """Headcount per team, location and manager (largest first) and hires per month."""
+    versions = current_versions([model_key(model) for model in DIMENSIONS.values()] + [HIRES_VERSION_KEY])
+    key = "planner:analytics:report:" + ".".join(str(version) for version in versions)
+    result = cache.get(key)
+    if result is None:
+        result = compute_report()
+        cache.set(key, result, settings.ANALYTICS_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,250 @@
+"""JSON API over locations, teams, managers and members.
+
+    GET    /api/<resource>/            list, by id: ?after=<id>&size=<n>&fields=a,b
+    POST   /api/<resource>/            create
+    GET    /api/<resource>/<id>/       one row: ?fields=a,b
+    PUT    /api/<resource>/<id>/       replace
+    PATCH  /api/<resource>/<id>/       update the given fields
+    DELETE /api/<resource>/<id>/       delete (locations, managers: 202 and a job)
+
+Rows are read with values() restricted to the requested fields, so only
+those columns are loaded; foreign keys are given as ids. Lists are paged
+by id cursor, like the dashboard boxes, so no page needs an OFFSET. GET responses carry an ETag.
+A list's is built from the planner.cache version counters (kept in the cache
+every worker shares), so a matching If-None-Match is answered with 304
+before any row is read. A row's is a hash of the row's current values, read
+with one primary key lookup, so every worker computes the same tag, and
+writes honour If-Match against what is in the database, not what some
+process last heard about it. Writes are validated with the same ModelForms
+as the HTML views. Deleting a location or manager cascades to its teams and
+members, so, as in the HTML views and the admin, the delete is queued as a
+background job and answered with 202 and the job's URL.
+"""
+import hashlib
+import json
+
+from django.forms.models import model_to_dict
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_http_methods
+
+from . import cache, jobs
+from .forms import model_form
+from .models import Manager, Member, Team, Location
+from .pagination import parse_cursor, clamp_page_size
+from .roles import has_role, ADMIN
+
+
+class Resource:
+    """How one model is exposed. A role of None means any logged-in user.
+    delete_job, if set, is the (job kind, id parameter) that deletes a row."""
+
+    def __init__(self, model, fields, read_role=None, write_role=None, delete_job=None):
+        self.model = model
+        self.fields = fields
+        self.read_role = read_role
+        self.write_role = write_role
+        self.delete_job = delete_job
+
+    @property
+    def form(self):
+        return model_form(self.model)
+
+    def column(self, field):
+        """Database column behind an API field: foreign keys are read as ids."""
+        model_field = self.model._meta.get_field(field)
+        return model_field.attname if model_field.is_relation else field
+
+    def allowed(self, user, write=False):
+        role = self.write_role if write else self.read_role
+        if not user.is_authenticated:
+            return False
+        return role is None or has_role(user, role)
+
+
+RESOURCES = {
+    'locations': Resource(Location, ['id', 'name', 'member_count', 'team_count', 'manager_count'],
+                          read_role=ADMIN, write_role=ADMIN, delete_job=('delete_location', 'location_id')),
+    'teams': Resource(Team, ['id', 'name', 'location', 'manager', 'target_size', 'member_count']),
+    'managers': Resource(Manager,
+                         ['id', 'name', 'role', 'location', 'start_date', 'span_limit', 'member_count',
+                          'team_count'],
+                         write_role=ADMIN, delete_job=('delete_manager', 'manager_id')),
+    'members': Resource(Member, ['id', 'name', 'role', 'location', 'start_date', 'team', 'manager']),
+}
+
+"""Default number of rows in a list response."""
+API_PAGE_SIZE = 50
+
+
+def error(message, status, **extra):
+    return JsonResponse({"error": message, **extra}, status=status)
+
+
+def selected_fields(request, resource):
+    """Return (fields, error message) for the ``fields`` query parameter.
+    The id is always included, as cursors and links need it."""
+    requested = request.GET.get("fields")
+    if not requested:
+        return resource.fields, None
+    fields = [field.strip() for field in requested.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in resource.fields]
+    if unknown:
+        return None, f"Unknown fields: {', '.join(unknown)}."
+    return ['id'] + [field for field in fields if field != 'id'], None
+
+
+def read_rows(queryset, resource, fields):
+    columns = [resource.column(field) for field in fields]
+    return [dict(zip(fields, row)) for row in queryset.values_list(*columns)]
+
+
+def etag(representation, *version_keys):
+    """ETag for ``representation`` (a string naming what the body contains)
+    as of the current versions of ``version_keys``. No database access."""
+    versions = cache.current_versions(list(version_keys))
+    digest = hashlib.md5(f"{representation}:{versions}".encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def row_etag(representation, row):
+    """ETag for ``representation`` of one row, from the row's values as read
+    by read_rows()."""
+    digest = hashlib.md5(f"{representation}:{row!r}".encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def not_modified(request, tag):
+    return tag in parse_etags(request.headers.get("If-None-Match", ""))
+
+
+def precondition_failed(request, tag):
+    expected = request.headers.get("If-Match")
+    return expected is not None and expected.strip() != "*" and tag not in parse_etags(expected)
+
+
+def request_data(request):
+    """Return the JSON object in the request body, or None."""
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def form_data(instance, data):
+    """Current values of ``instance`` overlaid with ``data``, as form input."""
+    initial = model_to_dict(instance)
+    for name, value in initial.items():
+        if isinstance(value, list):
+            initial[name] = [getattr(item, 'pk', item) for item in value]
+    initial.update(data)
+    return initial
+
+
+def row_response(resource, pk, status=200):
+    row = read_rows(resource.model.objects.filter(pk=pk), resource, resource.fields)[0]
+    return JsonResponse(row, status=status)
+
+
+@require_http_methods(["GET", "POST"])
+def api_list(request, resource):
+    spec = RESOURCES.get(resource)
+    if spec is None:
+        return error("Unknown resource.", 404)
+    if not spec.allowed(request.user, write=request.method == "POST"):
+        return error("Not allowed.", 403 if request.user.is_authenticated else 401)
+
+    if request.method == "POST":
+        data = request_data(request)
+        if data is None:
+            return error("Body must be a JSON object.", 400)
+        form = spec.form(data)
+        if not form.is_valid():
+            return error("Invalid data.", 400, errors=form.errors.get_json_data())
+        instance = form.save()
+        response = row_response(spec, instance.pk, status=201)
+        response["Location"] = f"{request.path}{instance.pk}/"
+        return response
+
+    fields, message = selected_fields(request, spec)
+    if message:
+        return error(message, 400)
+    tag = etag(f"{request.path}?{request.GET.urlencode()}:{fields}", cache.model_key(spec.model))
+    if not_modified(request, tag):
+        return HttpResponseNotModified(headers={"ETag": tag})
+
+    size = clamp_page_size(request.GET.get("size"), API_PAGE_SIZE)
+    after = parse_cursor(request.GET.get("after"))
+    queryset = spec.model.objects.order_by('pk')
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    rows = read_rows(queryset[:size + 1], spec, fields)
+    next_cursor = rows[size - 1]['id'] if len(rows) > size else None
+    params = request.GET.copy()
+    params["after"] = next_cursor
+    response = JsonResponse({
+        "results": rows[:size],
+        "next_cursor": next_cursor,
+        "next": f"{request.path}?{params.urlencode()}" if next_cursor else None,
+    })
+    response["ETag"] = tag
+    return response
+
+
+def queue_delete(request, spec, instance):
+    """Queue the job that deletes ``instance`` and its dependants."""
+    kind, parameter = spec.delete_job
+    job = jobs.enqueue(kind, f"Delete {spec.model._meta.verbose_name} {instance.name}", request.user,
+                       **{parameter: instance.pk})
+    url = reverse('job_detail', args=[job.pk])
+    response = JsonResponse({"job": job.pk, "status": job.status, "url": f"{url}?format=json"}, status=202)
+    response["Location"] = url
+    return response
+
+
+@require_http_methods(["GET", "PUT", "PATCH", "DELETE"])
+def api_detail(request, resource, id):
+    spec = RESOURCES.get(resource)
+    if spec is None:
+        return error("Unknown resource.", 404)
+    write = request.method != "GET"
+    if not spec.allowed(request.user, write=write):
+        return error("Not allowed.", 403 if request.user.is_authenticated else 401)
+
+    if not write:
+        fields, message = selected_fields(request, spec)
+        if message:
+            return error(message, 400)
+        rows = read_rows(spec.model.objects.filter(pk=id), spec, fields)
+        if not rows:
+            return error(f"No {spec.model._meta.verbose_name} matches the given query.", 404)
+        tag = row_etag(f"{request.path}:{fields}", rows[0])
+        if not_modified(request, tag):
+            return HttpResponseNotModified(headers={"ETag": tag})
+        response = JsonResponse(rows[0])
+        response["ETag"] = tag
+        return response
+
+    rows = read_rows(spec.model.objects.filter(pk=id), spec, spec.fields)
+    if not rows:
+        return error(f"No {spec.model._meta.verbose_name} matches the given query.", 404)
+    # If-Match is compared with the ETag of the full representation.
+    if precondition_failed(request, row_etag(f"{request.path}:{spec.fields}", rows[0])):
+        return error("The resource has changed.", 412)
+    instance = spec.model.objects.get(pk=id)
+
+    if request.method == "DELETE":
+        if spec.delete_job:
+            return queue_delete(request, spec, instance)
+        instance.delete()
+        return HttpResponse(status=204)
+    data = request_data(request)
+    if data is None:
+        return error("Body must be a JSON object.", 400)
+    form = spec.form(form_data(instance, data) if request.method == "PATCH" else data, instance=instance)
+    if not form.is_valid():
+        return error("Invalid data.", 400, errors=form.errors.get_json_data())
+    form.save()
+    return row_response(spec, instance.pk)
@@ -0,0 +1,59 @@
+"""Async versions of the read-only planner views, routed by capstone.urls_async
+when the project is served through ASGI. Each view loads everything its
+template prints with the async ORM before rendering, so rendering never
+queries from the event loop. Templates that read the cache while rendering
+(the versioned_cache tag) are rendered in a worker thread with arender()."""
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import render
+from .models import Manager, Member, Team, Location
+from .roles import async_login_required, async_admin_required
+from .cache import cache_response
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+
+
+arender = sync_to_async(render)
+
+
+@async_login_required
+async def manager_detail(request, id):
+    manager = await aget_object_or_404(Manager.objects.for_detail(), pk=id)
+    return render(request, "manager/manager.html", {"manager": manager})
+
+
+@async_login_required
+async def member_detail(request, id):
+    member = await aget_object_or_404(Member.objects.for_detail(), pk=id)
+    return render(request, "member/member.html", {"member": member})
+
+
+@async_login_required
+async def team_detail(request, id):
+    team = await aget_object_or_404(Team.objects.for_detail(), pk=id)
+    return await arender(request, "team/team.html", {"team": team})
+
+
+@async_admin_required
+async def location_detail(request, id):
+    location = await aget_object_or_404(Location.objects.all(), pk=id)
+    return render(request, "location/location.html", {"location": location})
+
+
+@async_login_required
+@cache_response(Manager, Location)
+async def manager_list(request):
+    managers = [manager async for manager in Manager.objects.for_list()]
+    return render(request, "manager/manager_list.html", {"manager": managers})
+
+
+@async_admin_required
+@cache_response(Location)
+async def location_list(request):
+    locations = [location async for location in Location.objects.all()]
+    return render(request, "location/location_list.html", {"location": locations})
@@ -0,0 +1,211 @@
+"""Audit log: who changed which planner row, when, and how.
+
+Saves and deletes of locations, managers, teams and members are recorded
+as AuditEntry rows holding only the fields that changed, with foreign keys
+as ids. So are the bulk writes in planner.bulk, planner.jobs and
+planner.importexport. Entries are queued when the change commits and
+collected in the Batch of the current request (AuditMiddleware) or job,
+which writes them all with one bulk INSERT at the end; outside a batch each
+call writes its entries at once.
+
+The table is append-only: AuditEntry refuses updates and deletes, and on
+SQLite triggers enforce the same in the database.
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from .models import AuditEntry, Location, Manager, Member, Team
+
+current_batch = ContextVar('current_batch', default=None)
+
+KIND_BY_MODEL = {
+    Location: AuditEntry.LOCATION,
+    Manager: AuditEntry.MANAGER,
+    Team: AuditEntry.TEAM,
+    Member: AuditEntry.MEMBER,
+}
+
+
+def audited_fields(model):
+    """Fields whose changes are recorded: everything editable but the id.
+    The counts kept by planner.counters are left out."""
+    return [field for field in model._meta.concrete_fields if field.editable and not field.primary_key]
+
+
+def _values(model, values):
+    """{field name: value} from a dict of column values (attnames)."""
+    return {field.name: field.to_python(values[field.attname]) for field in audited_fields(model)
+            if field.attname in values}
+
+
+class Batch:
+    """Entries collected for one request or job, written by flush()."""
+
+    def __init__(self, user_id=None):
+        # A user id, or a callable returning one, called when flushing.
+        self.user_id = user_id
+        self.entries = []
+
+    def flush(self):
+        if not self.entries:
+            return
+        user_id = self.user_id() if callable(self.user_id) else self.user_id
+        for entry in self.entries:
+            if entry.user_id is None:
+                entry.user_id = user_id
+        AuditEntry.objects.bulk_create(self.entries)
+        self.entries = []
+
+
+@contextmanager
+def batch(user_id=None):
+    """Collect the entries recorded inside the block and write them at its end."""
+    collected = Batch(user_id)
+    token = current_batch.set(collected)
+    try:
+        yield collected
+    finally:
+        current_batch.reset(token)
+        collected.flush()
+
+
+def _add(entries):
+    if not entries:
+        return
+    collected = current_batch.get()
+
+    def write():
+        if collected is None:
+            AuditEntry.objects.bulk_create(entries)
+        else:
+            collected.entries.extend(entries)
+    transaction.on_commit(write)
+
+
+def _entry(model, pk, action, changes):
+    return AuditEntry(kind=KIND_BY_MODEL[model], object_id=pk, action=action, changes=changes)
+
+
+def record_saved(model, instance, created):
+    new = _values(model, instance.__dict__)
+    if created:
+        _add([_entry(model, instance.pk, AuditEntry.CREATED, new)])
+        return
+    old = _values(model, getattr(instance, '_loaded_values', {}))
+    changes = {name: [old.get(name), value] for name, value in new.items()
+               if name not in old or old[name] != value}
+    if changes:
+        _add([_entry(model, instance.pk, AuditEntry.UPDATED, changes)])
+
+
+def record_deleted(model, instance):
+    values = getattr(instance, '_loaded_values', None) or instance.__dict__
+    _add([_entry(model, instance.pk, AuditEntry.DELETED, _values(model, values))])
+
+
+def rows_before(queryset, fields=None):
+    """Column values of the rows about to be changed or deleted in bulk, for
+    rows_updated() and rows_deleted()."""
+    model = queryset.model
+    names = [field.attname for field in audited_fields(model) if fields is None or field.name in fields]
+    return list(queryset.values('pk', *names))
+
+
+def rows_updated(model, before, changes):
+    """Record a bulk update that set ``changes`` ({field name: object or id})
+    on the rows in ``before``."""
+    new = {}
+    for name, value in changes.items():
+        field = model._meta.get_field(name)
+        new[name] = getattr(value, 'pk', value) if field.is_relation else field.to_python(value)
+    entries = []
+    for row in before:
+        old = _values(model, row)
+        diff = {name: [old.get(name), value] for name, value in new.items() if old.get(name) != value}
+        if diff:
+            entries.append(_entry(model, row['pk'], AuditEntry.UPDATED, diff))
+    _add(entries)
+
+
+def rows_deleted(model, before):
+    _add([_entry(model, row['pk'], AuditEntry.DELETED, _values(model, row)) for row in before])
+
+
+def rows_created(model, instances):
+    _add([_entry(model, instance.pk, AuditEntry.CREATED, _values(model, instance.__dict__))
+          for instance in instances if instance.pk is not None])
+
+
+def history_page(model, pk, page_size, before=None):
+    """Up to ``page_size`` entries for one row, newest first, older than
+    entry ``before``; and whether there are more. Read through the
+    (kind, object_id, id) index."""
+    entries = AuditEntry.objects.filter(kind=KIND_BY_MODEL[model], object_id=pk)
+    if before is not None:
+        entries = entries.filter(id__lt=before)
+    entries = list(entries.select_related('user').order_by('-id')[:page_size + 1])
+    return entries[:page_size], len(entries) > page_size
+
+
+def describe(model, entries):
+    """Set ``entry.rows`` to [(field, old, new)] on each entry, with foreign
+    key ids replaced by names (one query per related model)."""
+    wanted = {}
+    for entry in entries:
+        for name, value in entry.changes.items():
+            field = model._meta.get_field(name)
+            if field.is_relation:
+                values = value if entry.action == AuditEntry.UPDATED else [value]
+                wanted.setdefault(field.related_model, set()).update(pk for pk in values if pk is not None)
+    names = {related: dict(related.objects.filter(pk__in=pks).values_list('pk', 'name'))
+             for related, pks in wanted.items()}
+
+    def show(field, value):
+        if value is None or not field.is_relation:
+            return value
+        return names[field.related_model].get(value, f"#{value} (deleted)")
+
+    for entry in entries:
+        entry.rows = []
+        for name, value in entry.changes.items():
+            field = model._meta.get_field(name)
+            old, new = value if entry.action == AuditEntry.UPDATED else (
+                (None, value) if entry.action == AuditEntry.CREATED else (value, None))
+            entry.rows.append((field.verbose_name, show(field, old), show(field, new)))
+    return entries
+
+
+class AuditMiddleware:
+    """Gives each request a Batch, flushed once the response is ready."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function so Django awaits it.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    @staticmethod
+    def user_id(request):
+        return lambda: request.user.pk if request.user.is_authenticated else None
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        with batch(self.user_id(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        collected = Batch(self.user_id(request))
+        token = current_batch.set(collected)
+        try:
+            return await self.get_response(request)
+        finally:
+            current_batch.reset(token)
+            if collected.entries:
+                await sync_to_async(collected.flush)()
@@ -0,0 +1,78 @@
+"""Authentication with a per-process user cache.
+
+CachedAuthenticationMiddleware (used by capstone.settings_production) stands
+in for django.contrib.auth's AuthenticationMiddleware. request.user is still
+loaded lazily, but each worker process keeps the users it has loaded for
+USER_CACHE_TIMEOUT seconds, so an authenticated request no longer reads the
+auth_user row. A cached user is only used for a session carrying the same
+backend and session auth hash it was loaded with: a password change made in
+another process gives the session a new hash, which misses the cache and
+loads the user afresh. Saving or deleting a user drops it from the cache of
+the process that made the change; other processes see the change once their
+entry expires.
+
+Each request gets its own copy of the cached user, so attributes set on
+request.user (such as the roles cached by planner.roles) do not leak between
+requests.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+
+_lock = threading.Lock()
+
+# user id (as stored in the session) -> (backend, session hash, expiry, user)
+_users = {}
+
+
+def forget_users(*user_ids):
+    """Drop users from this process's cache."""
+    with _lock:
+        for user_id in user_ids:
+            _users.pop(str(user_id), None)
+
+
+def _remember(user_id, backend, session_hash, user):
+    with _lock:
+        _users.pop(user_id, None)
+        while len(_users) >= settings.USER_CACHE_SIZE:
+            # Dicts keep insertion order: drop the entry stored longest ago.
+            del _users[next(iter(_users))]
+        _users[user_id] = (backend, session_hash, time.monotonic() + settings.USER_CACHE_TIMEOUT, user)
+
+
+def get_user(request):
+    """django.contrib.auth.get_user() through the per-process cache."""
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is None:
+        return auth.get_user(request)
+    user_id = str(user_id)
+    backend = request.session.get(BACKEND_SESSION_KEY)
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    entry = _users.get(user_id)
+    if entry is not None and entry[:2] == (backend, session_hash) and entry[2] > time.monotonic():
+        return copy.copy(entry[3])
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        _remember(user_id, backend, session_hash, copy.copy(user))
+    return user
+
+
+def _cached_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_user(request)
+    return request._cached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware that loads request.user through get_user()."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: _cached_user(request))
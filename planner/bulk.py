@@ -0,0 +1,104 @@
+"""Bulk reassignment and deletion of members.
+
+A selection (an id list, a filter on team, manager and location, or both)
+is validated as a whole, then changed with one QuerySet.update() or one
+DELETE inside a single transaction. The per-row post_save/post_delete
+receivers are not run; instead one rows_changed signal tells the org chart,
+search index and page cache to refresh.
+"""
+from django.db import connections, transaction
+
+from . import audit
+from .models import Member
+from .signals import rows_changed
+
+
+"""Ids per DELETE statement, under SQLite's smallest limit of 999 parameters."""
+DELETE_BATCH_SIZE = 900
+
+
+class BulkResult:
+    def __init__(self, action, matched, changed=None):
+        self.action = action
+        self.matched = matched
+        self.changed = changed
+
+    def as_dict(self):
+        return {"action": self.action, "matched": self.matched, "changed": self.changed}
+
+    def __str__(self):
+        if self.changed is None:
+            return f"{self.matched} members would be changed"
+        return f"{self.matched} members matched, {self.changed} {'deleted' if self.action == 'delete' else 'updated'}"
+
+
+def member_queryset(ids=None, **filters):
+    """Members with one of ``ids`` (if given) matching every filter."""
+    queryset = Member.objects.filter(**filters)
+    if ids:
+        queryset = queryset.filter(pk__in=ids)
+    return queryset
+
+
+def reassign_members(queryset, changes):
+    """Set ``changes`` (field -> object or None) on every member in ``queryset``."""
+    with transaction.atomic():
+        audit.rows_updated(Member, audit.rows_before(queryset, changes), changes)
+        changed = queryset.update(**changes)
+        if changed:
+            rows_changed.send(sender=Member, fields=list(changes))
+    return changed
+
+
+def delete_rows(queryset):
+    """Delete every row in ``queryset`` without loading model instances.
+    The rows are read once, for the audit log, and exactly those ids are
+    deleted, a batch at a time: from each many-to-many table, then from the
+    model's own table with a plain DELETE. No signals are sent and nothing
+    cascades, so children must already be gone."""
+    model = queryset.model
+    before = audit.rows_before(queryset)
+    audit.rows_deleted(model, before)
+    pks = [row['pk'] for row in before]
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), DELETE_BATCH_SIZE):
+            batch = pks[start:start + DELETE_BATCH_SIZE]
+            for field in model._meta.many_to_many:
+                field.remote_field.through.objects.using(queryset.db).filter(
+                    **{f"{field.m2m_field_name()}__in": batch}).delete()
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(batch))})", batch)
+            deleted += cursor.rowcount
+    return deleted
+
+
+def delete_members(queryset):
+    """Delete every member in ``queryset`` with two DELETE statements.
+
+    QuerySet.delete() would load each member and send post_delete for it,
+    because planner.signals listens for it, so the rows are removed
+    directly by delete_rows(): group links first, then the members
+    themselves."""
+    with transaction.atomic():
+        changed = delete_rows(queryset)
+        if changed:
+            rows_changed.send(sender=Member)
+    return changed
+
+
+def apply(form, preview=False):
+    """Run the change described by a valid BulkMemberForm and return a BulkResult."""
+    action = form.cleaned_data['action']
+    queryset = member_queryset(form.cleaned_data['ids'], **form.cleaned_data['filters'])
+    if preview:
+        return BulkResult(action, queryset.count())
+    with transaction.atomic():
+        matched = queryset.count()
+        if action == 'delete':
+            changed = delete_members(queryset)
+        else:
+            changed = reassign_members(queryset, form.cleaned_data['changes'])
+    return BulkResult(action, matched, changed)
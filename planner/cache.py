@@ -0,0 +1,186 @@
+"""Version-keyed caching for rendered pages and template fragments.
+
+Cached content is never deleted; instead its key includes version numbers
+that are bumped when the data behind it changes, so stale entries are simply
+never read again and expire on their own. Three counters are kept per model:
+
+    * the model version, bumped by any change to the table (list pages);
+    * the bulk generation, bumped only by bulk writes (rows_changed);
+    * one version per object, bumped when that object is saved or deleted.
+
+An object's fragment key combines its own version with its model's bulk
+generation, so saving one team invalidates that team's fragments and
+nothing else.
+
+The versions are only seen by every worker process if the default cache is
+shared between them; capstone.settings_production refuses to start with a
+per-process cache unless the server runs one process. A new version is the
+clock in nanoseconds, set without reading the old value, so it needs no
+atomic incr() (the file cache has none) and two workers bumping the same key
+at once still leave it at a value nothing was cached under.
+
+Hit and miss counts are kept per process and shown on the cache-stats page.
+"""
+import asyncio
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+_stats_lock = threading.Lock()
+stats = Counter()
+
+
+def record(name, hit):
+    with _stats_lock:
+        stats[(name, 'hit' if hit else 'miss')] += 1
+
+
+def stats_table():
+    """Return [(name, hits, misses, hit ratio)] sorted by name."""
+    with _stats_lock:
+        names = sorted({name for name, _ in stats})
+        rows = []
+        for name in names:
+            hits, misses = stats[(name, 'hit')], stats[(name, 'miss')]
+            rows.append((name, hits, misses, hits / (hits + misses) if hits + misses else 0))
+    return rows
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def model_key(model):
+    return f"planner:version:{_label(model)}"
+
+
+def bulk_key(model):
+    return f"planner:version:{_label(model)}:bulk"
+
+
+def object_key(model, pk):
+    return f"planner:version:{_label(model)}:{pk}"
+
+
+def _bump(key):
+    cache.set(key, time.time_ns(), None)
+
+
+def current_versions(keys):
+    """Return the current value of each version key, creating missing ones.
+    A missing key starts from the clock, so a version that was evicted cannot
+    come back to a number that older content was cached under."""
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+async def acurrent_versions(keys):
+    """current_versions() for async views."""
+    found = await cache.aget_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        await cache.aset_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def object_changed(model, pk):
+    _bump(model_key(model))
+    _bump(object_key(model, pk))
+
+
+def rows_changed(model):
+    _bump(model_key(model))
+    _bump(bulk_key(model))
+
+
+def fragment_key(name, objects, extra=()):
+    """Cache key for a fragment that depends on ``objects`` (None entries are skipped)."""
+    objects = [obj for obj in objects if obj is not None]
+    keys = []
+    for obj in objects:
+        keys += [bulk_key(type(obj)), object_key(type(obj), obj.pk)]
+    versions = current_versions(keys) if keys else []
+    parts = [name] + [str(part) for part in extra]
+    for i, obj in enumerate(objects):
+        parts.append(f"{_label(type(obj))}.{obj.pk}.{versions[2 * i]}.{versions[2 * i + 1]}")
+    return "planner:fragment:" + ":".join(parts)
+
+
+def _response_key(name, request, versions):
+    return "planner:response:{}:{}:{}".format(
+        name, request.get_full_path(), ".".join(str(version) for version in versions))
+
+
+def _cached_response(name, cached):
+    """The response for a cache lookup's result, or None on a miss."""
+    record(name, cached is not None)
+    if cached is None:
+        return None
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Cache'] = 'hit'
+    return response
+
+
+def _cacheable(response):
+    """What to cache for ``response``, or None if it should not be."""
+    if response.status_code == 200 and not response.streaming:
+        response['X-Cache'] = 'miss'
+        return response.content, response['Content-Type']
+    return None
+
+
+def _timeout(timeout):
+    return settings.PLANNER_CACHE_TIMEOUT if timeout is None else timeout
+
+
+def cache_response(*models, timeout=None):
+    """Cache a view's successful GET responses until any of ``models`` changes.
+    Works on both sync and async views.
+
+    Only for pages whose content is the same for every user allowed to see
+    them; put it below the view's login/role decorator."""
+    def decorator(view):
+        name = view.__name__
+
+        if asyncio.iscoroutinefunction(view):
+            # The cache is read and written with its async methods, which run
+            # the (file) cache's I/O in a thread rather than on the event loop.
+            @wraps(view)
+            async def wrapped(request, *args, **kwargs):
+                if request.method != 'GET':
+                    return await view(request, *args, **kwargs)
+                key = _response_key(name, request, await acurrent_versions([model_key(model) for model in models]))
+                response = _cached_response(name, await cache.aget(key))
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    cached = _cacheable(response)
+                    if cached is not None:
+                        await cache.aset(key, cached, _timeout(timeout))
+                return response
+            return wrapped
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            key = _response_key(name, request, current_versions([model_key(model) for model in models]))
+            response = _cached_response(name, cache.get(key))
+            if response is None:
+                response = view(request, *args, **kwargs)
+                cached = _cacheable(response)
+                if cached is not None:
+                    cache.set(key, cached, _timeout(timeout))
+            return response
+        return wrapped
+    return decorator
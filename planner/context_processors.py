@@ -0,0 +1,12 @@
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_roles, has_role, ADMIN
+
+
+def roles(request):
+    """Expose the current user's roles to templates without querying unless used."""
+    user = request.user
+    return {
+        "user_roles": SimpleLazyObject(lambda: get_roles(user)),
+        "user_is_admin": SimpleLazyObject(lambda: has_role(user, ADMIN)),
+    }
@@ -0,0 +1,90 @@
+"""Denormalized child counts on teams, managers and locations, so pages can
+show "12 members" without a COUNT query per row.
+
+Single saves and deletes move the counts with F() updates in the same
+transaction as the row (see TrackedModel and planner.signals). Bulk writes,
+which send rows_changed instead, recount the affected counters in one
+UPDATE each. Either way the parents' cache versions are bumped, as their
+pages show the counts. The recount_planner command repairs any drift.
+"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from . import cache
+from .models import Manager, Member, Team, Location
+
+
+class Counter:
+    """``parent.field`` counts the ``child`` rows whose ``foreign_key`` points at it."""
+
+    def __init__(self, parent, field, child, foreign_key):
+        self.parent = parent
+        self.field = field
+        self.child = child
+        self.foreign_key = foreign_key
+        self.attname = child._meta.get_field(foreign_key).attname
+
+    def __str__(self):
+        return f"{self.parent.__name__}.{self.field}"
+
+    def move(self, old, new):
+        """One child moved from parent id ``old`` to ``new`` (None for none)."""
+        if old == new:
+            return
+        for pk, step in ((old, -1), (new, 1)):
+            if pk is not None:
+                self.parent.objects.filter(pk=pk).update(**{self.field: F(self.field) + step})
+                transaction.on_commit(lambda pk=pk: cache.object_changed(self.parent, pk))
+
+    def actual(self):
+        children = (self.child.objects.filter(**{self.foreign_key: OuterRef('pk')}).order_by()
+                    .values(self.foreign_key).annotate(count=Count('pk')).values('count'))
+        return Coalesce(Subquery(children, output_field=IntegerField()), Value(0))
+
+    def recount(self):
+        """Set every parent's count from the child table; return how many were wrong."""
+        wrong = (self.parent.objects.annotate(actual=self.actual())
+                 .exclude(**{self.field: F('actual')}).count())
+        if wrong:
+            self.parent.objects.update(**{self.field: self.actual()})
+            transaction.on_commit(lambda: cache.rows_changed(self.parent))
+        return wrong
+
+
+COUNTERS = [
+    Counter(Team, 'member_count', Member, 'team'),
+    Counter(Manager, 'member_count', Member, 'manager'),
+    Counter(Location, 'member_count', Member, 'location'),
+    Counter(Manager, 'team_count', Team, 'manager'),
+    Counter(Location, 'team_count', Team, 'location'),
+    Counter(Location, 'manager_count', Manager, 'location'),
+]
+
+
+def counters_for(child, fields=None):
+    """Counters kept over ``child``, limited to those on ``fields`` if given."""
+    return [counter for counter in COUNTERS
+            if counter.child is child and (fields is None or counter.foreign_key in fields)]
+
+
+def child_saved(instance, created):
+    # TrackedModel.save() reads any foreign key the instance was not loaded
+    # with from the row before overwriting it, so the old parent is known.
+    old = {} if created else instance._loaded_values
+    for counter in counters_for(type(instance)):
+        if counter.attname in instance.__dict__:
+            counter.move(old.get(counter.attname), instance.__dict__[counter.attname])
+
+
+def child_deleted(instance):
+    for counter in counters_for(type(instance)):
+        old = getattr(instance, '_loaded_values', {}).get(counter.attname, instance.__dict__.get(counter.attname))
+        counter.move(old, None)
+
+
+def recount(child=None, fields=None):
+    """Recount the counters over ``child`` (all counters if None); return
+    {counter name: rows corrected}."""
+    counters = COUNTERS if child is None else counters_for(child, fields)
+    return {str(counter): counter.recount() for counter in counters}
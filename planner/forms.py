@@ -0,0 +1,171 @@
+"""MemberForm, LocationForm, ManagerForm & TeamForm:
+These are Django ModelForm classes for the planner models, shared by the
+views, the JSON API and the bulk import pipeline. model_form() builds each
+one the first time it is used rather than when this module is imported, so
+processes that never handle a form (job workers, management commands) skip
+the work; the names can still be imported from here. Foreign keys and groups
+use the lookup widgets from planner.lookups, so a form page does not list
+every related row."""
+from functools import cache
+
+from django import forms
+from django.forms import modelform_factory
+from django.forms.widgets import DateInput
+from .lookups import LookupSelect, LookupSelectMultiple
+from .models import Manager, Member, Team, Location
+
+
+"""modelform_factory() options per model."""
+MODEL_FORM_OPTIONS = {
+    Member: {'widgets': {'start_date': DateInput(attrs={'type': 'date'}),
+                         'team': LookupSelect('team'),
+                         'manager': LookupSelect('manager'),
+                         'location': LookupSelect('location'),
+                         'groups': LookupSelectMultiple('group')}},
+    Location: {},
+    Manager: {'widgets': {'start_date': DateInput(attrs={'type': 'date'}),
+                          'location': LookupSelect('location'),
+                          'groups': LookupSelectMultiple('group')}},
+    Team: {'widgets': {'location': LookupSelect('location'),
+                       'manager': LookupSelect('manager')}},
+}
+
+MODEL_FORM_NAMES = {f"{model.__name__}Form": model for model in MODEL_FORM_OPTIONS}
+
+
+@cache
+def model_form(model):
+    return modelform_factory(model, exclude=[], **MODEL_FORM_OPTIONS[model])
+
+
+def __getattr__(name):
+    if name in MODEL_FORM_NAMES:
+        return model_form(MODEL_FORM_NAMES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+"""ImportForm: upload form for the bulk import view."""
+
+
+class ImportForm(forms.Form):
+    model = forms.ChoiceField(choices=[('location', 'Locations'), ('manager', 'Managers'),
+                                       ('team', 'Teams'), ('member', 'Members')])
+    file_format = forms.ChoiceField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')])
+    file = forms.FileField()
+
+
+"""MemberSelectionForm: a set of members given by id, by their current team,
+manager and location, or both, as used by BulkMemberForm and ScheduleForm.
+The selection is checked as a whole: one query finds any ids that do not
+exist."""
+
+"""Fields a bulk reassignment can change, and whether they may be cleared."""
+REASSIGNABLE = {'team': True, 'manager': True, 'location': False}
+
+"""How many missing ids an error message lists."""
+MISSING_IDS_SHOWN = 10
+
+
+def parse_ids(value):
+    """Return a list of ids from a list or a comma/whitespace separated string."""
+    if isinstance(value, str):
+        value = value.replace(',', ' ').split()
+    ids = []
+    for item in value or []:
+        try:
+            ids.append(int(item))
+        except (TypeError, ValueError):
+            raise forms.ValidationError(f"'{item}' is not a member id.")
+    return ids
+
+
+class MemberSelectionForm(forms.Form):
+    ids = forms.CharField(required=False, widget=forms.Textarea(attrs={'rows': 3}),
+                          help_text="Member ids separated by commas or spaces.")
+    filter_team = forms.ModelChoiceField(Team.objects.all(), required=False,
+                                         widget=LookupSelect('team'))
+    filter_manager = forms.ModelChoiceField(Manager.objects.all(), required=False,
+                                            widget=LookupSelect('manager'))
+    filter_location = forms.ModelChoiceField(Location.objects.all(), required=False,
+                                             widget=LookupSelect('location'))
+
+    """Message when neither ids nor a filter is given, or None if that is allowed."""
+    selection_required = "Give member ids, a filter, or both."
+
+    def clean_ids(self):
+        return parse_ids(self.cleaned_data['ids'])
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+        ids = cleaned_data['ids']
+        filters = {field: cleaned_data[f"filter_{field}"] for field in REASSIGNABLE
+                   if cleaned_data.get(f"filter_{field}") is not None}
+        if not ids and not filters and self.selection_required:
+            raise forms.ValidationError(self.selection_required)
+        if ids:
+            found = set(Member.objects.filter(pk__in=ids).values_list('pk', flat=True))
+            missing = sorted(set(ids) - found)
+            if missing:
+                shown = ", ".join(str(pk) for pk in missing[:MISSING_IDS_SHOWN])
+                more = f" and {len(missing) - MISSING_IDS_SHOWN} more" if len(missing) > MISSING_IDS_SHOWN else ""
+                self.add_error('ids', f"No member has id {shown}{more}.")
+        cleaned_data['filters'] = filters
+        return cleaned_data
+
+
+"""BulkMemberForm: selection and change for the bulk member operations in
+planner.bulk."""
+
+
+class BulkMemberForm(MemberSelectionForm):
+    action = forms.ChoiceField(choices=[('reassign', 'Reassign'), ('delete', 'Delete')])
+    team = forms.ModelChoiceField(Team.objects.all(), required=False, widget=LookupSelect('team'))
+    clear_team = forms.BooleanField(required=False)
+    manager = forms.ModelChoiceField(Manager.objects.all(), required=False, widget=LookupSelect('manager'))
+    clear_manager = forms.BooleanField(required=False)
+    location = forms.ModelChoiceField(Location.objects.all(), required=False, widget=LookupSelect('location'))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if 'filters' not in cleaned_data:
+            return cleaned_data
+        changes = {}
+        if cleaned_data['action'] == 'reassign':
+            for field, nullable in REASSIGNABLE.items():
+                value = cleaned_data.get(field)
+                if nullable and cleaned_data.get(f"clear_{field}"):
+                    if value is not None:
+                        self.add_error(field, "Choose a value or clear it, not both.")
+                    changes[field] = None
+                elif value is not None:
+                    changes[field] = value
+            if not changes:
+                raise forms.ValidationError("Choose at least one team, manager or location to assign.")
+        cleaned_data['changes'] = changes
+        return cleaned_data
+
+
+"""ScheduleForm: the members planner.scheduler places, and the limits it
+applies where teams and managers have none of their own."""
+
+
+class ScheduleForm(MemberSelectionForm):
+    include_unplaced = forms.BooleanField(required=False, initial=True,
+                                          help_text="Also place every member without a team.")
+    allow_relocation = forms.BooleanField(required=False,
+                                          help_text="Let members move to teams at other locations.")
+    default_target_size = forms.IntegerField(required=False, min_value=0,
+                                             help_text="For teams without a target size; empty for no limit.")
+    default_span_limit = forms.IntegerField(required=False, min_value=0,
+                                            help_text="For managers without a span limit; empty for no limit.")
+
+    selection_required = None
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if (not self.errors and not cleaned_data['ids'] and not cleaned_data['filters']
+                and not cleaned_data.get('include_unplaced')):
+            raise forms.ValidationError("Give member ids, a filter, or include members without a team.")
+        return cleaned_data
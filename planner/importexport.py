@@ -0,0 +1,238 @@
+"""Bulk import and export of planner rows as CSV or JSON Lines.
+
+Imports stream rows from a file, validate them in chunks with the planner
+ModelForms (minus their foreign key fields), resolve foreign keys by name
+from an in-memory lookup built once per import, and write each valid chunk
+with bulk_create() inside its own transaction. Invalid rows, including JSON
+Lines that do not parse or are not objects and values of the wrong type, are
+skipped and reported with their row number. rows_changed is sent once any
+chunk has been written, even if the import then fails.
+
+Exports stream rows straight from the database cursor, so neither side holds
+a whole table in memory. Foreign keys are written by name, so an export can
+be imported into another database.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.db import transaction
+from django.forms import modelform_factory
+
+from . import audit
+from .forms import model_form
+from .models import Manager, Member, Team, Location
+from .signals import rows_changed
+
+FORMATS = ('csv', 'jsonl')
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class Spec:
+    """How one model is imported and exported."""
+
+    def __init__(self, model, fields, foreign_keys):
+        self.model = model
+        self.fields = fields
+        # Foreign key field name -> model its names are looked up in.
+        self.foreign_keys = foreign_keys
+
+    def import_form(self):
+        """The model's form restricted to its scalar fields."""
+        excluded = list(self.foreign_keys) + [field.name for field in self.model._meta.many_to_many]
+        return modelform_factory(self.model, form=model_form(self.model), exclude=excluded)
+
+
+SPECS = {
+    'location': Spec(Location, ['name'], {}),
+    'manager': Spec(Manager, ['name', 'role', 'location', 'start_date'],
+                    {'location': Location}),
+    'team': Spec(Team, ['name', 'location', 'manager'],
+                 {'location': Location, 'manager': Manager}),
+    'member': Spec(Member, ['name', 'role', 'location', 'start_date', 'team', 'manager'],
+                   {'location': Location, 'team': Team, 'manager': Manager}),
+}
+
+"""Models in the order their files should be imported, parents first."""
+IMPORT_ORDER = ['location', 'manager', 'team', 'member']
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, row_number, errors):
+        self.errors.append((row_number, errors))
+
+    def __str__(self):
+        return f"{self.created} created, {len(self.errors)} rejected"
+
+
+class NameLookup:
+    """Name -> id map for one model. Names used by more than one row are
+    ambiguous and cannot be referenced by name."""
+
+    AMBIGUOUS = object()
+
+    def __init__(self, model):
+        self.ids = {}
+        for name, pk in model.objects.values_list('name', 'id').iterator():
+            self.ids[name] = self.AMBIGUOUS if name in self.ids else pk
+
+    def resolve(self, name):
+        """Return (id, error). Blank names resolve to None."""
+        if not name:
+            return None, None
+        pk = self.ids.get(name)
+        if pk is None:
+            return None, f"No row named '{name}'."
+        if pk is self.AMBIGUOUS:
+            return None, f"More than one row is named '{name}'."
+        return pk, None
+
+
+class UnreadableRow:
+    """Stands in for a line read_rows() could not parse, so import_rows()
+    reports it against that row instead of failing."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def read_rows(stream, file_format):
+    """Yield dicts from a text stream of CSV (with a header row) or JSON Lines.
+    A JSON line that does not parse is yielded as an UnreadableRow."""
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+    elif file_format == 'jsonl':
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as error:
+                    yield UnreadableRow(f"Not valid JSON: {error}.")
+    else:
+        raise ValueError(f"Unknown format '{file_format}', expected one of {', '.join(FORMATS)}.")
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def row_values(spec, row, defaults):
+    """Return (data, errors) for one row read by read_rows(): each field's
+    value as text, or its default when missing or blank. CSV values are
+    always text; JSON values may also be numbers, and anything else is an
+    error for that field."""
+    if isinstance(row, UnreadableRow):
+        return {}, {NON_FIELD_ERRORS: [row.message]}
+    if not isinstance(row, dict):
+        return {}, {NON_FIELD_ERRORS: ["Each row must be a JSON object."]}
+    data, errors = {}, {}
+    for field in spec.fields:
+        value = row.get(field)
+        if value is None or value == '':
+            data[field] = defaults.get(field, '')
+        elif isinstance(value, str) or (isinstance(value, (int, float)) and not isinstance(value, bool)):
+            data[field] = str(value)
+        else:
+            errors[field] = [f"Expected text, not {type(value).__name__}."]
+    return data, errors
+
+
+def import_rows(model_name, rows, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Validate and bulk insert ``rows`` (an iterable of dicts) as ``model_name``.
+    ``progress``, if given, is called with the size of each chunk once it is done."""
+    spec = SPECS[model_name]
+    form_class = spec.import_form()
+    lookups = {field: NameLookup(model) for field, model in spec.foreign_keys.items()}
+    required = {field for field in spec.foreign_keys if not spec.model._meta.get_field(field).null}
+    defaults = {field.name: field.get_default() for field in spec.model._meta.concrete_fields
+                if field.has_default()}
+    result = ImportResult()
+
+    try:
+        for chunk_number, chunk in enumerate(_chunks(rows, chunk_size)):
+            instances = []
+            for offset, row in enumerate(chunk):
+                row_number = chunk_number * chunk_size + offset + 1
+                data, errors = row_values(spec, row, defaults)
+                if NON_FIELD_ERRORS in errors:
+                    result.add_error(row_number, errors)
+                    continue
+                form = form_class(data)
+                if not form.is_valid():
+                    errors = {**form.errors, **errors}
+                instance = form.instance
+                for field, lookup in lookups.items():
+                    if field in errors:
+                        continue
+                    pk, error = lookup.resolve(data[field].strip())
+                    if error is None and pk is None and field in required:
+                        error = "This field is required."
+                    if error:
+                        errors[field] = [error]
+                    setattr(instance, f"{field}_id", pk)
+                if errors:
+                    result.add_error(row_number, errors)
+                else:
+                    instances.append(instance)
+            if instances:
+                with transaction.atomic():
+                    spec.model.objects.bulk_create(instances, batch_size=chunk_size)
+                    audit.rows_created(spec.model, instances)
+                result.created += len(instances)
+            if progress is not None:
+                progress(len(chunk))
+    finally:
+        # Chunks commit one by one: whatever was written must reach the
+        # counters, search index and org chart even if a later chunk failed.
+        if result.created:
+            rows_changed.send(sender=spec.model)
+    return result
+
+
+def import_file(model_name, stream, file_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    return import_rows(model_name, read_rows(stream, file_format), chunk_size=chunk_size)
+
+
+def export_values(model_name, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield one tuple per row, foreign keys replaced by names, in id order."""
+    spec = SPECS[model_name]
+    columns = [f"{field}__name" if field in spec.foreign_keys else field for field in spec.fields]
+    queryset = spec.model.objects.order_by('pk').values_list(*columns)
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(model_name, file_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the export of ``model_name`` as lines of text."""
+    fields = SPECS[model_name].fields
+    values = export_values(model_name, chunk_size=chunk_size)
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields)
+        for row in values:
+            yield writer.writerow(row)
+    elif file_format == 'jsonl':
+        for row in values:
+            yield json.dumps(dict(zip(fields, row)), default=str) + "\n"
+    else:
+        raise ValueError(f"Unknown format '{file_format}', expected one of {', '.join(FORMATS)}.")
+
+
+def text_stream(uploaded_file):
+    """Wrap an uploaded (binary) file for read_rows."""
+    return io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
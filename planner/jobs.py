@@ -0,0 +1,196 @@
+"""Background jobs for operations too slow for a request: deleting a
+location or manager with everything that cascades from it, large imports,
+and org snapshots.
+
+Jobs are rows in the planner_job table. enqueue() adds one and the
+run_jobs management command claims queued jobs one at a time and runs the
+handler registered for the job's kind, so no broker is needed. Handlers
+work in chunks, each in its own transaction, and record their progress on
+the job row, which the job status page shows.
+
+With settings.BACKGROUND_JOBS off, enqueue() runs the job before returning.
+"""
+import traceback
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import audit, bulk, importexport, snapshots
+from .models import Job, Location, Manager, Member, Team
+from .signals import rows_changed
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register a function as the handler for jobs of ``kind``. It is called
+    with a Progress and the job's params, and returns a JSON-able result."""
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+class Progress:
+    """Records a running job's progress on its row."""
+
+    def __init__(self, job):
+        self.job = job
+
+    def set_total(self, total):
+        self.job.total = total
+        Job.objects.filter(pk=self.job.pk).update(total=total)
+
+    def advance(self, count):
+        self.job.progress += count
+        Job.objects.filter(pk=self.job.pk).update(progress=self.job.progress)
+
+
+def enqueue(kind, description, user=None, **params):
+    if kind not in HANDLERS:
+        raise ValueError(f"No handler for jobs of kind '{kind}'.")
+    job = Job.objects.create(kind=kind, description=description, params=params,
+                             created_by=user if user is not None and user.is_authenticated else None)
+    if not settings.BACKGROUND_JOBS and claim(job.pk):
+        run(job)
+    return job
+
+
+def claim(pk):
+    """Move a queued job to running. The conditional UPDATE means only one
+    worker can win a job, without row locks."""
+    return Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+        status=Job.RUNNING, started_at=timezone.now()) == 1
+
+
+def claim_next():
+    """Claim the oldest queued job and return it, or None if there is none."""
+    while True:
+        pk = Job.objects.filter(status=Job.QUEUED).order_by('id').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        if claim(pk):
+            return Job.objects.get(pk=pk)
+
+
+def run(job):
+    """Run a claimed job to completion and record the outcome."""
+    job.refresh_from_db()
+    try:
+        with audit.batch(job.created_by_id):
+            result = HANDLERS[job.kind](Progress(job), **job.params)
+    except Exception:
+        Job.objects.filter(pk=job.pk).update(status=Job.FAILED, error=traceback.format_exc(),
+                                             finished_at=timezone.now())
+    else:
+        Job.objects.filter(pk=job.pk).update(status=Job.DONE, result=result, finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale():
+    """Put jobs left running by a worker that died back in the queue."""
+    return Job.objects.filter(status=Job.RUNNING).update(status=Job.QUEUED, started_at=None, progress=0)
+
+
+def delete_in_chunks(queryset, progress, chunk_size=None):
+    """Delete the rows of ``queryset`` in id order, ``chunk_size`` per transaction."""
+    chunk_size = chunk_size or settings.JOB_CHUNK_SIZE
+    deleted, after = 0, 0
+    while True:
+        ids = list(queryset.filter(pk__gt=after).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += bulk.delete_rows(queryset.model.objects.filter(pk__in=ids))
+        after = ids[-1]
+        progress.advance(len(ids))
+
+
+def delete_cascade(progress, root, steps):
+    """Delete ``steps`` ([(name, queryset)], children first) chunk by chunk,
+    then ``root`` itself. Returns {name: rows deleted}."""
+    progress.set_total(sum(queryset.count() for _, queryset in steps) + 1)
+    deleted = {}
+    try:
+        for name, queryset in steps:
+            deleted[name] = delete_in_chunks(queryset, progress)
+        root.delete()
+        progress.advance(1)
+    finally:
+        for _, queryset in steps:
+            rows_changed.send(sender=queryset.model)
+    return deleted
+
+
+def location_cascade(locations):
+    """The rows deleting ``locations`` (a queryset or list) removes, as
+    delete_cascade() steps."""
+    return [
+        ('members', Member.objects.filter(Q(location__in=locations) | Q(manager__location__in=locations) |
+                                          Q(team__location__in=locations) |
+                                          Q(team__manager__location__in=locations))),
+        ('teams', Team.objects.filter(Q(location__in=locations) | Q(manager__location__in=locations))),
+        ('managers', Manager.objects.filter(location__in=locations)),
+    ]
+
+
+def manager_cascade(managers):
+    """The rows deleting ``managers`` (a queryset or list) removes, as
+    delete_cascade() steps."""
+    return [
+        ('members', Member.objects.filter(Q(manager__in=managers) | Q(team__manager__in=managers))),
+        ('teams', Team.objects.filter(manager__in=managers)),
+    ]
+
+
+@handler('delete_location')
+def delete_location(progress, location_id):
+    location = Location.objects.get(pk=location_id)
+    return delete_cascade(progress, location, location_cascade([location]))
+
+
+@handler('delete_manager')
+def delete_manager(progress, manager_id):
+    manager = Manager.objects.get(pk=manager_id)
+    return delete_cascade(progress, manager, manager_cascade([manager]))
+
+
+def save_upload(uploaded_file):
+    """Copy an upload into settings.JOB_FILES_DIR for a job to read later."""
+    directory = Path(settings.JOB_FILES_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{timezone.now():%Y%m%dT%H%M%S%f}-{Path(uploaded_file.name).name}"
+    with open(path, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+    return str(path)
+
+
+@handler('import')
+def import_file(progress, model, file_format, path, errors_kept=100):
+    try:
+        with open(path, encoding='utf-8-sig') as stream:
+            lines = sum(1 for line in stream if line.strip())
+        progress.set_total(lines - 1 if file_format == 'csv' else lines)
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            result = importexport.import_rows(model, importexport.read_rows(stream, file_format),
+                                              chunk_size=settings.JOB_CHUNK_SIZE,
+                                              progress=progress.advance)
+    finally:
+        Path(path).unlink(missing_ok=True)
+    return {"created": result.created, "rejected": len(result.errors),
+            "errors": [[row_number, {field: [str(message) for message in messages]
+                                     for field, messages in errors.items()}]
+                       for row_number, errors in result.errors[:errors_kept]]}
+
+
+@handler('take_snapshot')
+def take_snapshot(progress, name='', user_id=None):
+    snapshot = snapshots.take(name, User.objects.filter(pk=user_id).first() if user_id else None)
+    return {"snapshot": snapshot.pk, "members": snapshot.member_count, "teams": snapshot.team_count,
+            "managers": snapshot.manager_count, "locations": snapshot.location_count}
@@ -0,0 +1,83 @@
+"""Search-as-you-type pickers for foreign keys and groups.
+
+A plain Select lists every row of the related table, so a member form used
+to carry every team, manager and location. LookupSelect and
+LookupSelectMultiple render only the rows currently chosen; website/lookup.js
+adds a search box that fills the list from the lookup view one page at a
+time. A form page therefore costs the same whatever the size of the tables,
+and the submitted values are validated by the form field as before.
+
+lookup() serves those pages: names matching every word typed, through the
+planner.search index where the kind has one, or rows in id order, keyset
+paginated, when nothing has been typed.
+"""
+from django import forms
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+
+from . import search
+from .models import Location, Manager, Team
+
+"""kind name (as in the lookup URL) -> model."""
+LOOKUP_MODELS = {
+    'team': Team,
+    'manager': Manager,
+    'location': Location,
+    'group': Group,
+}
+
+
+def lookup(kind, query, after=None, offset=0, page_size=20):
+    """Return ([(id, name)], next page parameters or None) for one kind."""
+    model = LOOKUP_MODELS[kind]
+    words = search.TOKEN.findall(query)
+    if words and kind in search.KINDS:
+        results, has_next = search.search(query, kind=kind, limit=page_size, offset=offset)
+        rows = [(result.id, result.name) for result in results]
+        return rows, {'q': query, 'offset': offset + page_size} if has_next else None
+    queryset = model.objects.order_by('pk')
+    for word in words:
+        queryset = queryset.filter(name__icontains=word)
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    rows = list(queryset.values_list('pk', 'name')[:page_size + 1])
+    if len(rows) > page_size:
+        return rows[:page_size], {'q': query, 'after': rows[page_size - 1][0]}
+    return rows, None
+
+
+class LookupSelect(forms.Select):
+    """Select for a ModelChoiceField that renders only the chosen row."""
+
+    class Media:
+        js = ['website/lookup.js']
+
+    def __init__(self, kind, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-lookup'] = reverse('lookup', kwargs={'kind': self.kind})
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        choices = []
+        empty_label = getattr(self.choices.field, 'empty_label', None)
+        if empty_label is not None:
+            choices.append(('', empty_label))
+        pks = [pk for pk in value if pk]
+        if pks:
+            try:
+                choices += [self.choices.choice(obj) for obj in self.choices.queryset.filter(pk__in=pks)]
+            except (ValueError, ValidationError):
+                # A submitted value that is not an id; the field reports it.
+                pass
+        return [(None, [self.create_option(name, option_value, label, str(option_value) in value, index,
+                                           attrs=attrs)], index)
+                for index, (option_value, label) in enumerate(choices)]
+
+
+class LookupSelectMultiple(LookupSelect, forms.SelectMultiple):
+    """SelectMultiple for a ModelMultipleChoiceField that renders only the chosen rows."""
@@ -0,0 +1,115 @@
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from planner.models import Manager, Member, Team, Location
+from planner.synthetic import generate_org
+
+MODELS = (Location, Manager, Team, Member)
+
+
+def lookup_queries():
+    """The planner's lookup paths, as (label, callable) pairs."""
+    team_id = Team.objects.order_by('pk').values_list('pk', flat=True).first()
+    manager_id = Manager.objects.order_by('pk').values_list('pk', flat=True).first()
+    location_id = Location.objects.order_by('pk').values_list('pk', flat=True).first()
+    member_name = Member.objects.order_by('pk').values_list('name', flat=True).first()
+    since = date(2020, 1, 1)
+    return [
+        ("members of a team by name",
+         lambda: list(Member.objects.filter(team_id=team_id).order_by('name')[:50])),
+        ("members reporting to a manager by name",
+         lambda: list(Member.objects.filter(manager_id=manager_id).order_by('name')[:50])),
+        ("members at a location since a date",
+         lambda: list(Member.objects.filter(location_id=location_id, start_date__gte=since)
+                      .order_by('start_date')[:50])),
+        ("newest starters",
+         lambda: list(Member.objects.order_by('-start_date')[:50])),
+        ("member by exact name",
+         lambda: Member.objects.filter(name=member_name).exists()),
+        ("managers at a location by name",
+         lambda: list(Manager.objects.filter(location_id=location_id).order_by('name'))),
+        ("teams at a location by name",
+         lambda: list(Team.objects.filter(location_id=location_id).order_by('name'))),
+        ("location by name",
+         lambda: Location.objects.filter(name='London 1').exists()),
+    ]
+
+
+class Command(BaseCommand):
+    help = ("On a copy of the database, seeded with a synthetic org if it is smaller than --members, "
+            "time the planner lookup queries without and with the lookup indexes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20, help="Runs per query; the median is reported.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        source = connection.settings_dict['NAME']
+        if connection.vendor != 'sqlite' or not Path(str(source)).exists():
+            raise CommandError("The default database must be an SQLite file.")
+        connection.close()
+        with tempfile.TemporaryDirectory() as directory:
+            copy = Path(directory) / 'benchmark.sqlite3'
+            shutil.copyfile(source, copy)
+            connection.settings_dict['NAME'] = str(copy)
+            try:
+                self.benchmark(connection, options)
+            finally:
+                connection.close()
+                connection.settings_dict['NAME'] = source
+
+    def benchmark(self, connection, options):
+        missing = options['members'] - Member.objects.count()
+        if missing > 0:
+            self.stdout.write(f"Seeding {missing} members...")
+            generate_org(locations=50, managers=max(1, missing // 250), teams=max(1, missing // 50),
+                         members=missing, seed=options['seed'])
+
+        queries = lookup_queries()
+        with connection.schema_editor() as editor:
+            for model in MODELS:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+        try:
+            self.analyze(connection)
+            before = self.time_queries(queries, options['repeat'])
+        finally:
+            with connection.schema_editor() as editor:
+                for model in MODELS:
+                    for index in model._meta.indexes:
+                        editor.add_index(model, index)
+        self.analyze(connection)
+        after = self.time_queries(queries, options['repeat'])
+
+        self.stdout.write(f"{'query':<42}{'without (ms)':>14}{'with (ms)':>12}{'speed-up':>10}")
+        for (label, _), without, with_indexes in zip(queries, before, after):
+            self.stdout.write(f"{label:<42}{without:>14.2f}{with_indexes:>12.2f}"
+                              f"{without / with_indexes if with_indexes else float('inf'):>9.1f}x")
+
+    @staticmethod
+    def analyze(connection):
+        """Refresh the planner's statistics so it picks indexes on the new data."""
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+    @staticmethod
+    def time_queries(queries, repeat):
+        medians = []
+        for _, query in queries:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                query()
+                timings.append((time.perf_counter() - start) * 1000)
+            medians.append(statistics.median(timings))
+        return medians
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from planner.importexport import FORMATS, IMPORT_ORDER, DEFAULT_CHUNK_SIZE, export_lines
+
+
+class Command(BaseCommand):
+    help = "Stream locations, managers, teams or members as CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=IMPORT_ORDER)
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', help="File to write. Defaults to standard output.")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        lines = export_lines(options['model'], options['format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.synthetic import generate_org
+
+
+class Command(BaseCommand):
+    help = "Bulk insert a synthetic org: locations, managers, teams and members."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=50)
+        parser.add_argument('--managers', type=int, default=2000)
+        parser.add_argument('--teams', type=int, default=10000)
+        parser.add_argument('--members', type=int, default=500000)
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per INSERT transaction.")
+        parser.add_argument('--seed', type=int, help="Random seed, for a reproducible org.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        def progress(name, count):
+            self.stdout.write(f"{name}: {count} ({time.perf_counter() - start:.1f}s)")
+
+        try:
+            created = generate_org(locations=options['locations'], managers=options['managers'],
+                                   teams=options['teams'], members=options['members'],
+                                   batch_size=options['batch_size'], seed=options['seed'],
+                                   progress=progress)
+        except ValueError as exc:
+            raise CommandError(exc)
+        summary = ", ".join(f"{count} {name}s" for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary} in {time.perf_counter() - start:.1f}s."))
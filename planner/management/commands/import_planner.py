@@ -0,0 +1,33 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.importexport import FORMATS, IMPORT_ORDER, DEFAULT_CHUNK_SIZE, import_file
+
+
+class Command(BaseCommand):
+    help = "Bulk import locations, managers, teams or members from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=IMPORT_ORDER)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS,
+                            help="File format. Defaults to the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Rows validated and inserted per transaction.")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(f"Cannot tell the format of {path}; pass --format.")
+        try:
+            with path.open(encoding='utf-8-sig', newline='') as stream:
+                result = import_file(options['model'], stream, file_format, options['chunk_size'])
+        except OSError as exc:
+            raise CommandError(exc)
+
+        for row_number, errors in result.errors:
+            for field, messages in errors.items():
+                self.stderr.write(f"row {row_number}: {field}: {' '.join(messages)}")
+        self.stdout.write(self.style.SUCCESS(str(result)))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from planner import counters
+
+
+class Command(BaseCommand):
+    help = "Recount the member, team and manager counts on teams, managers and locations, repairing any drift."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            corrected = counters.recount()
+        for name, rows in corrected.items():
+            self.stdout.write(f"{name}: {rows} corrected")
+        if not any(corrected.values()):
+            self.stdout.write(self.style.SUCCESS("All counts were correct."))
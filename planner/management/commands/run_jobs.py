@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from planner import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued planner jobs (cascading deletes, large imports) until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty.")
+        parser.add_argument('--poll', type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--requeue', action='store_true',
+                            help="First put jobs left running by a stopped worker back in the queue.")
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            self.stdout.write(f"Requeued {jobs.requeue_stale()} jobs.")
+        try:
+            while True:
+                close_old_connections()
+                job = jobs.claim_next()
+                if job is None:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll'])
+                    continue
+                self.stdout.write(f"Job {job.pk}: {job.description}")
+                start = time.perf_counter()
+                job = jobs.run(job)
+                self.stdout.write(f"Job {job.pk}: {job.status} in {time.perf_counter() - start:.1f}s")
+                if job.error:
+                    self.stderr.write(job.error)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from planner import snapshots
+
+
+class Command(BaseCommand):
+    help = "Record who is where (members, teams, managers and locations) as a new org snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', default='')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        snapshot = snapshots.take(options['name'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Took {snapshot} (id {snapshot.pk}): {snapshot.member_count} members, {snapshot.team_count} teams, "
+            f"{snapshot.manager_count} managers, {snapshot.location_count} locations, "
+            f"{len(snapshot.data) // 1024} KB in {time.perf_counter() - started:.2f}s."))
@@ -0,0 +1,33 @@
+"""Custom managers and querysets for the planner models. Each queryset knows
+which relations its pages display, so views ask for for_detail() or
+for_list() and get the joins they need in the same query."""
+from django.db import models
+
+
+class TeamQuerySet(models.QuerySet):
+    def for_detail(self):
+        return self.select_related('location', 'manager')
+
+    def for_list(self):
+        return self.select_related('location', 'manager')
+
+
+class MemberQuerySet(models.QuerySet):
+    def for_detail(self):
+        return self.select_related('team', 'location', 'manager')
+
+    def for_list(self):
+        return self.select_related('team', 'location', 'manager')
+
+
+class ManagerQuerySet(models.QuerySet):
+    def for_detail(self):
+        return self.select_related('location')
+
+    def for_list(self):
+        return self.select_related('location')
+
+
+TeamManager = models.Manager.from_queryset(TeamQuerySet)
+MemberManager = models.Manager.from_queryset(MemberQuerySet)
+ManagerManager = models.Manager.from_queryset(ManagerQuerySet)
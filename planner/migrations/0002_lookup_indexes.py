@@ -0,0 +1,57 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['name'], name='location_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='manager',
+            index=models.Index(fields=['name'], name='manager_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='manager',
+            index=models.Index(fields=['location', 'name'], name='manager_location_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['name'], name='member_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['start_date'], name='member_start_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['team', 'name'], name='member_team_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['manager', 'name'], name='member_manager_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['location', 'start_date'], name='member_location_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['name'], name='team_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['location', 'name'], name='team_location_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['manager', 'name'], name='team_manager_name_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# The FTS5 table and its backfill as they were when this migration was
+# written, kept here rather than imported from planner.search so later
+# changes to that module cannot change what this migration does. Each row's
+# rowid is id * 4 + the kind's code.
+TABLE = 'planner_search'
+
+CODES = {'Member': 0, 'Manager': 1, 'Team': 2, 'Location': 3}
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+                       f"name, tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+        for model_name, code in CODES.items():
+            table = apps.get_model('planner', model_name)._meta.db_table
+            cursor.execute(f"INSERT INTO {TABLE} (rowid, name) SELECT id * 4 + %s, name FROM {table}", [code])
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0002_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
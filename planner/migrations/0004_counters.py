@@ -0,0 +1,65 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:21
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# (parent model, counter field, child model, foreign key), as in planner.counters.
+COUNTERS = [
+    ('team', 'member_count', 'member', 'team'),
+    ('manager', 'member_count', 'member', 'manager'),
+    ('location', 'member_count', 'member', 'location'),
+    ('manager', 'team_count', 'team', 'manager'),
+    ('location', 'team_count', 'team', 'location'),
+    ('location', 'manager_count', 'manager', 'location'),
+]
+
+
+def fill_counters(apps, schema_editor):
+    for parent, field, child, foreign_key in COUNTERS:
+        child_model = apps.get_model('planner', child)
+        children = (child_model.objects.filter(**{foreign_key: OuterRef('pk')}).order_by()
+                    .values(foreign_key).annotate(count=Count('pk')).values('count'))
+        apps.get_model('planner', parent).objects.update(
+            **{field: Coalesce(Subquery(children, output_field=IntegerField()), Value(0))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='manager_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='team_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='manager',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='manager',
+            name='team_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import planner.models
+
+TRIGGERS = {
+    'planner_auditentry_no_update': 'UPDATE',
+    'planner_auditentry_no_delete': 'DELETE',
+}
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, operation in TRIGGERS.items():
+        schema_editor.execute(
+            f"CREATE TRIGGER {name} BEFORE {operation} ON planner_auditentry "
+            f"BEGIN SELECT RAISE(ABORT, 'planner_auditentry is append-only'); END")
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in TRIGGERS:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('planner', '0005_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'location'), (2, 'manager'), (3, 'team'), (4, 'member')])),
+                ('object_id', models.PositiveIntegerField()),
+                ('action', models.CharField(choices=[('c', 'Created'), ('u', 'Updated'), ('d', 'Deleted')], max_length=1)),
+                ('changes', models.JSONField(encoder=planner.models.CompactJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='auditentry',
+            index=models.Index(fields=['kind', 'object_id', 'id'], name='audit_object_idx'),
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
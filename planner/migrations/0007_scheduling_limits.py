@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0006_audit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manager',
+            name='span_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Most members the scheduler gives this manager.', null=True),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='target_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Members the scheduler fills this team up to.', null=True),
+        ),
+    ]
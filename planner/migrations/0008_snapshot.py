@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('planner', '0007_scheduling_limits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Snapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('taken_at', models.DateTimeField(auto_now_add=True)),
+                ('member_count', models.PositiveIntegerField()),
+                ('team_count', models.PositiveIntegerField()),
+                ('manager_count', models.PositiveIntegerField()),
+                ('location_count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'get_latest_by': 'taken_at',
+            },
+        ),
+    ]
@@ -1,24 +1,114 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
 from django.contrib.auth.models import Group
+from .managers import TeamManager, MemberManager, ManagerManager
 
 
-class Location(models.Model):
+class TrackedModel(models.Model):
+    """Remembers the column values a row was loaded or last saved with, in
+    ``_loaded_values``, so signal receivers can tell what a save changed.
+    Saves run in a transaction, so what the receivers write (such as the
+    counts in planner.counters) commits or rolls back with the row.
+
+    Fields with editable=False are maintained by UPDATE statements elsewhere.
+    Before saving, the row with the instance's primary key is read, together
+    with any editable columns ``_loaded_values`` lacks (deferred fields, or
+    all of them for an instance that was not loaded as that row). If it
+    exists, only the editable fields are written (through update_fields); if
+    not, as for a copy made by clearing the pk or a row deleted since it was
+    loaded, the row is inserted with those fields back at their defaults,
+    since nothing is counted against it yet."""
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            if not kwargs.get('force_insert'):
+                if self._read_stored_values(using):
+                    if kwargs.get('update_fields') is None:
+                        deferred = self.get_deferred_fields()
+                        kwargs['update_fields'] = [field.name for field in self._editable_fields()
+                                                   if field.attname not in deferred]
+                elif not self._state.adding:
+                    self._reset_maintained_fields()
+            super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: self.__dict__[field.attname]
+                               for field in self._meta.concrete_fields if field.attname in self.__dict__}
+
+    def _editable_fields(self):
+        return [field for field in self._meta.concrete_fields if field.editable and not field.primary_key]
+
+    def _read_stored_values(self, using):
+        """Read the editable columns of the row being saved over that
+        ``_loaded_values`` lacks into it; return False if there is no row."""
+        if self.pk is None:
+            return False
+        pk_attname = self._meta.pk.attname
+        loaded = getattr(self, '_loaded_values', {})
+        if loaded.get(pk_attname) != self.pk:
+            # Loaded as another row, or not loaded at all.
+            loaded = {}
+        missing = [field.attname for field in self._editable_fields() if field.attname not in loaded]
+        row = type(self)._base_manager.using(using).filter(pk=self.pk).values(pk_attname, *missing).first()
+        if row is None:
+            return False
+        self._loaded_values = {**loaded, **row}
+        return True
+
+    def _reset_maintained_fields(self):
+        for field in self._meta.concrete_fields:
+            if not field.editable and field.has_default():
+                setattr(self, field.attname, field.get_default())
+
+
+class Location(TrackedModel):
     name = models.CharField(max_length=255)
+    # Maintained by planner.counters.
+    member_count = models.PositiveIntegerField(default=0, editable=False)
+    team_count = models.PositiveIntegerField(default=0, editable=False)
+    manager_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='location_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name}"
 
 
-class Team(models.Model):
+class Team(TrackedModel):
     name = models.CharField(max_length=255)
     location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='teams_managed_by')
     manager = models.ForeignKey('Manager', on_delete=models.CASCADE, related_name='teams', null=True)
+    target_size = models.PositiveIntegerField(null=True, blank=True,
+                                              help_text="Members the scheduler fills this team up to.")
+    # Maintained by planner.counters.
+    member_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = TeamManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='team_name_idx'),
+            models.Index(fields=['location', 'name'], name='team_location_name_idx'),
+            models.Index(fields=['manager', 'name'], name='team_manager_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name}"
 
 
-class Member(models.Model):
+class Member(TrackedModel):
     name = models.CharField(max_length=255)
     role = models.CharField(max_length=255, default='Member')
     location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='members')
@@ -27,16 +117,140 @@ class Member(models.Model):
     manager = models.ForeignKey('Manager', on_delete=models.CASCADE, related_name='members', null=True)
     groups = models.ManyToManyField(Group, blank=True)
 
+    objects = MemberManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='member_name_idx'),
+            models.Index(fields=['start_date'], name='member_start_date_idx'),
+            models.Index(fields=['team', 'name'], name='member_team_name_idx'),
+            models.Index(fields=['manager', 'name'], name='member_manager_name_idx'),
+            models.Index(fields=['location', 'start_date'], name='member_location_start_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name}"
 
 
-class Manager(models.Model):
+class Manager(TrackedModel):
     name = models.CharField(max_length=255)
     role = models.CharField(max_length=255, default='Manager')
     location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='managers')
     start_date = models.DateField()
     groups = models.ManyToManyField(Group, blank=True)
+    span_limit = models.PositiveIntegerField(null=True, blank=True,
+                                             help_text="Most members the scheduler gives this manager.")
+    # Maintained by planner.counters.
+    member_count = models.PositiveIntegerField(default=0, editable=False)
+    team_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = ManagerManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='manager_name_idx'),
+            models.Index(fields=['location', 'name'], name='manager_location_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name}"
+
+
+class Job(models.Model):
+    """A slow operation queued for the run_jobs worker (see planner.jobs)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    description = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True)
+    result = models.JSONField(null=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='job_status_idx'),
+        ]
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    @property
+    def percent(self):
+        if self.status == self.DONE:
+            return 100
+        if not self.total:
+            return 0
+        return min(100, self.progress * 100 // self.total)
+
+    def __str__(self):
+        return f"{self.description} ({self.status})"
+
+
+class CompactJSONEncoder(DjangoJSONEncoder):
+    item_separator = ','
+    key_separator = ':'
+
+
+class AuditEntry(models.Model):
+    """One recorded change to a planner row (see planner.audit). Append-only."""
+    LOCATION, MANAGER, TEAM, MEMBER = 1, 2, 3, 4
+    KINDS = [(LOCATION, 'location'), (MANAGER, 'manager'), (TEAM, 'team'), (MEMBER, 'member')]
+    CREATED, UPDATED, DELETED = 'c', 'u', 'd'
+    ACTIONS = [(CREATED, 'Created'), (UPDATED, 'Updated'), (DELETED, 'Deleted')]
+
+    kind = models.PositiveSmallIntegerField(choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=1, choices=ACTIONS)
+    # Created: {field: value}. Updated: {field: [old, new]}. Deleted: {field: old value}.
+    changes = models.JSONField(encoder=CompactJSONEncoder)
+    # No constraint, so entries outlive the user and deleting a user never updates the log.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False,
+                             null=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'object_id', 'id'], name='audit_object_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Audit entries cannot be changed.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Audit entries cannot be deleted.")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id} {self.get_action_display().lower()}"
+
+
+class Snapshot(models.Model):
+    """Who was where at one moment, stored column by column (see planner.snapshots)."""
+    name = models.CharField(max_length=255, blank=True)
+    taken_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
+    member_count = models.PositiveIntegerField()
+    team_count = models.PositiveIntegerField()
+    manager_count = models.PositiveIntegerField()
+    location_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        get_latest_by = 'taken_at'
+
+    def __str__(self):
+        label = self.name or "Snapshot"
+        return f"{label} ({self.taken_at:%Y-%m-%d %H:%M})"
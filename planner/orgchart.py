@@ -0,0 +1,268 @@
+"""Materialized Location -> Manager -> Team -> Member tree.
+
+The chart keeps every row it needs in memory together with the child id sets
+for each node, so serving the tree (or one manager's subtree) never reads the
+org tables. It is built with one query per model the first time it is used
+and afterwards patched row by row.
+
+Placement rules:
+    * managers sit under their location;
+    * teams sit under their manager, or under their location if unmanaged;
+    * members sit under their team, else under their manager, else under
+      their location.
+
+Every process keeps its own chart, and changes reach it through the audit log
+(planner.audit), which records each save, delete and bulk write with an
+increasing id. The chart remembers the newest entry it has applied; on each
+use it reads the ids, kinds and object ids of any newer entries (one query on
+the primary key, usually returning nothing) and rereads just those rows,
+patching them in. So a change made by one worker costs the others a lookup
+of the rows it touched, not a rebuild. On SQLite, whose writers are
+serialized, entry ids follow commit order, so no entry can appear behind one
+already applied. The process that made a change also patches its chart from
+the post_save/post_delete receivers as soon as the change commits.
+
+Writes the audit log does not see (bulk writes announced only with
+rows_changed) call invalidate(), which sets a version number in the default
+cache; a process that sees a different version from the one its chart was
+built at rebuilds. Production requires that cache to be shared by every
+worker (capstone.settings_production). A new version is the clock in
+nanoseconds, written without reading the old one, so it needs no atomic
+incr() and an evicted version never comes back to a number some process
+built its chart at. More than CATCH_UP_LIMIT new entries also rebuild,
+which is cheaper than rereading that many rows one batch at a time.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import AuditEntry, Location, Manager, Team, Member
+
+VERSION_KEY = "planner:orgchart:version"
+
+"""Newer audit entries applied by rereading their rows; above this, rebuild."""
+CATCH_UP_LIMIT = 1000
+
+"""Rows reread per query when catching up, under SQLite's parameter limit."""
+READ_CHUNK_SIZE = 900
+
+"""kind -> (model, columns kept in the chart)."""
+TABLES = {
+    "location": (Location, ("id", "name")),
+    "manager": (Manager, ("id", "name", "role", "start_date", "location_id")),
+    "team": (Team, ("id", "name", "location_id", "manager_id")),
+    "member": (Member, ("id", "name", "role", "start_date", "location_id", "team_id", "manager_id")),
+}
+
+"""AuditEntry.kind -> chart kind."""
+AUDIT_KINDS = dict(AuditEntry.KINDS)
+
+CHILD_KEYS = {
+    "location": ("managers", "teams", "members"),
+    "manager": ("teams", "members"),
+    "team": ("members",),
+}
+
+
+class OrgChart:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.built = False
+        self.serialized = None
+        # Id of the newest audit entry the chart reflects.
+        self.seen = 0
+
+    def build(self):
+        with self.lock:
+            # Read before the tables: a change logged in between is applied
+            # again by the next catch_up(), which does no harm.
+            self.seen = AuditEntry.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            self.locations, self.managers, self.teams, self.members = (
+                {row["id"]: row for row in model.objects.values(*columns)} for model, columns in TABLES.values())
+            self.children = defaultdict(set)
+            for manager in self.managers.values():
+                self.children[self._parent_of_manager(manager)].add(("manager", manager["id"]))
+            for team in self.teams.values():
+                self.children[self._parent_of_team(team)].add(("team", team["id"]))
+            for member in self.members.values():
+                self.children[self._parent_of_member(member)].add(("member", member["id"]))
+            self.serialized = None
+            self.built = True
+
+    @staticmethod
+    def _parent_of_manager(row):
+        return ("location", row["location_id"])
+
+    @staticmethod
+    def _parent_of_team(row):
+        if row["manager_id"] is not None:
+            return ("manager", row["manager_id"])
+        return ("location", row["location_id"])
+
+    @staticmethod
+    def _parent_of_member(row):
+        if row["team_id"] is not None:
+            return ("team", row["team_id"])
+        if row["manager_id"] is not None:
+            return ("manager", row["manager_id"])
+        return ("location", row["location_id"])
+
+    def _table(self, kind):
+        return {"location": self.locations, "manager": self.managers,
+                "team": self.teams, "member": self.members}[kind]
+
+    def _parent(self, kind, row):
+        if kind == "manager":
+            return self._parent_of_manager(row)
+        if kind == "team":
+            return self._parent_of_team(row)
+        if kind == "member":
+            return self._parent_of_member(row)
+        return None
+
+    def upsert(self, kind, row):
+        """Insert or replace one row, moving it to its new parent if needed."""
+        with self.lock:
+            if not self.built:
+                return
+            table = self._table(kind)
+            old = table.get(row["id"])
+            if old is not None and self._parent(kind, old) is not None:
+                self.children[self._parent(kind, old)].discard((kind, row["id"]))
+            table[row["id"]] = row
+            if self._parent(kind, row) is not None:
+                self.children[self._parent(kind, row)].add((kind, row["id"]))
+            self.serialized = None
+
+    def remove(self, kind, pk):
+        with self.lock:
+            if not self.built:
+                return
+            old = self._table(kind).pop(pk, None)
+            if old is not None and self._parent(kind, old) is not None:
+                self.children[self._parent(kind, old)].discard((kind, pk))
+            self.children.pop((kind, pk), None)
+            self.serialized = None
+
+    def catch_up(self):
+        """Apply the changes logged since the chart was built or last caught
+        up, by rereading the rows the newer audit entries name."""
+        with self.lock:
+            if not self.built:
+                return
+            entries = list(AuditEntry.objects.filter(id__gt=self.seen).order_by('id')
+                           .values_list('id', 'kind', 'object_id')[:CATCH_UP_LIMIT + 1])
+            if not entries:
+                return
+            if len(entries) > CATCH_UP_LIMIT:
+                self.build()
+                return
+            changed = defaultdict(set)
+            for _, kind, pk in entries:
+                changed[AUDIT_KINDS[kind]].add(pk)
+            for kind, pks in changed.items():
+                model, columns = TABLES[kind]
+                pks = sorted(pks)
+                rows = {}
+                for start in range(0, len(pks), READ_CHUNK_SIZE):
+                    rows.update((row["id"], row) for row in model.objects.filter(
+                        pk__in=pks[start:start + READ_CHUNK_SIZE]).values(*columns))
+                for pk in pks:
+                    if pk in rows:
+                        self.upsert(kind, rows[pk])
+                    else:
+                        self.remove(kind, pk)
+            self.seen = entries[-1][0]
+
+    def node(self, kind, pk):
+        """Return the nested dict for one node and everything below it."""
+        row = dict(self._table(kind)[pk])
+        child_keys = CHILD_KEYS.get(kind, ())
+        for key in child_keys:
+            row[key] = []
+        for child_kind, child_pk in sorted(self.children.get((kind, pk), ())):
+            row[child_kind + "s"].append(self.node(child_kind, child_pk))
+        return row
+
+    def to_json(self):
+        """Serialized full tree, cached until the next change."""
+        with self.lock:
+            if self.serialized is None:
+                tree = [self.node("location", pk) for pk in sorted(self.locations)]
+                self.serialized = json.dumps({"locations": tree}, cls=DjangoJSONEncoder)
+            return self.serialized
+
+    def manager_json(self, pk):
+        """Serialized subtree of everyone reporting to manager ``pk``."""
+        with self.lock:
+            if pk not in self.managers:
+                return None
+            return json.dumps(self.node("manager", pk), cls=DjangoJSONEncoder)
+
+
+chart = OrgChart()
+
+
+def get_chart():
+    """Return the process chart, caught up with changes made elsewhere, or
+    rebuilt if something invalidated every chart."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    with chart.lock:
+        if not chart.built or chart.version != version:
+            chart.build()
+            chart.version = version
+        else:
+            chart.catch_up()
+    return chart
+
+
+def record_change(kind, row=None, pk=None):
+    """Patch this process's chart; other processes catch up from the audit log."""
+    if row is not None:
+        chart.upsert(kind, row)
+    else:
+        chart.remove(kind, pk)
+
+
+def invalidate():
+    """Force a rebuild everywhere, e.g. after bulk_create() or QuerySet.update()."""
+    with chart.lock:
+        chart.built = False
+        chart.serialized = None
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def location_row(instance):
+    return {"id": instance.pk, "name": instance.name}
+
+
+def manager_row(instance):
+    return {"id": instance.pk, "name": instance.name, "role": instance.role,
+            "start_date": instance.start_date, "location_id": instance.location_id}
+
+
+def team_row(instance):
+    return {"id": instance.pk, "name": instance.name,
+            "location_id": instance.location_id, "manager_id": instance.manager_id}
+
+
+def member_row(instance):
+    return {"id": instance.pk, "name": instance.name, "role": instance.role,
+            "start_date": instance.start_date, "location_id": instance.location_id,
+            "team_id": instance.team_id, "manager_id": instance.manager_id}
+
+
+ROW_BUILDERS = {
+    Location: ("location", location_row),
+    Manager: ("manager", manager_row),
+    Team: ("team", team_row),
+    Member: ("member", member_row),
+}
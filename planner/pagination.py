@@ -0,0 +1,125 @@
+"""Keyset pagination helpers: pages are addressed by an id cursor rather
+than an OFFSET, so fetching page 500 costs the same as fetching page 1 and
+no COUNT(*) is needed to know whether there is another page."""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import current_versions, model_key
+
+
+class KeysetPage:
+    """One page of rows plus the cursors needed to move either way."""
+
+    def __init__(self, object_list, page_size, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.page_size = page_size
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def parse_cursor(value):
+    """Return a cursor from a query string value, or None if it is not a positive id."""
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor > 0 else None
+
+
+def clamp_page_size(value, default):
+    """Return the requested page size, bounded by settings.MAX_PAGE_SIZE."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, settings.MAX_PAGE_SIZE))
+
+
+def _page_queryset(queryset, page_size, after, before):
+    if before is not None:
+        return queryset.filter(pk__lt=before).order_by('-pk')[:page_size + 1]
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    return queryset.order_by('pk')[:page_size + 1]
+
+
+def _build_page(rows, page_size, after, before):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before is not None:
+        rows.reverse()
+        previous_cursor = rows[0].pk if has_more and rows else None
+        next_cursor = rows[-1].pk if rows else None
+    else:
+        next_cursor = rows[-1].pk if has_more else None
+        previous_cursor = rows[0].pk if after is not None and rows else None
+    return KeysetPage(rows, page_size, next_cursor, previous_cursor)
+
+
+def keyset_page(queryset, page_size, after=None, before=None):
+    """Return the page of ``queryset`` following ``after`` (or preceding ``before``)
+    ordered by primary key. One extra row is read to tell whether the page
+    has a neighbour, instead of counting the table."""
+    rows = list(_page_queryset(queryset, page_size, after, before))
+    return _build_page(rows, page_size, after, before)
+
+
+async def akeyset_page(queryset, page_size, after=None, before=None):
+    """keyset_page() for async views, using the async ORM."""
+    rows = [row async for row in _page_queryset(queryset, page_size, after, before)]
+    return _build_page(rows, page_size, after, before)
+
+
+def cached_count(queryset, key, timeout=None):
+    """Return a row count that is recomputed at most once per ``timeout`` seconds.
+    The figure may be slightly stale; it is for display, not for paging."""
+    if timeout is None:
+        timeout = settings.DASHBOARD_COUNT_CACHE_TIMEOUT
+    cache_key = f"planner:count:{key}"
+    count = cache.get(cache_key)
+    if count is None:
+        count = queryset.count()
+        cache.set(cache_key, count, timeout)
+    return count
+
+
+async def acached_count(queryset, key, timeout=None):
+    """cached_count() for async views."""
+    if timeout is None:
+        timeout = settings.DASHBOARD_COUNT_CACHE_TIMEOUT
+    cache_key = f"planner:count:{key}"
+    count = await cache.aget(cache_key)
+    if count is None:
+        count = await queryset.acount()
+        await cache.aset(cache_key, count, timeout)
+    return count
+
+
+def versioned_count(queryset):
+    """Return the row count of ``queryset``, cached until its model's table
+    next changes (the model version kept by planner.cache), so paging through
+    a large list counts it once rather than on every page."""
+    query = hashlib.md5(str(queryset.query).encode()).hexdigest()
+    version, = current_versions([model_key(queryset.model)])
+    cache_key = f"planner:count:{queryset.model._meta.label_lower}:{query}:{version}"
+    count = cache.get(cache_key)
+    if count is None:
+        count = queryset.count()
+        cache.set(cache_key, count, settings.PLANNER_CACHE_TIMEOUT)
+    return count
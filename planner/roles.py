@@ -0,0 +1,79 @@
+"""Role checks for planner views. A user's roles are the names of their auth
+groups; they are loaded once per request, kept in the default cache between
+requests and dropped from it whenever the user's groups change. Production
+requires that cache to be shared by all workers (capstone.settings_production),
+so a revoked role stops working everywhere at once."""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import user_passes_test
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+
+ADMIN = 'Admin'
+MEMBER = 'User'
+
+
+def _cache_key(user_id):
+    return f"planner:roles:{user_id}"
+
+
+def get_roles(user):
+    """Return the frozenset of group names for ``user``."""
+    if not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, '_planner_roles', None)
+    if roles is None:
+        roles = cache.get(_cache_key(user.pk))
+        if roles is None:
+            roles = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(_cache_key(user.pk), roles, settings.ROLE_CACHE_TIMEOUT)
+        user._planner_roles = roles
+    return roles
+
+
+def has_role(user, *roles):
+    """True if ``user`` is a superuser or belongs to any of ``roles``."""
+    if user.is_superuser:
+        return True
+    return not get_roles(user).isdisjoint(roles)
+
+
+def invalidate_roles(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def role_required(*roles, login_url=None):
+    """Like user_passes_test, allowing superusers and members of ``roles``."""
+    return user_passes_test(lambda user: has_role(user, *roles), login_url=login_url)
+
+
+admin_required = role_required(ADMIN)
+
+staff_required = user_passes_test(lambda user: user.is_active and user.is_staff)
+
+
+def async_user_passes_test(test_func, login_url=None):
+    """user_passes_test for async views. The user (and anything the test
+    reads, such as roles) is loaded in a worker thread, then set on the
+    request so templates do not touch the database from the event loop."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            def load_and_test():
+                # The test reads request.user, which loads it here through
+                # whichever authentication middleware is installed.
+                user = request.user
+                return user, test_func(user)
+            request.user, passed = await sync_to_async(load_and_test)()
+            if passed:
+                return await view(request, *args, **kwargs)
+            return redirect_to_login(request.get_full_path(), login_url)
+        return wrapped
+    return decorator
+
+
+async_login_required = async_user_passes_test(lambda user: user.is_authenticated)
+
+async_admin_required = async_user_passes_test(lambda user: has_role(user, ADMIN))
@@ -0,0 +1,400 @@
+"""Placing members on teams within team target sizes, managers' spans of
+control and location constraints.
+
+The members to place, the pool, are those without a team and/or a
+selection of members to move. Placing them is a min-cost flow problem. It
+is solved on a network of groups (pool members sharing a location and a
+current team) rather than of members, so the network grows with the number
+of teams, not of members:
+
+    source -> group           the group's size
+    group  -> its team        staying put, free
+    group  -> location hub    MOVE_COST (free for members without a team)
+    hub    -> other hub       RELOCATION_COST, if relocation is allowed
+    hub    -> each team at that location
+    team   -> its manager     room left below the team's target_size
+    manager -> sink           room left within the manager's span_limit
+    group  -> sink            not placed: UNPLACED_COST, or OVER_TARGET_COST
+                              for members left on their team above its target
+
+Every member reaches the sink, so the cheapest flow places as many members
+as it can. It keeps members on their own team where there is room, and moves
+them within their location before moving them anywhere else. A member's
+manager is taken to be their team's manager, so placed members get the new
+team's manager and, if they relocate, its location. Members who stay, or
+cannot be placed, are left as they are. Within a group, those with the
+earliest start date stay, or are placed, first.
+
+schedule() computes a Schedule without changing anything. apply() writes it
+in one transaction: one UPDATE per destination and chunk of ids, then one
+rows_changed signal.
+"""
+import heapq
+import time
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import audit
+from .models import Manager, Member, Team
+from .signals import rows_changed
+
+MOVE_COST = 1
+RELOCATION_COST = 10
+UNPLACED_COST = 1000
+OVER_TARGET_COST = 10000
+
+"""Member ids per UPDATE, below SQLite's limit on query parameters."""
+UPDATE_CHUNK_SIZE = 900
+
+"""Moves listed by name in a preview."""
+SAMPLE_SIZE = 20
+
+INFINITY = float('inf')
+
+
+class FlowNetwork:
+    """A directed graph with integer arc capacities and costs. Arc ``i ^ 1``
+    is the reverse (residual) arc of arc ``i``."""
+
+    def __init__(self):
+        self.arcs_from = []
+        self.head = []
+        self.capacity = []
+        self.cost = []
+
+    def add_node(self):
+        self.arcs_from.append([])
+        return len(self.arcs_from) - 1
+
+    def add_arc(self, tail, head, capacity, cost=0):
+        arc = len(self.head)
+        self.head += [head, tail]
+        self.capacity += [capacity, 0]
+        self.cost += [cost, -cost]
+        self.arcs_from[tail].append(arc)
+        self.arcs_from[head].append(arc + 1)
+        return arc
+
+    def flow(self, arc):
+        return self.capacity[arc ^ 1]
+
+    def min_cost_flow(self, source, sink):
+        """Send as much flow as possible from ``source`` to ``sink`` at the
+        least cost; return (flow, cost).
+
+        Primal-dual: Dijkstra over costs reduced by node potentials finds
+        the cheapest way to the sink, then a Dinic blocking flow fills every
+        path of that cost at once. There is one round per distinct path
+        cost, a handful here, rather than one per augmenting path."""
+        potential = [0] * len(self.arcs_from)
+        total_flow = total_cost = 0
+        while True:
+            distance = self.distances(source, potential)
+            to_sink = distance[sink]
+            if to_sink == INFINITY:
+                return total_flow, total_cost
+            for node, value in enumerate(distance):
+                potential[node] += min(value, to_sink)
+            while True:
+                level = self.levels(source, sink, potential)
+                if level is None:
+                    break
+                pushed = self.blocking_flow(source, sink, level, potential)
+                total_flow += pushed
+                total_cost += pushed * (potential[sink] - potential[source])
+
+    def reduced_cost(self, arc, tail, potential):
+        return self.cost[arc] + potential[tail] - potential[self.head[arc]]
+
+    def distances(self, source, potential):
+        distance = [INFINITY] * len(self.arcs_from)
+        distance[source] = 0
+        queue = [(0, source)]
+        while queue:
+            dist, node = heapq.heappop(queue)
+            if dist > distance[node]:
+                continue
+            for arc in self.arcs_from[node]:
+                if self.capacity[arc] > 0:
+                    head = self.head[arc]
+                    candidate = dist + self.reduced_cost(arc, node, potential)
+                    if candidate < distance[head]:
+                        distance[head] = candidate
+                        heapq.heappush(queue, (candidate, head))
+        return distance
+
+    def admissible(self, arc, tail, potential):
+        return self.capacity[arc] > 0 and self.reduced_cost(arc, tail, potential) == 0
+
+    def levels(self, source, sink, potential):
+        """BFS depth of each node over admissible arcs, or None if the sink is out of reach."""
+        level = [-1] * len(self.arcs_from)
+        level[source] = 0
+        frontier = [source]
+        while frontier:
+            following = []
+            for node in frontier:
+                for arc in self.arcs_from[node]:
+                    head = self.head[arc]
+                    if level[head] < 0 and self.admissible(arc, node, potential):
+                        level[head] = level[node] + 1
+                        following.append(head)
+            frontier = following
+        return level if level[sink] >= 0 else None
+
+    def blocking_flow(self, source, sink, level, potential):
+        """Push flow along admissible arcs that go one level deeper until no
+        path is left (iterative depth-first search)."""
+        next_arc = [0] * len(self.arcs_from)
+        total = 0
+        while True:
+            path, nodes = [], [source]
+            while nodes and nodes[-1] != sink:
+                node = nodes[-1]
+                arcs = self.arcs_from[node]
+                while next_arc[node] < len(arcs):
+                    arc = arcs[next_arc[node]]
+                    head = self.head[arc]
+                    if level[head] == level[node] + 1 and self.admissible(arc, node, potential):
+                        path.append(arc)
+                        nodes.append(head)
+                        break
+                    next_arc[node] += 1
+                else:
+                    # Dead end: never come back here in this phase.
+                    level[node] = -1
+                    nodes.pop()
+                    if path:
+                        path.pop()
+                        next_arc[nodes[-1]] += 1
+            if not nodes:
+                return total
+            pushed = min(self.capacity[arc] for arc in path)
+            for arc in path:
+                self.capacity[arc] -= pushed
+                self.capacity[arc ^ 1] += pushed
+            total += pushed
+
+
+class Group:
+    """Pool members sharing a location and current team (None for none)."""
+
+    def __init__(self, location_id, team_id):
+        self.location_id = location_id
+        self.team_id = team_id
+        # Member ids, earliest start date first.
+        self.members = []
+
+
+class Schedule:
+    """The outcome of schedule(): where members go, and what that does to
+    team and manager headcounts."""
+
+    def __init__(self):
+        # (team id, manager id, location id) -> ids of the members moving there.
+        self.changes = defaultdict(list)
+        self.pool = 0
+        self.placed = 0
+        self.moved = 0
+        self.relocated = 0
+        self.unplaced = 0
+        self.over_target = 0
+        self.cost = 0
+        self.seconds = 0.0
+        self.applied = None
+        self.teams = []
+        self.managers = []
+        self.sample = []
+
+    @property
+    def changed(self):
+        return sum(len(ids) for ids in self.changes.values())
+
+    def as_dict(self):
+        return {"pool": self.pool, "placed": self.placed, "moved": self.moved, "relocated": self.relocated,
+                "unplaced": self.unplaced, "over_target": self.over_target, "changed": self.changed,
+                "applied": self.applied, "seconds": round(self.seconds, 3)}
+
+    def __str__(self):
+        text = (f"{self.pool} members considered: {self.placed} without a team placed, {self.moved} moved "
+                f"to another team, {self.relocated} of these at another location; {self.unplaced} left "
+                f"without a team, {self.over_target} left above their team's target")
+        if self.applied is not None:
+            text += f"; {self.applied} members updated"
+        return text
+
+
+def pool_queryset(ids=None, filters=None, include_unplaced=True):
+    """Members without a team (if ``include_unplaced``) and those selected by
+    ``ids`` and ``filters``, as for planner.bulk."""
+    condition = Q(pk__in=[])
+    if ids or filters:
+        selected = Q(**(filters or {}))
+        if ids:
+            selected &= Q(pk__in=ids)
+        condition |= selected
+    if include_unplaced:
+        condition |= Q(team=None)
+    return Member.objects.filter(condition)
+
+
+def limit(value, default):
+    return value if value is not None else default
+
+
+def schedule(pool, allow_relocation=False, default_target_size=None, default_span_limit=None):
+    """Work out where the members in queryset ``pool`` should go; see the module docstring."""
+    started = time.perf_counter()
+    result = Schedule()
+    groups = {}
+    pool_on_team, pool_under_manager = Counter(), Counter()
+    member_managers = {}
+    for pk, location_id, team_id, manager_id in (pool.order_by('start_date', 'id')
+                                                 .values_list('id', 'location_id', 'team_id', 'manager_id')):
+        group = groups.get((location_id, team_id))
+        if group is None:
+            group = groups[location_id, team_id] = Group(location_id, team_id)
+        group.members.append(pk)
+        member_managers[pk] = manager_id
+        pool_on_team[team_id] += 1
+        pool_under_manager[manager_id] += 1
+    result.pool = size = sum(len(group.members) for group in groups.values())
+
+    teams = {row[0]: row for row in Team.objects.values_list('id', 'name', 'location_id', 'manager_id',
+                                                             'target_size', 'member_count')}
+    managers = {row[0]: row for row in Manager.objects.values_list('id', 'name', 'span_limit', 'member_count')}
+
+    network = FlowNetwork()
+    source, sink = network.add_node(), network.add_node()
+    manager_nodes = {}
+    for manager_id, (_, _, span_limit, member_count) in managers.items():
+        span_limit = limit(span_limit, default_span_limit)
+        if span_limit is not None:
+            manager_nodes[manager_id] = node = network.add_node()
+            room = max(span_limit - (member_count - pool_under_manager[manager_id]), 0)
+            network.add_arc(node, sink, room)
+    hubs = {}
+    for location_id in {row[2] for row in teams.values()} | {group.location_id for group in groups.values()}:
+        hubs[location_id] = network.add_node()
+    team_nodes, hub_arcs = {}, defaultdict(list)
+    for team_id, (_, _, location_id, manager_id, target_size, member_count) in teams.items():
+        team_nodes[team_id] = node = network.add_node()
+        target_size = limit(target_size, default_target_size)
+        room = size if target_size is None else max(target_size - (member_count - pool_on_team[team_id]), 0)
+        network.add_arc(node, manager_nodes.get(manager_id, sink), room)
+        hub_arcs[hubs[location_id]].append((network.add_arc(hubs[location_id], node, size), team_id))
+    if allow_relocation:
+        for location_id, hub in hubs.items():
+            for other_id, other in hubs.items():
+                if other_id != location_id:
+                    hub_arcs[hub].append((network.add_arc(hub, other, size, RELOCATION_COST), None))
+
+    arcs = {}
+    for key, group in groups.items():
+        node = network.add_node()
+        network.add_arc(source, node, len(group.members))
+        placed = group.team_id is not None and group.team_id in team_nodes
+        arcs[key] = (network.add_arc(node, team_nodes[group.team_id], len(group.members)) if placed else None,
+                     network.add_arc(node, hubs[group.location_id], len(group.members),
+                                     MOVE_COST if group.team_id is not None else 0),
+                     network.add_arc(node, sink, len(group.members),
+                                     OVER_TARGET_COST if group.team_id is not None else UNPLACED_COST))
+    _, result.cost = network.min_cost_flow(source, sink)
+
+    remaining = {arc: network.flow(arc) for hub_list in hub_arcs.values() for arc, _ in hub_list}
+
+    def route(hub, amount, own_team):
+        """Split ``amount`` units arriving at ``hub`` over the teams the flow sends them to."""
+        destinations = []
+        # Other teams first, so members are not "moved" onto their own team.
+        for arc, team_id in sorted(hub_arcs[hub], key=lambda item: item[1] == own_team):
+            take = min(amount, remaining[arc])
+            if not take:
+                continue
+            remaining[arc] -= take
+            amount -= take
+            if team_id is None:
+                destinations += route(network.head[arc], take, own_team)
+            else:
+                destinations.append((team_id, take))
+            if not amount:
+                break
+        return destinations
+
+    moved_in, moved_out = Counter(), Counter()
+    managers_in, managers_out = Counter(), Counter()
+    for key, group in sorted(groups.items(), key=lambda item: (item[0][1] is None, item[0])):
+        _, hub_arc, sink_arc = arcs[key]
+        to_hub, to_sink = network.flow(hub_arc), network.flow(sink_arc)
+        if group.team_id is None:
+            movers = group.members[:to_hub]
+            result.unplaced += to_sink
+        else:
+            movers = group.members[len(group.members) - to_hub:] if to_hub else []
+            result.over_target += to_sink
+        position = 0
+        for team_id, count in route(hubs[group.location_id], to_hub, group.team_id):
+            _, _, location_id, manager_id, _, _ = teams[team_id]
+            for pk in movers[position:position + count]:
+                if team_id == group.team_id:
+                    continue
+                result.changes[team_id, manager_id, location_id].append(pk)
+                moved_in[team_id] += 1
+                moved_out[group.team_id] += 1
+                managers_in[manager_id] += 1
+                managers_out[member_managers[pk]] += 1
+                if group.team_id is None:
+                    result.placed += 1
+                else:
+                    result.moved += 1
+                if location_id != group.location_id:
+                    result.relocated += 1
+                if len(result.sample) < SAMPLE_SIZE:
+                    result.sample.append((pk, group.team_id, team_id))
+            position += count
+
+    for team_id in sorted((set(moved_in) | set(moved_out)) - {None}, key=lambda pk: teams[pk][1]):
+        _, name, _, _, target_size, member_count = teams[team_id]
+        result.teams.append({"id": team_id, "name": name, "target_size": limit(target_size, default_target_size),
+                             "before": member_count,
+                             "after": member_count + moved_in[team_id] - moved_out[team_id]})
+    for manager_id in sorted((set(managers_in) | set(managers_out)) - {None}, key=lambda pk: managers[pk][1]):
+        _, name, span_limit, member_count = managers[manager_id]
+        result.managers.append({"id": manager_id, "name": name, "span_limit": limit(span_limit, default_span_limit),
+                                "before": member_count,
+                                "after": member_count + managers_in[manager_id] - managers_out[manager_id]})
+    names = dict(Member.objects.filter(pk__in=[pk for pk, _, _ in result.sample]).values_list('id', 'name'))
+    result.sample = [{"member": names.get(pk), "from": teams[old][1] if old in teams else None,
+                      "to": teams[new][1]} for pk, old, new in result.sample]
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def apply(result):
+    """Write a Schedule; return how many members were updated."""
+    changed = 0
+    with transaction.atomic():
+        for (team_id, manager_id, location_id), ids in result.changes.items():
+            changes = {'team': team_id, 'manager': manager_id, 'location': location_id}
+            for start in range(0, len(ids), UPDATE_CHUNK_SIZE):
+                queryset = Member.objects.filter(pk__in=ids[start:start + UPDATE_CHUNK_SIZE])
+                audit.rows_updated(Member, audit.rows_before(queryset, changes), changes)
+                changed += queryset.update(team_id=team_id, manager_id=manager_id, location_id=location_id)
+        if changed:
+            rows_changed.send(sender=Member, fields=['team', 'manager', 'location'])
+    return changed
+
+
+def run(form, preview=False):
+    """Schedule the members chosen by a valid ScheduleForm, and unless
+    ``preview``, apply the result in the same transaction."""
+    data = form.cleaned_data
+    with transaction.atomic():
+        pool = pool_queryset(data['ids'], data['filters'], data['include_unplaced'])
+        result = schedule(pool, data['allow_relocation'], data['default_target_size'],
+                          data['default_span_limit'])
+        if not preview:
+            result.applied = apply(result)
+    return result
@@ -0,0 +1,145 @@
+"""Name search over members, managers, teams and locations.
+
+On SQLite the names live in an FTS5 table, planner_search, created by
+migration 0003. Each row's rowid encodes the object it came from
+(id * 4 + kind code), so rows are replaced and deleted by rowid and the
+results map back to objects without a join. The table is kept in step by
+the receivers in planner.signals. Other databases fall back to icontains
+queries on the model tables.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+
+from .models import Manager, Member, Team, Location
+
+TABLE = 'planner_search'
+
+"""kind name -> (code stored in the rowid, model, detail URL name)"""
+KINDS = {
+    'member': (0, Member, 'member'),
+    'manager': (1, Manager, 'manager_detail'),
+    'team': (2, Team, 'team'),
+    'location': (3, Location, 'location_detail'),
+}
+
+KIND_BY_CODE = {code: kind for kind, (code, _, _) in KINDS.items()}
+
+KIND_BY_MODEL = {model: kind for kind, (_, model, _) in KINDS.items()}
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _rowid(kind, pk):
+    return pk * 4 + KINDS[kind][0]
+
+
+def create_table(cursor):
+    cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+                   f"name, tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+
+
+def index_object(kind, pk, name):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [_rowid(kind, pk)])
+        cursor.execute(f"INSERT INTO {TABLE} (rowid, name) VALUES (%s, %s)", [_rowid(kind, pk), name])
+
+
+def unindex_object(kind, pk):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [_rowid(kind, pk)])
+
+
+def reindex(kind, cursor=None, full=False):
+    """Bring the entries of one kind in line with its table: drop entries whose
+    row is gone and add rows that have no entry. ``full`` also rewrites the
+    entries that already exist, for when names changed in bulk."""
+    if not enabled():
+        return
+    code, model, _ = KINDS[kind]
+    if cursor is None:
+        with connection.cursor() as cursor:
+            return reindex(kind, cursor, full)
+    table = model._meta.db_table
+    if full:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid %% 4 = %s", [code])
+    else:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid %% 4 = %s AND rowid NOT IN "
+                       f"(SELECT id * 4 + %s FROM {table})", [code, code])
+    cursor.execute(f"INSERT INTO {TABLE} (rowid, name) SELECT id * 4 + %s, name FROM {table} "
+                   f"WHERE id * 4 + %s NOT IN (SELECT rowid FROM {TABLE})", [code, code])
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query where every word must match as a prefix."""
+    return " ".join(f'"{token}"*' for token in TOKEN.findall(query))
+
+
+class Result:
+    def __init__(self, kind, pk, name):
+        self.kind = kind
+        self.id = pk
+        self.name = name
+
+    @property
+    def url(self):
+        return reverse(KINDS[self.kind][2], kwargs={'id': self.id})
+
+    def as_dict(self):
+        return {'kind': self.kind, 'id': self.id, 'name': self.name, 'url': self.url}
+
+
+def search(query, kind=None, limit=20, offset=0):
+    """Return up to ``limit`` results for ``query``, best matches first, and
+    whether there are more."""
+    expression = match_expression(query)
+    if not expression:
+        return [], False
+    if not enabled():
+        return _fallback_search(query, kind, limit, offset)
+
+    sql = f"SELECT rowid, name FROM {TABLE} WHERE {TABLE} MATCH %s"
+    params = [expression]
+    if kind is not None:
+        sql += " AND rowid %% 4 = %s"
+        params.append(KINDS[kind][0])
+    sql += " ORDER BY rank LIMIT %s OFFSET %s"
+    params += [limit + 1, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    results = [Result(KIND_BY_CODE[rowid % 4], rowid // 4, name) for rowid, name in rows[:limit]]
+    return results, len(rows) > limit
+
+
+def matching_ids(query, kind):
+    """An expression for ``pk__in`` selecting the ids of ``kind`` rows whose
+    names match ``query``, for filtering a queryset through the index. Only
+    for SQLite (see enabled())."""
+    return RawSQL(f"SELECT rowid / 4 FROM {TABLE} WHERE {TABLE} MATCH %s AND rowid %% 4 = %s",
+                  [match_expression(query), KINDS[kind][0]])
+
+
+def _fallback_search(query, kind, limit, offset):
+    results = []
+    for kind_name, (_, model, _) in KINDS.items():
+        if kind is not None and kind != kind_name:
+            continue
+        queryset = model.objects.all()
+        for token in TOKEN.findall(query):
+            queryset = queryset.filter(name__icontains=token)
+        results += [Result(kind_name, pk, name) for pk, name in
+                    queryset.order_by('name').values_list('pk', 'name')[:offset + limit + 1]]
+    results.sort(key=lambda result: result.name)
+    page = results[offset:offset + limit + 1]
+    return page[:limit], len(page) > limit
@@ -0,0 +1,161 @@
+"""Signals and signal receivers for the planner app. The receivers are
+connected in PlannerConfig.ready()."""
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from . import analytics, audit, auth, cache, counters, orgchart, search
+from .models import Location, Manager, Team, Member
+from .roles import invalidate_roles
+
+"""Sent with sender=<model class> after a bulk write, such as bulk_create()
+or QuerySet.update(), that skipped the per-row post_save/post_delete
+signals. Receivers should refresh anything derived
+from that model's table. ``fields``, if sent, names the only columns that
+changed."""
+rows_changed = Signal()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_roles(instance.pk)
+    elif pk_set:
+        invalidate_roles(*pk_set)
+    else:
+        invalidate_roles(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    invalidate_roles(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    auth.forget_users(instance.pk)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_save, sender=Manager)
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=Member)
+def update_org_chart(sender, instance, **kwargs):
+    kind, build_row = orgchart.ROW_BUILDERS[sender]
+    row = build_row(instance)
+    transaction.on_commit(lambda: orgchart.record_change(kind, row=row))
+
+
+@receiver(post_delete, sender=Location)
+@receiver(post_delete, sender=Manager)
+@receiver(post_delete, sender=Team)
+@receiver(post_delete, sender=Member)
+def remove_from_org_chart(sender, instance, **kwargs):
+    kind, _ = orgchart.ROW_BUILDERS[sender]
+    pk = instance.pk
+    transaction.on_commit(lambda: orgchart.record_change(kind, pk=pk))
+
+
+@receiver(rows_changed)
+def rebuild_org_chart(sender, **kwargs):
+    transaction.on_commit(orgchart.invalidate)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_save, sender=Manager)
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=Member)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'name' in update_fields:
+        search.index_object(search.KIND_BY_MODEL[sender], instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=Location)
+@receiver(post_delete, sender=Manager)
+@receiver(post_delete, sender=Team)
+@receiver(post_delete, sender=Member)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.unindex_object(search.KIND_BY_MODEL[sender], instance.pk)
+
+
+@receiver(rows_changed)
+def reindex_search(sender, fields=None, **kwargs):
+    if fields is None or 'name' in fields:
+        search.reindex(search.KIND_BY_MODEL[sender], full=fields is not None)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_save, sender=Manager)
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=Location)
+@receiver(post_delete, sender=Manager)
+@receiver(post_delete, sender=Team)
+@receiver(post_delete, sender=Member)
+def expire_cached_object(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: cache.object_changed(sender, pk))
+
+
+@receiver(rows_changed)
+def expire_cached_rows(sender, **kwargs):
+    transaction.on_commit(lambda: cache.rows_changed(sender))
+
+
+@receiver(post_save, sender=Member)
+def count_saved_member(sender, instance, created, **kwargs):
+    if analytics.hires_moved(instance, created):
+        transaction.on_commit(analytics.hires_changed)
+
+
+@receiver(post_delete, sender=Member)
+def count_deleted_member(sender, instance, **kwargs):
+    transaction.on_commit(analytics.hires_changed)
+
+
+@receiver(rows_changed, sender=Member)
+def recount_hires(sender, fields=None, **kwargs):
+    if fields is None or 'start_date' in fields:
+        transaction.on_commit(analytics.hires_changed)
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=Manager)
+@receiver(post_save, sender=Member)
+def count_saved_child(sender, instance, created, **kwargs):
+    counters.child_saved(instance, created)
+
+
+@receiver(post_delete, sender=Team)
+@receiver(post_delete, sender=Manager)
+@receiver(post_delete, sender=Member)
+def count_deleted_child(sender, instance, **kwargs):
+    counters.child_deleted(instance)
+
+
+@receiver(rows_changed, sender=Team)
+@receiver(rows_changed, sender=Manager)
+@receiver(rows_changed, sender=Member)
+def recount_children(sender, fields=None, **kwargs):
+    counters.recount(sender, fields)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_save, sender=Manager)
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=Member)
+def audit_saved(sender, instance, created, **kwargs):
+    audit.record_saved(sender, instance, created)
+
+
+@receiver(post_delete, sender=Location)
+@receiver(post_delete, sender=Manager)
+@receiver(post_delete, sender=Team)
+@receiver(post_delete, sender=Member)
+def audit_deleted(sender, instance, **kwargs):
+    audit.record_deleted(sender, instance)
@@ -0,0 +1,219 @@
+"""Point-in-time snapshots of the org: who is where, and what changed since.
+
+take() records which location, team and manager every member belongs to,
+which location and manager every team has, and every manager's location,
+as one Snapshot row. The state is stored column by column: for each table
+its ids in ascending order, then one column per foreign key in the same
+order (0 for none), as 64-bit integer arrays. The id column is stored as
+the gaps between ids, which are nearly all 1, and each column is zlib
+compressed, so a snapshot of 500k members is a few megabytes at most.
+
+diff() compares two states in memory and lists, per table, the rows that
+joined, the rows that left and the rows that moved (changed any of their
+assignments). A state is a Snapshot or current(), which reads the live
+tables the same way, so "what changed since X" is diff(X, current()).
+"""
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, compress, repeat
+from operator import ne, or_, sub
+
+from django.db import transaction
+
+from .models import Location, Manager, Member, Snapshot, Team
+
+FORMAT_VERSION = 1
+
+"""zlib level: 1 is several times faster than the default and barely larger
+on columns of small, repetitive ids."""
+COMPRESS_LEVEL = 1
+
+"""(kind, model, foreign keys) recorded per table, in storage order."""
+TABLES = [
+    ('member', Member, ['location', 'team', 'manager']),
+    ('team', Team, ['location', 'manager']),
+    ('manager', Manager, ['location']),
+    ('location', Location, []),
+]
+
+MODELS = {kind: model for kind, model, _ in TABLES}
+
+FIELDS = {kind: fields for kind, _, fields in TABLES}
+
+
+class Table:
+    """One table's state: ``ids`` ascending, and ``columns`` {field: array}
+    holding each row's foreign key (0 for none) in the same order."""
+
+    def __init__(self, kind, ids, columns):
+        self.kind = kind
+        self.ids = ids
+        self.columns = columns
+
+    def assignments(self):
+        """Each row's foreign keys as a tuple, in id order."""
+        columns = [self.columns[field] for field in FIELDS[self.kind]]
+        return zip(*columns) if columns else repeat((), len(self.ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def current():
+    """The live tables as {kind: Table}, read in one transaction so the
+    tables agree with each other."""
+    state = {}
+    with transaction.atomic():
+        for kind, model, fields in TABLES:
+            rows = model.objects.order_by('pk').values_list('pk', *(f"{field}_id" for field in fields))
+            columns = list(zip(*rows)) or [()] * (len(fields) + 1)
+            state[kind] = Table(kind, array('q', columns[0]), {
+                field: array('q', [pk or 0 for pk in column]) for field, column in zip(fields, columns[1:])})
+    return state
+
+
+def encode(state):
+    parts = [struct.pack('<B', FORMAT_VERSION)]
+    for kind, _, fields in TABLES:
+        table = state[kind]
+        gaps = array('q', map(sub, table.ids, [0, *table.ids]))
+        for column in [gaps] + [table.columns[field] for field in fields]:
+            data = zlib.compress(column.tobytes(), COMPRESS_LEVEL)
+            parts += [struct.pack('<I', len(data)), data]
+    return b''.join(parts)
+
+
+def decode(data):
+    data = memoryview(data)
+    version, = struct.unpack_from('<B', data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unknown snapshot format {version}.")
+    offset = 1
+    state = {}
+
+    def column():
+        nonlocal offset
+        length, = struct.unpack_from('<I', data, offset)
+        values = array('q')
+        values.frombytes(zlib.decompress(data[offset + 4:offset + 4 + length]))
+        offset += 4 + length
+        return values
+
+    for kind, _, fields in TABLES:
+        ids = array('q', accumulate(column()))
+        state[kind] = Table(kind, ids, {field: column() for field in fields})
+    return state
+
+
+def take(name='', user=None):
+    """Record the current state as a new Snapshot."""
+    state = current()
+    return Snapshot.objects.create(
+        name=name, created_by=user, data=encode(state),
+        member_count=len(state['member']), team_count=len(state['team']),
+        manager_count=len(state['manager']), location_count=len(state['location']))
+
+
+def load(snapshot):
+    """The state recorded by ``snapshot``, kept on it once decoded."""
+    if not hasattr(snapshot, '_state_tables'):
+        snapshot._state_tables = decode(snapshot.data)
+    return snapshot._state_tables
+
+
+class TableDiff:
+    """How one table changed: ``joined`` [(id, assignment)], ``left``
+    [(id, assignment)] and ``moved`` [(id, old assignment, new assignment)],
+    each in id order. An assignment is a tuple of foreign keys, 0 for none,
+    in the order of FIELDS[kind]."""
+
+    def __init__(self, kind, joined, left, moved):
+        self.kind = kind
+        self.fields = FIELDS[kind]
+        self.joined = joined
+        self.left = left
+        self.moved = moved
+
+    def counts(self):
+        return {'joined': len(self.joined), 'left': len(self.left), 'moved': len(self.moved)}
+
+    def as_dict(self):
+        return {
+            'fields': self.fields,
+            'joined': [[pk, *assignment] for pk, assignment in self.joined],
+            'left': [[pk, *assignment] for pk, assignment in self.left],
+            'moved': [[pk, list(old), list(new)] for pk, old, new in self.moved],
+        }
+
+
+def positions(ids, wanted):
+    """Indexes in the ascending array ``ids`` of the ids in ``wanted``, ascending."""
+    return [bisect_left(ids, pk) for pk in sorted(wanted)]
+
+
+def rows_at(table, indexes):
+    """[(id, assignment)] of the rows of ``table`` at ``indexes``."""
+    columns = [table.columns[field] for field in FIELDS[table.kind]]
+    return [(table.ids[index], tuple(column[index] for column in columns)) for index in indexes]
+
+
+def without(table, indexes):
+    """``table`` less the rows at ``indexes`` (ascending), copied a slice at a time."""
+    def cut(column):
+        kept, start = array('q'), 0
+        for index in indexes:
+            kept.extend(column[start:index])
+            start = index + 1
+        kept.extend(column[start:])
+        return kept
+    return Table(table.kind, cut(table.ids), {field: cut(column) for field, column in table.columns.items()})
+
+
+def diff_table(old, new):
+    # Whole columns are only handled by C-level code (set operations, array
+    # slices and comparisons, map() and compress()); Python only loops over
+    # the rows that changed.
+    joined = left = []
+    if old.ids != new.ids:
+        old_ids, new_ids = set(old.ids), set(new.ids)
+        joined_at = positions(new.ids, new_ids - old_ids)
+        left_at = positions(old.ids, old_ids - new_ids)
+        joined, left = rows_at(new, joined_at), rows_at(old, left_at)
+        old, new = without(old, left_at), without(new, joined_at)
+    # old and new now hold the same ids in the same order.
+    differs = None
+    for field in FIELDS[new.kind]:
+        if old.columns[field] == new.columns[field]:
+            continue
+        changed = map(ne, old.columns[field], new.columns[field])
+        differs = changed if differs is None else map(or_, differs, changed)
+    moved = []
+    if differs is not None:
+        moved_at = list(compress(range(len(new.ids)), differs))
+        moved = [(pk, before, after) for (pk, before), (_, after)
+                 in zip(rows_at(old, moved_at), rows_at(new, moved_at))]
+    return TableDiff(new.kind, joined, left, moved)
+
+
+def diff(old, new):
+    """{kind: TableDiff} between two states ({kind: Table})."""
+    return {kind: diff_table(old[kind], new[kind]) for kind, _, _ in TABLES}
+
+
+def names(diffs, shown):
+    """{kind: {id: name}} for the rows, and the rows they are assigned to,
+    in the first ``shown`` entries of each list: one query per table. Rows
+    deleted since are left out."""
+    wanted = {kind: set() for kind in MODELS}
+    for table_diff in diffs.values():
+        entries = (table_diff.joined[:shown] + table_diff.left[:shown] +
+                   [(pk, old + new) for pk, old, new in table_diff.moved[:shown]])
+        for pk, assignment in entries:
+            wanted[table_diff.kind].add(pk)
+            for index, related in enumerate(assignment):
+                if related:
+                    wanted[table_diff.fields[index % len(table_diff.fields)]].add(related)
+    return {kind: dict(MODELS[kind].objects.filter(pk__in=pks).values_list('pk', 'name')) if pks else {}
+            for kind, pks in wanted.items()}
@@ -0,0 +1,97 @@
+"""Synthetic org data for benchmarks and load tests.
+
+generate_org() bulk inserts a consistent org: every manager works at a
+location, every team belongs to a manager at the same location, and every
+member sits in a team and reports to that team's manager.
+"""
+import random
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from .models import Manager, Member, Team, Location
+from .signals import rows_changed
+
+FIRST_NAMES = [
+    "Aisha", "Ben", "Chloe", "Dev", "Elena", "Finn", "Grace", "Hiro", "Isla", "Jamal",
+    "Kate", "Liam", "Maya", "Noah", "Olga", "Priya", "Quinn", "Rosa", "Sam", "Tariq",
+    "Uma", "Victor", "Wen", "Ximena", "Yusuf", "Zoe",
+]
+
+LAST_NAMES = [
+    "Adams", "Brown", "Chen", "Davies", "Evans", "Fischer", "Garcia", "Hughes", "Ito",
+    "Jones", "Khan", "Lopez", "Murphy", "Novak", "O'Brien", "Patel", "Quist", "Rossi",
+    "Smith", "Taylor", "Usman", "Visser", "Walsh", "Xu", "Young", "Zhang",
+]
+
+CITIES = [
+    "Aberdeen", "Belfast", "Cardiff", "Dundee", "Edinburgh", "Glasgow", "Inverness",
+    "Leeds", "Liverpool", "London", "Manchester", "Newcastle", "Norwich", "Oxford",
+    "Plymouth", "Sheffield", "Swansea", "York",
+]
+
+TEAM_WORDS = [
+    "Platform", "Payments", "Search", "Billing", "Mobile", "Data", "Support", "Security",
+    "Growth", "Infrastructure", "Design", "Research", "Operations", "Finance", "Sales",
+]
+
+FIRST_START_DATE = date(2000, 1, 1)
+
+
+def _person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _start_date(rng):
+    return FIRST_START_DATE + timedelta(days=rng.randrange((date.today() - FIRST_START_DATE).days))
+
+
+def _insert(model, objects, batch_size):
+    with transaction.atomic():
+        return model.objects.bulk_create(objects, batch_size=batch_size)
+
+
+def generate_org(locations=10, managers=100, teams=500, members=10000, batch_size=5000, seed=None,
+                 progress=None):
+    """Insert a synthetic org of the given size and return the created counts.
+
+    ``progress``, if given, is called with (model name, rows inserted so far)."""
+    if min(locations, managers, teams) < 1 and members:
+        raise ValueError("Members need at least one location, manager and team.")
+    rng = random.Random(seed)
+    report = progress or (lambda name, count: None)
+
+    location_objects = _insert(Location, [
+        Location(name=f"{CITIES[i % len(CITIES)]} {i // len(CITIES) + 1}") for i in range(locations)
+    ], batch_size)
+    report('location', len(location_objects))
+
+    manager_objects = _insert(Manager, [
+        Manager(name=_person(rng), location=rng.choice(location_objects), start_date=_start_date(rng))
+        for _ in range(managers)
+    ], batch_size)
+    report('manager', len(manager_objects))
+
+    team_objects = []
+    for i in range(teams):
+        manager = manager_objects[i % len(manager_objects)]
+        team_objects.append(Team(name=f"{rng.choice(TEAM_WORDS)} {i + 1}",
+                                 location_id=manager.location_id, manager=manager))
+    team_objects = _insert(Team, team_objects, batch_size)
+    report('team', len(team_objects))
+
+    created = 0
+    while created < members:
+        batch = []
+        for _ in range(min(batch_size, members - created)):
+            team = rng.choice(team_objects)
+            batch.append(Member(name=_person(rng), location_id=team.location_id, start_date=_start_date(rng),
+                                team=team, manager_id=team.manager_id))
+        _insert(Member, batch, batch_size)
+        created += len(batch)
+        report('member', created)
+
+    for model in (Location, Manager, Team, Member):
+        rows_changed.send(sender=model)
+    return {'location': len(location_objects), 'manager': len(manager_objects),
+            'team': len(team_objects), 'member': created}
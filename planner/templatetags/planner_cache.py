@@ -0,0 +1,46 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+
+from planner.cache import fragment_key, record
+
+register = template.Library()
+
+
+class VersionedCacheNode(template.Node):
+    """Reads and writes the cache synchronously, like the rest of template
+    rendering; async views render templates using it in a worker thread
+    (planner.async_views.arender), so that I/O stays off the event loop."""
+
+    def __init__(self, nodelist, name, objects):
+        self.nodelist = nodelist
+        self.name = name
+        self.objects = objects
+
+    def render(self, context):
+        objects = [obj.resolve(context) for obj in self.objects]
+        key = fragment_key(self.name, objects)
+        content = cache.get(key)
+        record(self.name, content is not None)
+        if content is None:
+            content = self.nodelist.render(context)
+            cache.set(key, content, settings.PLANNER_CACHE_TIMEOUT)
+        return content
+
+
+@register.tag
+def versioned_cache(parser, token):
+    """Cache the enclosed fragment until one of the given objects changes.
+
+        {% versioned_cache "team_detail" team team.location team.manager %}
+            ...
+        {% endversioned_cache %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a fragment name and at least one object.")
+    name = bits[1].strip('"\'')
+    objects = [parser.compile_filter(bit) for bit in bits[2:]]
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+    return VersionedCacheNode(nodelist, name, objects)
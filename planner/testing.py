@@ -0,0 +1,27 @@
+"""Test helpers for keeping views inside a fixed query budget.
+
+    with assert_max_queries(3):
+        client.get(reverse('team', args=[team.id]))
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def assert_max_queries(budget, using=DEFAULT_DB_ALIAS):
+    """Fail with the captured SQL if the block runs more than ``budget`` queries."""
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    executed = len(context.captured_queries)
+    if executed > budget:
+        queries = "\n".join(f"{i}. {query['sql']}" for i, query in enumerate(context.captured_queries, start=1))
+        raise AssertionError(f"{executed} queries executed, budget is {budget}:\n{queries}")
+
+
+class QueryBudgetMixin:
+    """TestCase mixin exposing assert_max_queries as self.assertMaxQueries."""
+
+    def assertMaxQueries(self, budget, using=DEFAULT_DB_ALIAS):
+        return assert_max_queries(budget, using=using)
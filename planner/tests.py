@@ -0,0 +1,1080 @@
+import io
+import json
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import (analytics, audit, bulk, cache as page_cache, counters, importexport, jobs, orgchart, scheduler, search,
+               snapshots)
+from .forms import BulkMemberForm
+from .models import AuditEntry, Job, Location, Manager, Member, Snapshot, Team
+from .roles import ADMIN, MEMBER, get_roles, has_role
+from .signals import rows_changed
+from .synthetic import generate_org
+from .testing import QueryBudgetMixin
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """The dashboard, list and detail pages run a fixed number of queries
+    however many rows the org has. Each page is requested with the page cache
+    emptied, so the budget covers rendering it, not serving it from the cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_org(locations=5, managers=20, teams=60, members=600, seed=1)
+        cls.user = User.objects.create_user('planner', password='planner-pass-123')
+        cls.user.groups.add(Group.objects.create(name=ADMIN))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get(self, url):
+        cache.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_welcome(self):
+        with self.assertMaxQueries(8):
+            self.get(reverse('welcome'))
+
+    def test_welcome_next_page(self):
+        after = Member.objects.order_by('pk').values_list('pk', flat=True)[30]
+        with self.assertMaxQueries(8):
+            self.get(f"{reverse('welcome')}?member_after={after}&team_size=50")
+
+    def test_manager_list(self):
+        with self.assertMaxQueries(3):
+            self.get(reverse('manager'))
+
+    def test_location_list(self):
+        with self.assertMaxQueries(4):
+            self.get(reverse('location'))
+
+    def test_manager_detail(self):
+        with self.assertMaxQueries(4):
+            self.get(reverse('manager_detail', args=[Manager.objects.first().pk]))
+
+    def test_team_detail(self):
+        with self.assertMaxQueries(4):
+            self.get(reverse('team', args=[Team.objects.first().pk]))
+
+    def test_member_detail(self):
+        with self.assertMaxQueries(4):
+            self.get(reverse('member', args=[Member.objects.first().pk]))
+
+    def test_location_detail(self):
+        with self.assertMaxQueries(5):
+            self.get(reverse('location_detail', args=[Location.objects.first().pk]))
+
+    def test_budget_does_not_grow_with_the_org(self):
+        urls = [reverse('welcome'), reverse('manager'), reverse('location')]
+        before = {}
+        for url in urls:
+            with self.assertMaxQueries(100) as context:
+                self.get(url)
+            before[url] = len(context.captured_queries)
+        generate_org(locations=5, managers=20, teams=60, members=600, seed=2)
+        for url in urls:
+            with self.assertMaxQueries(before[url]):
+                self.get(url)
+
+
+class ImportTests(TestCase):
+    """Bad JSON Lines input is reported per row, and whatever was written
+    before a failure is announced with rows_changed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.location = Location.objects.create(name="Leeds")
+
+    def import_lines(self, lines, chunk_size=100):
+        return importexport.import_rows('member', importexport.read_rows(io.StringIO("\n".join(lines)), 'jsonl'),
+                                        chunk_size=chunk_size)
+
+    def test_bad_lines_are_row_errors(self):
+        result = self.import_lines([
+            '{"name": "Ann", "location": "Leeds", "start_date": "2020-01-01"}',
+            '{"name": "Bob", "location": "Leeds"',
+            '["Cat", "Leeds"]',
+            '{"name": "Dan", "location": 3, "start_date": "2020-01-01"}',
+            '{"name": "Eve", "location": "Leeds", "start_date": 20200101}',
+            '{"name": "Fay", "location": "Leeds", "start_date": {"year": 2020}}',
+        ])
+        self.assertEqual(result.created, 1)
+        errors = dict(result.errors)
+        self.assertEqual(sorted(errors), [2, 3, 4, 5, 6])
+        self.assertIn("Not valid JSON", errors[2][NON_FIELD_ERRORS][0])
+        self.assertEqual(errors[3], {NON_FIELD_ERRORS: ["Each row must be a JSON object."]})
+        self.assertEqual(errors[4], {'location': ["No row named '3'."]})
+        self.assertIn('start_date', errors[5])
+        self.assertEqual(errors[6], {'start_date': ["Expected text, not dict."]})
+        self.assertEqual(list(Member.objects.values_list('name', flat=True)), ["Ann"])
+
+    def test_rows_changed_is_sent_when_a_later_chunk_fails(self):
+        def rows():
+            yield {'name': "Ann", 'location': "Leeds", 'start_date': "2020-01-01"}
+            raise OSError("Upload truncated.")
+
+        received = []
+
+        def receiver(sender, **kwargs):
+            received.append(sender)
+
+        rows_changed.connect(receiver)
+        self.addCleanup(rows_changed.disconnect, receiver)
+        with self.assertRaises(OSError):
+            importexport.import_rows('member', rows(), chunk_size=1)
+        self.assertEqual(Member.objects.count(), 1)
+        self.assertEqual(received, [Member])
+
+
+class ApiETagTests(TestCase):
+    """Row ETags come from the row itself, so a change made anywhere (here a
+    QuerySet.update() that no signal announces) changes the tag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        location = Location.objects.create(name="Leeds")
+        manager = Manager.objects.create(name="Bea", location=location, start_date=date(2019, 1, 1))
+        team = Team.objects.create(name="Payments", location=location, manager=manager)
+        cls.member = Member.objects.create(name="Ann", location=location, start_date=date(2020, 1, 1),
+                                           team=team, manager=manager)
+        cls.user = User.objects.create_user('planner', password='planner-pass-123')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('api_detail', args=['members', self.member.pk])
+
+    def test_if_none_match(self):
+        tag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=tag).status_code, 304)
+        Member.objects.filter(pk=self.member.pk).update(name="Ann Smith")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], tag)
+
+    def test_if_match_refuses_a_stale_tag(self):
+        tag = self.client.get(self.url)['ETag']
+        Member.objects.filter(pk=self.member.pk).update(name="Ann Smith")
+        response = self.client.patch(self.url, {'name': "Ann Jones"}, content_type='application/json',
+                                     HTTP_IF_MATCH=tag)
+        self.assertEqual(response.status_code, 412)
+        tag = self.client.get(self.url)['ETag']
+        response = self.client.patch(self.url, {'name': "Ann Jones"}, content_type='application/json',
+                                     HTTP_IF_MATCH=tag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Member.objects.get(pk=self.member.pk).name, "Ann Jones")
+
+
+class CounterTests(TestCase):
+    """The member, team and manager counts on parent rows follow single
+    saves and deletes, cascades and bulk writes announced with rows_changed,
+    without drifting from the child tables."""
+
+    def setUp(self):
+        self.leeds, self.york = Location.objects.create(name="Leeds"), Location.objects.create(name="York")
+        self.bea = Manager.objects.create(name="Bea", location=self.leeds, start_date=date(2019, 1, 1))
+        self.cal = Manager.objects.create(name="Cal", location=self.york, start_date=date(2019, 1, 1))
+        self.payments = Team.objects.create(name="Payments", location=self.leeds, manager=self.bea)
+        self.search = Team.objects.create(name="Search", location=self.york, manager=self.cal)
+        self.members = [Member.objects.create(name=f"Member {i}", location=self.leeds, start_date=date(2020, 1, 1),
+                                              team=self.payments, manager=self.bea) for i in range(3)]
+
+    def assertCounts(self, obj, **expected):
+        obj.refresh_from_db()
+        self.assertEqual({field: getattr(obj, field) for field in expected}, expected)
+
+    def assertNoDrift(self):
+        self.assertEqual(set(counters.recount().values()), {0})
+
+    def test_create(self):
+        self.assertCounts(self.payments, member_count=3)
+        self.assertCounts(self.bea, member_count=3, team_count=1)
+        self.assertCounts(self.leeds, member_count=3, team_count=1, manager_count=1)
+        self.assertNoDrift()
+
+    def test_move(self):
+        member = Member.objects.get(pk=self.members[0].pk)
+        member.team, member.manager, member.location = self.search, self.cal, self.york
+        member.save()
+        self.assertCounts(self.payments, member_count=2)
+        self.assertCounts(self.search, member_count=1)
+        self.assertCounts(self.bea, member_count=2)
+        self.assertCounts(self.cal, member_count=1)
+        self.assertCounts(self.leeds, member_count=2)
+        self.assertCounts(self.york, member_count=1)
+        self.assertNoDrift()
+
+    def test_clear_team(self):
+        member = Member.objects.get(pk=self.members[0].pk)
+        member.team = None
+        member.save()
+        self.assertCounts(self.payments, member_count=2)
+        self.assertCounts(self.bea, member_count=3)
+        self.assertNoDrift()
+
+    def test_delete(self):
+        Member.objects.get(pk=self.members[0].pk).delete()
+        self.assertCounts(self.payments, member_count=2)
+        self.assertCounts(self.bea, member_count=2)
+        self.assertCounts(self.leeds, member_count=2)
+        self.assertNoDrift()
+
+    def test_cascade(self):
+        Manager.objects.get(pk=self.bea.pk).delete()
+        self.assertFalse(Team.objects.filter(pk=self.payments.pk).exists())
+        self.assertCounts(self.leeds, member_count=0, team_count=0, manager_count=0)
+        self.assertCounts(self.york, member_count=0, team_count=1, manager_count=1)
+        self.assertNoDrift()
+
+    def test_rows_changed_recounts(self):
+        Member.objects.filter(pk__in=[member.pk for member in self.members[:2]]).update(team=self.search)
+        rows_changed.send(sender=Member, fields=['team'])
+        self.assertCounts(self.payments, member_count=1)
+        self.assertCounts(self.search, member_count=2)
+        self.assertNoDrift()
+
+    def test_recount_repairs_drift(self):
+        Team.objects.filter(pk=self.payments.pk).update(member_count=10)
+        self.assertEqual(counters.recount()['Team.member_count'], 1)
+        self.assertCounts(self.payments, member_count=3)
+
+    def test_copy(self):
+        team = Team.objects.get(pk=self.payments.pk)
+        team.pk = None
+        team.name = "Payments Copy"
+        team.save()
+        self.assertNotEqual(team.pk, self.payments.pk)
+        self.assertCounts(team, name="Payments Copy", member_count=0)
+        self.assertCounts(self.payments, name="Payments", member_count=3)
+        self.assertCounts(self.bea, team_count=2)
+        self.assertNoDrift()
+
+    def test_move_with_deferred_foreign_keys(self):
+        member = Member.objects.only('name').get(pk=self.members[0].pk)
+        member.team, member.manager, member.location = self.search, self.cal, self.york
+        with mock.patch.object(counters.Counter, 'recount') as recount:
+            member.save()
+        recount.assert_not_called()
+        self.assertCounts(self.payments, member_count=2)
+        self.assertCounts(self.search, member_count=1)
+        self.assertCounts(self.cal, member_count=1)
+        self.assertCounts(self.york, member_count=1)
+        self.assertNoDrift()
+
+    def test_save_writes_only_editable_fields(self):
+        team = Team.objects.get(pk=self.payments.pk)
+        Team.objects.filter(pk=team.pk).update(member_count=10)
+        team.name = "Payments Platform"
+        team.save()
+        self.assertCounts(team, name="Payments Platform", member_count=10)
+
+    def test_saving_a_deleted_row_inserts_it_again(self):
+        team = Team.objects.get(pk=self.payments.pk)
+        Team.objects.filter(pk=team.pk).delete()
+        team.name = "Payments Platform"
+        team.save()
+        self.assertCounts(team, name="Payments Platform", member_count=0)
+        self.assertCounts(self.bea, team_count=1, member_count=0)
+        self.assertNoDrift()
+
+
+class ApiDeleteTests(TestCase):
+    """Deleting a manager through the API queues the cascade job the HTML
+    views use, and the job's bulk deletes leave the counters exact."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leeds = Location.objects.create(name="Leeds")
+        cls.bea = Manager.objects.create(name="Bea", location=cls.leeds, start_date=date(2019, 1, 1))
+        team = Team.objects.create(name="Payments", location=cls.leeds, manager=cls.bea)
+        for i in range(3):
+            Member.objects.create(name=f"Member {i}", location=cls.leeds, start_date=date(2020, 1, 1),
+                                  team=team, manager=cls.bea)
+        cls.user = User.objects.create_user('planner', password='planner-pass-123')
+        cls.user.groups.add(Group.objects.create(name=ADMIN))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_delete_manager_queues_a_job(self):
+        response = self.client.delete(reverse('api_detail', args=['managers', self.bea.pk]))
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(pk=response.json()['job'])
+        self.assertEqual((job.kind, job.params), ('delete_manager', {'manager_id': self.bea.pk}))
+        self.assertEqual(response['Location'], reverse('job_detail', args=[job.pk]))
+        self.assertTrue(Manager.objects.filter(pk=self.bea.pk).exists())
+        self.assertEqual(jobs.run(job).status, Job.DONE)
+        self.assertFalse(Manager.objects.filter(pk=self.bea.pk).exists())
+        self.assertEqual(Member.objects.count(), 0)
+        self.leeds.refresh_from_db()
+        self.assertEqual((self.leeds.member_count, self.leeds.team_count, self.leeds.manager_count), (0, 0, 0))
+        self.assertEqual(set(counters.recount().values()), {0})
+
+    def test_delete_member_is_immediate(self):
+        member = Member.objects.first()
+        response = self.client.delete(reverse('api_detail', args=['members', member.pk]))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Member.objects.filter(pk=member.pk).exists())
+
+
+class FlowNetworkTests(TestCase):
+    """min_cost_flow() on networks small enough to check by hand."""
+
+    def test_min_cost_flow_reroutes_through_reverse_arcs(self):
+        # Two suppliers x, y and two consumers p, q of one unit each. The
+        # cheapest single arc, x -> p, is not in the optimum (x -> q, y -> p).
+        network = scheduler.FlowNetwork()
+        source, x, y, p, q, sink = (network.add_node() for _ in range(6))
+        for node in (x, y):
+            network.add_arc(source, node, 1)
+        for node in (p, q):
+            network.add_arc(node, sink, 1)
+        xp, xq = network.add_arc(x, p, 1, 1), network.add_arc(x, q, 1, 2)
+        yp, yq = network.add_arc(y, p, 1, 2), network.add_arc(y, q, 1, 10)
+        self.assertEqual(network.min_cost_flow(source, sink), (2, 4))
+        self.assertEqual([network.flow(arc) for arc in (xp, xq, yp, yq)], [0, 1, 1, 0])
+
+    def test_flow_is_limited_by_capacity(self):
+        network = scheduler.FlowNetwork()
+        source, middle, sink = (network.add_node() for _ in range(3))
+        network.add_arc(source, middle, 5, 1)
+        network.add_arc(middle, sink, 3, 2)
+        self.assertEqual(network.min_cost_flow(source, sink), (3, 9))
+
+
+class ScheduleTests(TestCase):
+    """schedule() respects team targets and manager spans, leaves members it
+    cannot place where they are, picks the cheapest placement, and apply()
+    keeps the denormalized counts exact."""
+
+    def setUp(self):
+        self.leeds, self.york = Location.objects.create(name="Leeds"), Location.objects.create(name="York")
+        self.hull = Location.objects.create(name="Hull")
+        self.bea = Manager.objects.create(name="Bea", location=self.leeds, start_date=date(2019, 1, 1))
+        self.cal = Manager.objects.create(name="Cal", location=self.york, start_date=date(2019, 1, 1),
+                                          span_limit=2)
+        self.payments = Team.objects.create(name="Payments", location=self.leeds, manager=self.bea, target_size=2)
+        self.platform = Team.objects.create(name="Platform", location=self.leeds, manager=self.bea, target_size=1)
+        self.search = Team.objects.create(name="Search", location=self.york, manager=self.cal)
+        self.ann = self.member("Ann", self.leeds, team=self.payments, start_date=date(2018, 1, 1))
+        self.dan = self.member("Dan", self.york, team=self.search)
+
+    def member(self, name, location, team=None, start_date=date(2021, 1, 1)):
+        return Member.objects.create(name=name, location=location, start_date=start_date, team=team,
+                                     manager=team.manager if team else None)
+
+    def unplaced(self, location, count):
+        return [self.member(f"New {location.name} {day}", location, start_date=date(2021, 1, day))
+                for day in range(1, count + 1)]
+
+    def placed_ids(self, result):
+        return {pk for ids in result.changes.values() for pk in ids}
+
+    def test_target_size(self):
+        new = self.unplaced(self.leeds, 3)
+        result = scheduler.schedule(scheduler.pool_queryset())
+        self.assertEqual((result.placed, result.unplaced), (2, 1))
+        # The latest starter is the one left without a team.
+        self.assertEqual(self.placed_ids(result), {new[0].pk, new[1].pk})
+        self.assertEqual({team["name"]: team["after"] for team in result.teams}, {"Payments": 2, "Platform": 1})
+
+    def test_span_limit(self):
+        self.unplaced(self.york, 3)
+        result = scheduler.schedule(scheduler.pool_queryset())
+        self.assertEqual((result.placed, result.unplaced), (1, 2))
+        self.assertEqual(result.managers, [{"id": self.cal.pk, "name": "Cal", "span_limit": 2,
+                                            "before": 1, "after": 2}])
+
+    def test_default_span_limit(self):
+        self.unplaced(self.leeds, 2)
+        result = scheduler.schedule(scheduler.pool_queryset(), default_span_limit=1)
+        self.assertEqual((result.placed, result.unplaced), (0, 2))
+        self.assertFalse(result.changes)
+
+    def test_infeasible_members_are_left_unplaced(self):
+        self.unplaced(self.hull, 2)
+        result = scheduler.schedule(scheduler.pool_queryset())
+        self.assertEqual((result.pool, result.placed, result.unplaced), (2, 0, 2))
+        self.assertEqual(result.cost, 2 * scheduler.UNPLACED_COST)
+        self.assertFalse(result.changes)
+
+    def test_relocation(self):
+        self.unplaced(self.hull, 2)
+        result = scheduler.schedule(scheduler.pool_queryset(), allow_relocation=True)
+        self.assertEqual((result.placed, result.relocated, result.unplaced), (2, 2, 0))
+        self.assertEqual(result.cost, 2 * scheduler.RELOCATION_COST)
+
+    def test_cheapest_move(self):
+        # Payments is over its target of 1; Bob moves to Platform, at his own
+        # location, rather than to Search, and Ann, the earlier starter, stays.
+        Team.objects.filter(pk=self.payments.pk).update(target_size=1)
+        bob = self.member("Bob", self.leeds, team=self.payments)
+        result = scheduler.schedule(scheduler.pool_queryset(ids=[self.ann.pk, bob.pk]), allow_relocation=True)
+        self.assertEqual((result.moved, result.relocated, result.over_target), (1, 0, 0))
+        self.assertEqual(result.cost, scheduler.MOVE_COST)
+        self.assertEqual(dict(result.changes), {(self.platform.pk, self.bea.pk, self.leeds.pk): [bob.pk]})
+
+    def test_apply_keeps_counters_exact(self):
+        self.unplaced(self.leeds, 3)
+        self.unplaced(self.hull, 1)
+        result = scheduler.schedule(scheduler.pool_queryset(), allow_relocation=True)
+        self.assertEqual(scheduler.apply(result), result.changed)
+        self.assertEqual(result.changed, 3)
+        for pk in self.placed_ids(result):
+            member = Member.objects.select_related('team').get(pk=pk)
+            self.assertEqual((member.manager_id, member.location_id),
+                             (member.team.manager_id, member.team.location_id))
+        self.assertEqual(set(counters.recount().values()), {0})
+        self.payments.refresh_from_db()
+        self.cal.refresh_from_db()
+        self.assertEqual((self.payments.member_count, self.cal.member_count), (2, 2))
+
+
+class AdminDeleteTests(TestCase):
+    """"Delete selected" deletes teams and members set-based, with their
+    dependants, and queues one job per location or manager."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leeds = Location.objects.create(name="Leeds")
+        cls.bea = Manager.objects.create(name="Bea", location=cls.leeds, start_date=date(2019, 1, 1))
+        cls.teams = [Team.objects.create(name=f"Team {i}", location=cls.leeds, manager=cls.bea) for i in range(2)]
+        for i in range(4):
+            Member.objects.create(name=f"Member {i}", location=cls.leeds, start_date=date(2020, 1, 1),
+                                  team=cls.teams[i % 2], manager=cls.bea)
+        cls.user = User.objects.create_superuser('admin', password='admin-pass-123')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def delete_selected(self, model, objs):
+        url = reverse(f'admin:planner_{model._meta.model_name}_changelist')
+        return self.client.post(url, {'action': 'delete_selected', 'post': 'yes',
+                                      '_selected_action': [obj.pk for obj in objs]}, follow=True)
+
+    def test_delete_teams(self):
+        response = self.delete_selected(Team, self.teams[:1])
+        self.assertContains(response, "Deleted 1 teams and 2 members.")
+        self.assertEqual((Team.objects.count(), Member.objects.count()), (1, 2))
+        self.assertEqual(set(counters.recount().values()), {0})
+
+    def test_delete_members(self):
+        response = self.delete_selected(Member, Member.objects.all()[:3])
+        self.assertContains(response, "Deleted 3 members.")
+        self.assertEqual(Member.objects.count(), 1)
+        self.assertEqual(set(counters.recount().values()), {0})
+
+    def test_delete_managers_queues_jobs(self):
+        response = self.delete_selected(Manager, [self.bea])
+        self.assertContains(response, "Deleting 1 managers in the background.")
+        job = Job.objects.get()
+        self.assertEqual((job.kind, job.params, job.description),
+                         ('delete_manager', {'manager_id': self.bea.pk}, "Delete manager Bea"))
+        self.assertTrue(Manager.objects.filter(pk=self.bea.pk).exists())
+
+    def test_location_confirmation_counts_the_cascade(self):
+        url = reverse('admin:planner_location_changelist')
+        response = self.client.post(url, {'action': 'delete_selected', '_selected_action': [self.leeds.pk]})
+        self.assertContains(response, "Members: 4")
+        self.assertContains(response, "Teams: 2")
+        self.assertContains(response, "Managers: 1")
+
+
+class SnapshotTests(TestCase):
+    """Snapshots decode to exactly the state they were taken from, and diff()
+    lists the rows that joined, left and moved."""
+
+    def setUp(self):
+        self.leeds, self.york = Location.objects.create(name="Leeds"), Location.objects.create(name="York")
+        self.bea = Manager.objects.create(name="Bea", location=self.leeds, start_date=date(2019, 1, 1))
+        self.payments = Team.objects.create(name="Payments", location=self.leeds, manager=self.bea)
+        self.search = Team.objects.create(name="Search", location=self.york)
+        self.ann, self.bob, self.cat, self.dan = (
+            Member.objects.create(name=name, location=self.leeds, start_date=date(2020, 1, 1), **assignment)
+            for name, assignment in [("Ann", {'team': self.payments, 'manager': self.bea}),
+                                     ("Bob", {'team': self.payments, 'manager': self.bea}),
+                                     ("Cat", {}), ("Dan", {'manager': self.bea})])
+
+    def as_lists(self, state):
+        return {kind: (list(table.ids), {field: list(column) for field, column in table.columns.items()})
+                for kind, table in state.items()}
+
+    def loaded(self, snapshot):
+        return snapshots.load(Snapshot.objects.get(pk=snapshot.pk))
+
+    def test_round_trip(self):
+        # A gap in the ids, and members without a team or a manager.
+        Member.objects.filter(pk=self.bob.pk).delete()
+        snapshot = snapshots.take("Before")
+        self.assertEqual((snapshot.member_count, snapshot.team_count, snapshot.manager_count,
+                          snapshot.location_count), (3, 2, 1, 2))
+        state = self.as_lists(self.loaded(snapshot))
+        self.assertEqual(state, self.as_lists(snapshots.current()))
+        self.assertEqual(state['member'], ([self.ann.pk, self.cat.pk, self.dan.pk], {
+            'location': [self.leeds.pk] * 3,
+            'team': [self.payments.pk, 0, 0],
+            'manager': [self.bea.pk, 0, self.bea.pk],
+        }))
+        self.assertEqual(state['team'][1]['manager'], [self.bea.pk, 0])
+
+    def test_empty(self):
+        Location.objects.all().delete()
+        snapshot = snapshots.take()
+        empty = self.loaded(snapshot)
+        self.assertEqual(self.as_lists(empty), {kind: ([], {field: [] for field in fields})
+                                                for kind, _, fields in snapshots.TABLES})
+        self.assertEqual({kind: table_diff.counts() for kind, table_diff in snapshots.diff(empty, empty).items()},
+                         {kind: {'joined': 0, 'left': 0, 'moved': 0} for kind in snapshots.MODELS})
+
+    def test_diff_against_empty(self):
+        populated = self.loaded(snapshots.take())
+        Location.objects.all().delete()
+        empty = snapshots.current()
+        joined = snapshots.diff(empty, populated)
+        self.assertEqual(joined['member'].counts(), {'joined': 4, 'left': 0, 'moved': 0})
+        self.assertEqual(joined['member'].joined[2], (self.cat.pk, (self.leeds.pk, 0, 0)))
+        left = snapshots.diff(populated, empty)
+        self.assertEqual(left['team'].counts(), {'joined': 0, 'left': 2, 'moved': 0})
+        self.assertEqual(left['team'].left[1], (self.search.pk, (self.york.pk, 0)))
+
+    def test_diff(self):
+        snapshot = snapshots.take()
+        eve = Member.objects.create(name="Eve", location=self.york, start_date=date(2021, 1, 1))
+        Member.objects.get(pk=self.bob.pk).delete()
+        cat = Member.objects.get(pk=self.cat.pk)
+        cat.team, cat.location = self.search, self.york
+        cat.save()
+        dan = Member.objects.get(pk=self.dan.pk)
+        dan.manager = None
+        dan.save()
+        Team.objects.filter(pk=self.search.pk).update(manager=self.bea)
+        diffs = snapshots.diff(self.loaded(snapshot), snapshots.current())
+        member = diffs['member']
+        self.assertEqual(member.joined, [(eve.pk, (self.york.pk, 0, 0))])
+        self.assertEqual(member.left, [(self.bob.pk, (self.leeds.pk, self.payments.pk, self.bea.pk))])
+        self.assertEqual(member.moved, [
+            (self.cat.pk, (self.leeds.pk, 0, 0), (self.york.pk, self.search.pk, 0)),
+            (self.dan.pk, (self.leeds.pk, 0, self.bea.pk), (self.leeds.pk, 0, 0)),
+        ])
+        self.assertEqual(diffs['team'].moved, [(self.search.pk, (self.york.pk, 0), (self.york.pk, self.bea.pk))])
+        self.assertEqual(diffs['manager'].counts(), {'joined': 0, 'left': 0, 'moved': 0})
+        # Names are looked up for what is still there; Bob has left.
+        names = snapshots.names(diffs, 10)
+        self.assertEqual(names['member'], {eve.pk: "Eve", self.cat.pk: "Cat", self.dan.pk: "Dan"})
+        self.assertEqual(names['team'], {self.payments.pk: "Payments", self.search.pk: "Search"})
+
+
+@override_settings(ROOT_URLCONF='capstone.urls_async')
+class AsyncViewTests(TestCase):
+    """The async views read and fill the page cache once per request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        location = Location.objects.create(name="Leeds")
+        manager = Manager.objects.create(name="Bea", location=location, start_date=date(2019, 1, 1))
+        cls.team = Team.objects.create(name="Payments", location=location, manager=manager)
+        cls.user = User.objects.create_user('planner', password='planner-pass-123')
+
+    def setUp(self):
+        cache.clear()
+        self.async_client.force_login(self.user)
+
+    def misses(self, name):
+        return page_cache.stats[(name, 'miss')]
+
+    @override_settings(DASHBOARD_PAGINATED=False)
+    async def test_welcome_is_cached_once(self):
+        before = self.misses('welcome')
+        response = await self.async_client.get(reverse('welcome'))
+        self.assertEqual((response.status_code, response['X-Cache']), (200, 'miss'))
+        self.assertEqual(self.misses('welcome'), before + 1)
+        response = await self.async_client.get(reverse('welcome'))
+        self.assertEqual(response['X-Cache'], 'hit')
+
+    async def test_team_fragment(self):
+        before = self.misses('team_detail')
+        for _ in range(2):
+            response = await self.async_client.get(reverse('team', args=[self.team.pk]))
+            self.assertContains(response, "Payments")
+        self.assertEqual(self.misses('team_detail'), before + 1)
+
+
+class OrgChartTests(TestCase):
+    """The in-memory chart places rows by the documented rules, follows
+    single-row patches, and catches up with changes made elsewhere from
+    the audit log."""
+
+    def setUp(self):
+        self.leeds = Location.objects.create(name="Leeds")
+        self.bea = Manager.objects.create(name="Bea", location=self.leeds, start_date=date(2019, 1, 1))
+        self.cal = Manager.objects.create(name="Cal", location=self.leeds, start_date=date(2019, 1, 1))
+        self.payments = Team.objects.create(name="Payments", location=self.leeds, manager=self.bea)
+        self.unmanaged = Team.objects.create(name="Unmanaged", location=self.leeds)
+        self.ann = Member.objects.create(name="Ann", location=self.leeds, start_date=date(2020, 1, 1),
+                                         team=self.payments, manager=self.bea)
+        self.bob = Member.objects.create(name="Bob", location=self.leeds, start_date=date(2020, 1, 1),
+                                         manager=self.cal)
+        self.cat = Member.objects.create(name="Cat", location=self.leeds, start_date=date(2020, 1, 1))
+        self.chart = orgchart.OrgChart()
+        self.chart.build()
+
+    def names(self, node):
+        """{child list: [names]} for one node of the tree."""
+        return {key: [child["name"] for child in node[key]] for key in orgchart.CHILD_KEYS[self.kind(node)]}
+
+    def kind(self, node):
+        return "location" if "managers" in node else "manager" if "teams" in node else "team"
+
+    def tree(self, chart):
+        return json.loads(chart.to_json())
+
+    def fresh(self):
+        chart = orgchart.OrgChart()
+        chart.build()
+        return self.tree(chart)
+
+    def test_placement(self):
+        location, = self.tree(self.chart)["locations"]
+        self.assertEqual(self.names(location), {"managers": ["Bea", "Cal"], "teams": ["Unmanaged"],
+                                                "members": ["Cat"]})
+        bea, cal = location["managers"]
+        self.assertEqual(self.names(bea), {"teams": ["Payments"], "members": []})
+        self.assertEqual(self.names(cal), {"teams": [], "members": ["Bob"]})
+        self.assertEqual(self.names(bea["teams"][0]), {"members": ["Ann"]})
+
+    def test_upsert_reparents(self):
+        self.chart.to_json()
+        self.chart.upsert("member", {**self.chart.members[self.ann.pk], "team_id": None})
+        self.chart.upsert("team", {**self.chart.teams[self.payments.pk], "manager_id": self.cal.pk})
+        location, = self.tree(self.chart)["locations"]
+        bea, cal = location["managers"]
+        self.assertEqual(self.names(bea), {"teams": [], "members": ["Ann"]})
+        self.assertEqual(self.names(cal), {"teams": ["Payments"], "members": ["Bob"]})
+
+    def test_remove(self):
+        self.chart.remove("member", self.bob.pk)
+        self.chart.remove("team", self.unmanaged.pk)
+        location, = self.tree(self.chart)["locations"]
+        self.assertEqual(self.names(location)["teams"], [])
+        self.assertEqual(self.names(location["managers"][1]), {"teams": [], "members": []})
+        self.assertNotIn(self.bob.pk, self.chart.members)
+
+    def test_manager_json(self):
+        bea = json.loads(self.chart.manager_json(self.bea.pk))
+        self.assertEqual((bea["name"], bea["location_id"]), ("Bea", self.leeds.pk))
+        self.assertEqual([member["name"] for member in bea["teams"][0]["members"]], ["Ann"])
+        self.assertIsNone(self.chart.manager_json(0))
+
+    def test_catch_up_rereads_only_changed_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Member.objects.create(name="Dan", location=self.leeds, start_date=date(2021, 1, 1), team=self.payments)
+            team = Team.objects.get(pk=self.payments.pk)
+            team.manager = self.cal
+            team.save()
+            Member.objects.get(pk=self.bob.pk).delete()
+            location = Location.objects.get(pk=self.leeds.pk)
+            location.name = "Leeds Central"
+            location.save()
+        # The audit entries, then one query per kind of row changed.
+        with self.assertNumQueries(4):
+            self.chart.catch_up()
+        self.assertEqual(self.tree(self.chart), self.fresh())
+        self.assertEqual(self.chart.seen, AuditEntry.objects.latest('id').pk)
+        with self.assertNumQueries(1):
+            self.chart.catch_up()
+
+    def test_catch_up_rebuilds_after_many_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ("Dan", "Eve"):
+                Member.objects.create(name=name, location=self.leeds, start_date=date(2021, 1, 1))
+        with mock.patch.object(orgchart, 'CATCH_UP_LIMIT', 1), mock.patch.object(self.chart, 'build') as build:
+            self.chart.catch_up()
+        build.assert_called_once_with()
+
+
+class AnalyticsTests(TestCase):
+    """The headcount report matches GROUP BY counts after saves, moves,
+    deletes and bulk writes, and is served from the cache until one of
+    them happens."""
+
+    def setUp(self):
+        cache.clear()
+        self.leeds, self.york = Location.objects.create(name="Leeds"), Location.objects.create(name="York")
+        self.bea = Manager.objects.create(name="Bea", location=self.leeds, start_date=date(2019, 1, 1))
+        self.payments = Team.objects.create(name="Payments", location=self.leeds, manager=self.bea)
+        self.search = Team.objects.create(name="Search", location=self.york)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.members = [Member.objects.create(name=f"Member {i}", location=self.leeds,
+                                                  start_date=date(2020, 1 + i % 2, 1), team=self.payments,
+                                                  manager=self.bea) for i in range(3)]
+            Member.objects.create(name="Loner", location=self.york, start_date=date(2021, 5, 1))
+
+    def headcounts(self, rows):
+        return {row["id"]: row["headcount"] for row in rows}
+
+    def assertMatchesDatabase(self):
+        report = analytics.report()
+        members = Member.objects.order_by()
+        self.assertEqual(report["total"], members.count())
+        for dimension in analytics.DIMENSIONS:
+            expected = {row[dimension]: row['n'] for row in members.values(dimension).annotate(n=Count('id'))}
+            actual = {pk: n for pk, n in self.headcounts(report[dimension]).items() if n}
+            self.assertEqual(actual, expected, dimension)
+        self.assertEqual({row["month"]: row["hires"] for row in report["month"]}, analytics.compute_hires())
+        return report
+
+    def test_report(self):
+        report = self.assertMatchesDatabase()
+        self.assertEqual(self.headcounts(report["team"]), {self.payments.pk: 3, None: 1, self.search.pk: 0})
+        self.assertEqual(report["month"], [{"month": "2020-01", "hires": 2}, {"month": "2020-02", "hires": 1},
+                                           {"month": "2021-05", "hires": 1}])
+        with self.assertNumQueries(0):
+            analytics.report()
+
+    def test_move_rereads_counts_but_not_hires(self):
+        analytics.report()
+        member = Member.objects.get(pk=self.members[0].pk)
+        member.team, member.location = self.search, self.york
+        with self.captureOnCommitCallbacks(execute=True):
+            member.save()
+        # The three headcount tables, and no GROUP BY over members.
+        with self.assertNumQueries(3):
+            report = analytics.report()
+        self.assertEqual(self.headcounts(report["team"])[self.search.pk], 1)
+        self.assertMatchesDatabase()
+
+    def test_start_date(self):
+        analytics.report()
+        member = Member.objects.get(pk=self.members[0].pk)
+        member.start_date = date(2022, 3, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            member.save()
+        self.assertIn({"month": "2022-03", "hires": 1}, self.assertMatchesDatabase()["month"])
+
+    def test_delete(self):
+        analytics.report()
+        with self.captureOnCommitCallbacks(execute=True):
+            Member.objects.get(pk=self.members[0].pk).delete()
+        self.assertEqual(self.assertMatchesDatabase()["total"], 3)
+
+    def test_bulk_write(self):
+        analytics.report()
+        with self.captureOnCommitCallbacks(execute=True):
+            Member.objects.update(start_date=date(2023, 1, 1), team=None)
+            rows_changed.send(sender=Member, fields=['start_date', 'team'])
+        report = self.assertMatchesDatabase()
+        self.assertEqual(report["month"], [{"month": "2023-01", "hires": 4}])
+        self.assertEqual(self.headcounts(report["team"])[None], 4)
+
+
+class AuditTests(TestCase):
+    """Each request writes its audit entries with one INSERT, bulk writes
+    record what they changed, and the log cannot be changed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leeds = Location.objects.create(name="Leeds")
+        cls.bea = Manager.objects.create(name="Bea", location=cls.leeds, start_date=date(2019, 1, 1))
+        cls.payments = Team.objects.create(name="Payments", location=cls.leeds, manager=cls.bea)
+        cls.members = [Member.objects.create(name=f"Member {i}", location=cls.leeds, start_date=date(2020, 1, 1),
+                                             team=cls.payments, manager=cls.bea) for i in range(3)]
+        cls.user = User.objects.create_superuser('admin', password='admin-pass-123')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+        self.first = (AuditEntry.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        # The test's transaction never commits; run on_commit callbacks at
+        # once, as they would run outside a transaction.
+        patcher = mock.patch.object(transaction, 'on_commit', lambda func, using=None: func())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def new_entries(self):
+        return list(AuditEntry.objects.filter(id__gte=self.first).order_by('id'))
+
+    def inserts(self):
+        return mock.patch.object(AuditEntry.objects, 'bulk_create', wraps=AuditEntry.objects.bulk_create)
+
+    def test_one_insert_per_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('admin:planner_member_changelist'), {
+                'action': 'clear_team', '_selected_action': [member.pk for member in self.members]})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(sum('INSERT INTO "planner_auditentry"' in query['sql'] for query in queries), 1)
+        entries = self.new_entries()
+        self.assertEqual([(entry.object_id, entry.action, entry.changes, entry.user_id) for entry in entries],
+                         [(member.pk, AuditEntry.UPDATED, {'team': [self.payments.pk, None]}, self.user.pk)
+                          for member in self.members])
+
+    @override_settings(ROOT_URLCONF='capstone.urls_async')
+    async def test_one_insert_per_async_request(self):
+        with self.inserts() as bulk_create:
+            response = await self.async_client.patch(
+                reverse('api_detail', args=['members', self.members[0].pk]), {'name': "Ann"},
+                content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        bulk_create.assert_called_once()
+        entry, = [entry async for entry in AuditEntry.objects.filter(id__gte=self.first)]
+        self.assertEqual((entry.action, entry.changes, entry.user_id),
+                         (AuditEntry.UPDATED, {'name': ["Member 0", "Ann"]}, self.user.pk))
+
+    def test_batch(self):
+        with self.inserts() as bulk_create:
+            with audit.batch(self.user.pk):
+                for member in Member.objects.filter(pk__in=[member.pk for member in self.members[:2]]):
+                    member.start_date = date(2021, 1, 1)
+                    member.save()
+                bulk_create.assert_not_called()
+        bulk_create.assert_called_once()
+        self.assertEqual([entry.changes for entry in self.new_entries()],
+                         [{'start_date': ["2020-01-01", "2021-01-01"]}] * 2)
+
+    def test_bulk_writes_record_field_diffs(self):
+        search = Team.objects.create(name="Search", location=self.leeds)
+        first = AuditEntry.objects.latest('id').pk + 1
+        with audit.batch():
+            bulk.reassign_members(Member.objects.filter(pk=self.members[0].pk), {'team': search})
+            bulk.delete_members(Member.objects.filter(pk=self.members[1].pk))
+            importexport.import_rows('member', [{'name': "Dan", 'location': "Leeds", 'start_date': "2021-02-03"}])
+        dan = Member.objects.get(name="Dan")
+        entries = AuditEntry.objects.filter(id__gte=first).order_by('id')
+        self.assertEqual([(entry.object_id, entry.action, entry.changes) for entry in entries], [
+            (self.members[0].pk, AuditEntry.UPDATED, {'team': [self.payments.pk, search.pk]}),
+            (self.members[1].pk, AuditEntry.DELETED,
+             {'name': "Member 1", 'role': "Member", 'location': self.leeds.pk, 'start_date': "2020-01-01",
+              'team': self.payments.pk, 'manager': self.bea.pk}),
+            (dan.pk, AuditEntry.CREATED,
+             {'name': "Dan", 'role': "Member", 'location': self.leeds.pk, 'start_date': "2021-02-03",
+              'team': None, 'manager': None}),
+        ])
+
+    def test_log_is_append_only(self):
+        Member.objects.create(name="Dan", location=self.leeds, start_date=date(2021, 1, 1))
+        entry = AuditEntry.objects.latest('id')
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+        for statement in ("UPDATE planner_auditentry SET action = 'd'", "DELETE FROM planner_auditentry"):
+            with self.subTest(statement), self.assertRaisesMessage(DatabaseError, "append-only"):
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(statement)
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            AuditEntry.objects.update(action=AuditEntry.DELETED)
+        self.assertEqual(AuditEntry.objects.get(pk=entry.pk).action, AuditEntry.CREATED)
+
+
+class RoleCacheTests(TestCase):
+    """Roles are cached per user and dropped whenever the user's groups
+    change, from either side of the relation, or a group changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.admins = Group.objects.create(name=ADMIN)
+        self.members = Group.objects.create(name=MEMBER)
+        self.ann = User.objects.create_user('ann')
+        self.bob = User.objects.create_user('bob')
+        self.ann.groups.add(self.members)
+
+    def roles(self, user):
+        """Roles as a fresh request would see them."""
+        return get_roles(User.objects.get(pk=user.pk))
+
+    def test_cached(self):
+        self.assertEqual(self.roles(self.ann), {MEMBER})
+        with self.assertNumQueries(1):
+            # The user row only; the roles come from the cache.
+            self.assertEqual(self.roles(self.ann), {MEMBER})
+
+    def test_add(self):
+        self.assertFalse(has_role(User.objects.get(pk=self.ann.pk), ADMIN))
+        self.ann.groups.add(self.admins)
+        self.assertTrue(has_role(User.objects.get(pk=self.ann.pk), ADMIN))
+
+    def test_remove(self):
+        self.roles(self.ann)
+        self.ann.groups.remove(self.members)
+        self.assertEqual(self.roles(self.ann), set())
+
+    def test_clear(self):
+        self.roles(self.ann)
+        self.ann.groups.clear()
+        self.assertEqual(self.roles(self.ann), set())
+
+    def test_set(self):
+        self.roles(self.ann)
+        self.ann.groups.set([self.admins])
+        self.assertEqual(self.roles(self.ann), {ADMIN})
+
+    def test_add_from_the_group(self):
+        self.roles(self.bob)
+        self.admins.user_set.add(self.bob)
+        self.assertEqual(self.roles(self.bob), {ADMIN})
+
+    def test_remove_from_the_group(self):
+        self.roles(self.ann)
+        self.members.user_set.remove(self.ann)
+        self.assertEqual(self.roles(self.ann), set())
+
+    def test_clear_from_the_group(self):
+        self.members.user_set.add(self.bob)
+        self.roles(self.ann), self.roles(self.bob)
+        self.members.user_set.clear()
+        self.assertEqual((self.roles(self.ann), self.roles(self.bob)), (set(), set()))
+
+    def test_group_deleted(self):
+        self.roles(self.ann)
+        self.members.delete()
+        self.assertEqual(self.roles(self.ann), set())
+
+    def test_group_renamed(self):
+        self.roles(self.ann)
+        self.members.name = ADMIN + " team"
+        self.members.save()
+        self.assertEqual(self.roles(self.ann), {ADMIN + " team"})
+
+
+class SearchTests(TestCase):
+    """The FTS5 index matches word prefixes, ranks closer matches first,
+    filters by kind, and follows single saves and bulk writes."""
+
+    def setUp(self):
+        self.leeds = Location.objects.create(name="Leeds")
+        self.platform = Team.objects.create(name="Leeds Platform", location=self.leeds)
+        self.ann = Member.objects.create(name="Ann", location=self.leeds, start_date=date(2020, 1, 1))
+        self.ann_long = Member.objects.create(name="Ann Marie Smith Jones", location=self.leeds,
+                                              start_date=date(2020, 1, 1))
+        self.jose = Member.objects.create(name="José Smith", location=self.leeds, start_date=date(2020, 1, 1))
+
+    def found(self, query, kind=None):
+        results, _ = search.search(query, kind=kind)
+        return [(result.kind, result.id) for result in results]
+
+    def test_prefix(self):
+        self.assertEqual(self.found("plat"), [('team', self.platform.pk)])
+        self.assertEqual(self.found("ann sm"), [('member', self.ann_long.pk)])
+        self.assertEqual(set(self.found("smi")), {('member', self.ann_long.pk), ('member', self.jose.pk)})
+        self.assertEqual(self.found("jose"), [('member', self.jose.pk)])
+        self.assertEqual(self.found("   "), [])
+
+    def test_ranking(self):
+        self.assertEqual(self.found("ann"), [('member', self.ann.pk), ('member', self.ann_long.pk)])
+
+    def test_kind(self):
+        self.assertEqual(set(self.found("leeds")), {('location', self.leeds.pk), ('team', self.platform.pk)})
+        self.assertEqual(self.found("leeds", kind='team'), [('team', self.platform.pk)])
+        self.assertEqual(set(Member.objects.filter(pk__in=search.matching_ids("smith", 'member'))),
+                         {self.ann_long, self.jose})
+
+    def test_paging(self):
+        results, more = search.search("smith", limit=1)
+        self.assertEqual((len(results), more), (1, True))
+        results, more = search.search("smith", limit=1, offset=1)
+        self.assertEqual((len(results), more), (1, False))
+
+    def test_save_and_delete(self):
+        self.ann.name = "Annabel"
+        self.ann.save()
+        self.assertEqual(self.found("annab"), [('member', self.ann.pk)])
+        self.ann.delete()
+        self.assertEqual(self.found("annab"), [])
+
+    def test_bulk_create(self):
+        Member.objects.bulk_create([Member(name="Zed", location=self.leeds, start_date=date(2020, 1, 1))])
+        self.assertEqual(self.found("zed"), [])
+        rows_changed.send(sender=Member)
+        self.assertEqual(self.found("zed"), [('member', Member.objects.get(name="Zed").pk)])
+
+    def test_bulk_rename(self):
+        Member.objects.filter(pk=self.jose.pk).update(name="Xavier")
+        rows_changed.send(sender=Member, fields=['name'])
+        self.assertEqual(self.found("xav"), [('member', self.jose.pk)])
+        self.assertEqual(self.found("jose"), [])
+
+    def test_bulk_delete(self):
+        bulk.delete_members(Member.objects.filter(pk=self.ann_long.pk))
+        self.assertEqual(self.found("ann"), [('member', self.ann.pk)])
+
+
+class BulkMemberTests(TestCase):
+    """BulkMemberForm validates the selection and the change, and apply()
+    writes it with a single rows_changed signal."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leeds = Location.objects.create(name="Leeds")
+        cls.bea = Manager.objects.create(name="Bea", location=cls.leeds, start_date=date(2019, 1, 1))
+        cls.payments = Team.objects.create(name="Payments", location=cls.leeds, manager=cls.bea)
+        cls.search = Team.objects.create(name="Search", location=cls.leeds, manager=cls.bea)
+        cls.members = [Member.objects.create(name=f"Member {i}", location=cls.leeds, start_date=date(2020, 1, 1),
+                                             team=cls.payments, manager=cls.bea) for i in range(3)]
+
+    def form(self, **data):
+        return BulkMemberForm({'action': 'reassign', **data})
+
+    def signals(self):
+        received = []
+
+        def receiver(sender, **kwargs):
+            received.append((sender, kwargs.get('fields')))
+
+        rows_changed.connect(receiver)
+        self.addCleanup(rows_changed.disconnect, receiver)
+        return received
+
+    def test_missing_ids(self):
+        form = self.form(ids=f"{self.members[0].pk}, 0 9999", team=self.search.pk)
+        self.assertEqual(form.errors, {'ids': ["No member has id 0, 9999."]})
+
+    def test_bad_id(self):
+        self.assertEqual(self.form(ids="1, two", team=self.search.pk).errors, {'ids': ["'two' is not a member id."]})
+
+    def test_selection_required(self):
+        self.assertEqual(self.form(team=self.search.pk).errors, {NON_FIELD_ERRORS: ["Give member ids, a filter, or both."]})
+
+    def test_clear_and_set(self):
+        form = self.form(filter_team=self.payments.pk, team=self.search.pk, clear_team='on')
+        self.assertEqual(form.errors, {'team': ["Choose a value or clear it, not both."]})
+
+    def test_change_required(self):
+        form = self.form(filter_team=self.payments.pk)
+        self.assertEqual(form.errors,
+                         {NON_FIELD_ERRORS: ["Choose at least one team, manager or location to assign."]})
+
+    def test_preview_changes_nothing(self):
+        form = self.form(filter_team=self.payments.pk, team=self.search.pk)
+        self.assertTrue(form.is_valid(), form.errors)
+        received = self.signals()
+        self.assertEqual(bulk.apply(form, preview=True).matched, 3)
+        self.assertEqual((Member.objects.filter(team=self.search).count(), received), (0, []))
+
+    def test_reassign_sends_one_signal(self):
+        form = self.form(ids=" ".join(str(member.pk) for member in self.members[:2]), filter_team=self.payments.pk,
+                         team=self.search.pk, clear_manager='on')
+        self.assertTrue(form.is_valid(), form.errors)
+        received = self.signals()
+        result = bulk.apply(form)
+        self.assertEqual((result.matched, result.changed), (2, 2))
+        self.assertEqual(received, [(Member, ['team', 'manager'])])
+        self.assertEqual(set(Member.objects.filter(team=self.search, manager=None)), set(self.members[:2]))
+        self.assertEqual(set(counters.recount().values()), {0})
+
+    def test_delete_sends_one_signal(self):
+        form = BulkMemberForm({'action': 'delete', 'filter_team': self.payments.pk})
+        self.assertTrue(form.is_valid(), form.errors)
+        received = self.signals()
+        self.assertEqual(bulk.apply(form).changed, 3)
+        self.assertEqual(received, [(Member, None)])
+        self.assertFalse(Member.objects.exists())
+        self.assertEqual(set(counters.recount().values()), {0})
@@ -1,24 +1,31 @@
 """Importing necessary modules: This section imports the required modules such as
-HttpResponseRedirect, render, get_object_or_404, reverse, modelform_factory,
+HttpResponseRedirect, render, get_object_or_404, reverse, the planner forms,
 and several other modules from Django framework."""
+import json
+from operator import ne
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Manager, Member, Team, Location
-from django.forms import modelform_factory
-from django.forms.widgets import DateInput
-from django.contrib.auth.decorators import login_required, user_passes_test
-from django.contrib.auth import authenticate, login, logout
+from .models import Manager, Member, Team, Location, Job, Snapshot
+from .forms import ImportForm, BulkMemberForm, ScheduleForm
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth import login, logout
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import Group, User
-from django.http import HttpResponse
+from django.http import HttpResponse, Http404, StreamingHttpResponse, JsonResponse
 from django.core.exceptions import ObjectDoesNotExist
+from django.views.decorators.http import require_POST
+from django.conf import settings
+from .roles import admin_required, staff_required, get_roles, has_role, ADMIN, MEMBER
+from . import forms, orgchart, importexport, search, lookups, bulk, analytics, jobs, audit, scheduler, snapshots
+from .cache import cache_response, stats_table
+from .pagination import parse_cursor
 
 
 def is_admin(user):
-    return user.groups.filter(name='Admin').exists()
+    return ADMIN in get_roles(user)
 
 
 def is_member(user):
-    return user.groups.filter(name='User').exists()
+    return MEMBER in get_roles(user)
 
 
 """Defining manager_detail, member_detail, team_detail, location_detail,
@@ -28,43 +35,135 @@ database using the get_object_or_404 function and render the corresponding HTML
 
 @login_required
 def manager_detail(request, id):
-    manager = get_object_or_404(Manager, pk=id)
+    manager = get_object_or_404(Manager.objects.for_detail(), pk=id)
     return render(request, "manager/manager.html", {"manager": manager})
 
 
 @login_required
 def member_detail(request, id):
-    member = get_object_or_404(Member, pk=id)
+    member = get_object_or_404(Member.objects.for_detail(), pk=id)
     return render(request, "member/member.html", {"member": member})
 
 
 @login_required
 def team_detail(request, id):
-    team = get_object_or_404(Team, pk=id)
+    team = get_object_or_404(Team.objects.for_detail(), pk=id)
     return render(request, "team/team.html", {"team": team})
 
 
-@user_passes_test(lambda user: user.is_superuser or user.groups.filter(name='Admin').exists())
+@admin_required
 def location_detail(request, id):
     location = get_object_or_404(Location, pk=id)
     return render(request, "location/location.html", {"location": location})
 
 
 @login_required
+@cache_response(Manager, Location)
 def manager_list(request):
     return render(request, "manager/manager_list.html",
-                  {"manager": Manager.objects.all()})
+                  {"manager": Manager.objects.for_list()})
 
 
-@user_passes_test(lambda user: user.is_superuser or user.groups.filter(name='Admin').exists())
+@admin_required
+@cache_response(Location)
 def location_list(request):
     return render(request, "location/location_list.html",
                   {"location": Location.objects.all()})
 
 
-"""MemberForm, LocationForm, ManagerForm & TeamForm: 
-These are Django ModelForm classes for the Member and Location models."""
-MemberForm = modelform_factory(Member, exclude=[], widgets={'start_date': DateInput(attrs={'type': 'date'})})
+"""cache_stats view: This view shows the page and fragment cache hit rates of the
+process that serves it."""
+
+
+@staff_required
+def cache_stats(request):
+    return render(request, "cache/cache_stats.html", {"rows": stats_table()})
+
+
+"""analytics_view: This view reports headcount per team, location and manager and
+hires per month, from the counts kept by planner.analytics. Add format=json for
+a JSON response."""
+
+
+@login_required
+def analytics_view(request):
+    report = analytics.report()
+    if request.GET.get("format") == "json":
+        return JsonResponse(report)
+    return render(request, "analytics/analytics.html", {"report": report})
+
+
+"""org_chart and manager_org_chart views: These views return the Location, Manager,
+Team and Member tree as JSON, served from the in-memory chart in planner.orgchart."""
+
+
+@login_required
+def org_chart(request):
+    return HttpResponse(orgchart.get_chart().to_json(), content_type="application/json")
+
+
+@login_required
+def manager_org_chart(request, id):
+    content = orgchart.get_chart().manager_json(id)
+    if content is None:
+        raise Http404("No Manager matches the given query.")
+    return HttpResponse(content, content_type="application/json")
+
+
+"""search_view: This view looks up members, managers, teams and locations by name,
+best matches first. Every word is matched as a prefix, so "jo sm" finds "John Smith".
+Add format=json for a JSON response."""
+
+SEARCH_PAGE_SIZE = 20
+
+
+@login_required
+def search_view(request):
+    query = request.GET.get("q", "").strip()
+    kind = request.GET.get("kind") or None
+    if kind not in search.KINDS:
+        kind = None
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+    except ValueError:
+        page = 1
+    results, has_next = search.search(query, kind=kind, limit=SEARCH_PAGE_SIZE,
+                                      offset=(page - 1) * SEARCH_PAGE_SIZE)
+    if request.GET.get("format") == "json":
+        return JsonResponse({"query": query, "page": page, "has_next": has_next,
+                             "results": [result.as_dict() for result in results]})
+    return render(request, "search/search.html",
+                  {"query": query, "kind": kind, "kinds": list(search.KINDS), "results": results,
+                   "page": page, "has_next": has_next})
+
+
+"""lookup_view: This view returns one page of teams, managers, locations or groups
+whose names match q, as JSON, for the search-as-you-type pickers in the forms
+(planner.lookups). "next" is the URL of the following page, or null."""
+
+LOOKUP_PAGE_SIZE = 20
+
+
+@login_required
+def lookup_view(request, kind):
+    if kind not in lookups.LOOKUP_MODELS:
+        raise Http404("No such lookup.")
+    try:
+        offset = max(0, int(request.GET.get("offset", 0)))
+    except ValueError:
+        offset = 0
+    rows, next_params = lookups.lookup(kind, request.GET.get("q", "").strip(),
+                                       after=parse_cursor(request.GET.get("after")), offset=offset,
+                                       page_size=LOOKUP_PAGE_SIZE)
+    next_url = None
+    if next_params is not None:
+        params = request.GET.copy()
+        params.pop("after", None)
+        params.pop("offset", None)
+        for key, value in next_params.items():
+            params[key] = value
+        next_url = f"{request.path}?{params.urlencode()}"
+    return JsonResponse({"results": [{"id": pk, "name": name} for pk, name in rows], "next": next_url})
 
 
 """new_member, update_member, and delete_member views:
@@ -75,12 +174,12 @@ objects. They use the MemberForm class for rendering forms."""
 @login_required
 def new_member(request):
     if request.method == "POST":
-        form = MemberForm(request.POST)
+        form = forms.MemberForm(request.POST)
         if form.is_valid():
             form.save()
             return redirect("welcome")
     else:
-        form = MemberForm()
+        form = forms.MemberForm()
     return render(request, "member/new_member.html", {"form": form, "date_input_type": "date"})
 
 
@@ -88,12 +187,12 @@ def new_member(request):
 def update_member(request, member_id):
     member = get_object_or_404(Member, id=member_id)
     if request.method == "POST":
-        form = MemberForm(request.POST, instance=member)
+        form = forms.MemberForm(request.POST, instance=member)
         if form.is_valid():
             form.save()
             return redirect("welcome")
     else:
-        form = MemberForm(instance=member)
+        form = forms.MemberForm(instance=member)
     return render(request, "member/update_member.html",
                   {"form": form, "date_input_type": "date", "member_id": member_id})
 
@@ -107,92 +206,88 @@ def delete_member(request, member_id):
     return render(request, "member/delete_member.html", {"member": member})
 
 
-LocationForm = modelform_factory(Location, exclude=[])
-
 """new_location, update_location, and delete_location views: These views handle
 the creation, updating, and deletion of Location objects, respectively.
 They use the LocationForm class for rendering forms."""
 
 
-@user_passes_test(lambda user: user.is_superuser or user.groups.filter(name='Admin').exists())
+@admin_required
 def new_location(request):
     if request.method == "POST":
-        form = LocationForm(request.POST)
+        form = forms.LocationForm(request.POST)
         if form.is_valid():
             form.save()
             return redirect("welcome")
     else:
-        form = LocationForm()
+        form = forms.LocationForm()
     return render(request, "location/new_location.html", {"form": form})
 
 
-@user_passes_test(lambda user: user.is_superuser or user.groups.filter(name='Admin').exists())
+@admin_required
 def update_location(request, location_id):
     location = get_object_or_404(Location, id=location_id)
     if request.method == "POST":
-        form = LocationForm(request.POST, instance=location)
+        form = forms.LocationForm(request.POST, instance=location)
         if form.is_valid():
             form.save()
             return redirect("welcome")
     else:
-        form = LocationForm(instance=location)
+        form = forms.LocationForm(instance=location)
     return render(request, "location/update_location.html",
                   {"form": form, "date_input_type": "date", "location_id": location_id})
 
 
 @login_required(login_url='access_denied')
-@user_passes_test(lambda user: user.is_superuser or user.groups.filter(name='Admin').exists())
+@admin_required
 def delete_location(request, location_id):
     location = get_object_or_404(Location, id=location_id)
     if request.method == "POST":
-        location.delete()
-        return redirect("welcome")
+        job = jobs.enqueue('delete_location', f"Delete location {location.name}", request.user,
+                           location_id=location.id)
+        return redirect("job_detail", id=job.id)
     return render(request, "location/delete_location.html", {"location": location})
 
 
-ManagerForm = modelform_factory(Manager, exclude=[], widgets={'start_date': DateInput(attrs={'type': 'date'})})
-
 """new_manager, update_manager, and delete_manager views: These views handle the creation,
 updating, and deletion of Manager objects, respectively. They use the ManagerForm class for rendering forms."""
 
 
-@user_passes_test(lambda user: user.is_superuser or user.groups.filter(name='Admin').exists())
+@admin_required
 def new_manager(request):
     if request.method == "POST":
-        form = ManagerForm(request.POST)
+        form = forms.ManagerForm(request.POST)
         if form.is_valid():
             form.save()
             return redirect("welcome")
     else:
-        form = ManagerForm()
+        form = forms.ManagerForm()
     return render(request, "manager/new_manager.html", {"form": form})
 
 
-@user_passes_test(lambda user: user.is_superuser or user.groups.filter(name='Admin').exists())
+@admin_required
 def update_manager(request, manager_id):
     manager = get_object_or_404(Manager, id=manager_id)
     if request.method == "POST":
-        form = ManagerForm(request.POST, instance=manager)
+        form = forms.ManagerForm(request.POST, instance=manager)
         if form.is_valid():
             form.save()
             return redirect("welcome")
     else:
-        form = ManagerForm(instance=manager)
+        form = forms.ManagerForm(instance=manager)
     return render(request, "manager/update_manager.html",
                   {"form": form, "date_input_type": "date", "manager_id": manager_id})
 
 
-@user_passes_test(lambda user: user.is_superuser or user.groups.filter(name='Admin').exists())
+@admin_required
 def delete_manager(request, manager_id):
     manager = get_object_or_404(Manager, id=manager_id)
     if request.method == "POST":
-        manager.delete()
-        return redirect("welcome")
+        job = jobs.enqueue('delete_manager', f"Delete manager {manager.name}", request.user,
+                           manager_id=manager.id)
+        return redirect("job_detail", id=job.id)
     return render(request, "manager/delete_manager.html", {"manager": manager})
 
 
-TeamForm = modelform_factory(Team, exclude=[])
-
 """new_team, update_team, and delete_team views: These views handle the creation,
 updating, and deletion of Team objects, respectively. They use the TeamForm class for rendering forms."""
 
@@ -200,12 +295,12 @@ updating, and deletion of Team objects, respectively. They use the TeamForm clas
 @login_required
 def new_team(request):
     if request.method == "POST":
-        form = TeamForm(request.POST)
+        form = forms.TeamForm(request.POST)
         if form.is_valid():
             form.save()
             return redirect("welcome")
     else:
-        form = TeamForm()
+        form = forms.TeamForm()
     return render(request, "team/new_team.html", {"form": form})
 
 
@@ -213,12 +308,12 @@ def new_team(request):
 def update_team(request, team_id):
     team = get_object_or_404(Team, id=team_id)
     if request.method == "POST":
-        form = TeamForm(request.POST, instance=team)
+        form = forms.TeamForm(request.POST, instance=team)
         if form.is_valid():
             form.save()
             return redirect("welcome")
     else:
-        form = TeamForm(instance=team)
+        form = forms.TeamForm(instance=team)
     return render(request, "team/update_team.html",
                   {"form": form, "team_id": team_id})
 
@@ -236,7 +331,7 @@ def delete_team(request, team_id):
 the creation of new User objects for regular users and administrators."""
 
 
-@user_passes_test(lambda user: user.is_superuser or user.groups.filter(name='Admin').exists())
+@admin_required
 def create_member(request):
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
@@ -253,7 +348,7 @@ def create_member(request):
     return render(request, "create_member/create_member.html", {'form': form})
 
 
-@user_passes_test(lambda user: user.is_superuser or user.groups.filter(name='Admin').exists())
+@admin_required
 def create_admin(request):
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
@@ -270,19 +365,230 @@ def create_admin(request):
     return render(request, "create_member/create_member.html", {'form': form})
 
 
+"""import_data and export_data views: These views bulk load rows from an uploaded
+CSV or JSON Lines file and stream a whole table back out, using planner.importexport."""
+
+
+@admin_required
+def import_data(request):
+    result = None
+    if request.method == "POST":
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid() and form.cleaned_data["file"].size > settings.IMPORT_INLINE_MAX_BYTES:
+            upload = form.cleaned_data["file"]
+            job = jobs.enqueue('import', f"Import {upload.name}", request.user,
+                               model=form.cleaned_data["model"], file_format=form.cleaned_data["file_format"],
+                               path=jobs.save_upload(upload))
+            return redirect("job_detail", id=job.id)
+        if form.is_valid():
+            result = importexport.import_file(form.cleaned_data["model"],
+                                              importexport.text_stream(form.cleaned_data["file"]),
+                                              form.cleaned_data["file_format"])
+    else:
+        form = ImportForm()
+    return render(request, "import/import_data.html", {"form": form, "result": result})
+
+
+@admin_required
+def export_data(request, model):
+    file_format = request.GET.get("format", "csv")
+    if model not in importexport.SPECS or file_format not in importexport.FORMATS:
+        raise Http404("Unknown export.")
+    content_type = "text/csv" if file_format == "csv" else "application/x-ndjson"
+    response = StreamingHttpResponse(importexport.export_lines(model, file_format), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{model}.{file_format}"'
+    return response
+
+
+"""bulk_members and bulk_members_api views: These views reassign or delete many
+members at once, selected by id and/or by team, manager and location, using
+planner.bulk. The page previews how many members match before applying."""
+
+
+@admin_required
+def bulk_members(request):
+    result = None
+    if request.method == "POST":
+        form = BulkMemberForm(request.POST)
+        if form.is_valid():
+            result = bulk.apply(form, preview="preview" in request.POST)
+    else:
+        form = BulkMemberForm(request.GET or None)
+    return render(request, "member/bulk_members.html", {"form": form, "result": result})
+
+
+@require_POST
+def bulk_members_api(request):
+    """JSON body: {"ids": [...], "filter": {"team": id, ...}, "action": "reassign"
+    or "delete", "set": {"team": id or null, ...}, "preview": false}."""
+    if not has_role(request.user, ADMIN):
+        return JsonResponse({"error": "Admin role required."}, status=403)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Body is not valid JSON."}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"error": "Body must be a JSON object."}, status=400)
+    data = {"ids": " ".join(str(pk) for pk in payload.get("ids") or []),
+            "action": payload.get("action")}
+    for field, value in (payload.get("filter") or {}).items():
+        data[f"filter_{field}"] = value
+    for field, value in (payload.get("set") or {}).items():
+        if value is None:
+            data[f"clear_{field}"] = True
+        else:
+            data[field] = value
+    form = BulkMemberForm(data)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors.get_json_data()}, status=400)
+    return JsonResponse(bulk.apply(form, preview=bool(payload.get("preview"))).as_dict())
+
+
+"""schedule_members view: This view places members without a team, and/or a
+selection of members to move, on teams within their target sizes, managers'
+spans of control and locations, using planner.scheduler. Preview shows the
+outcome without changing anything; Apply writes it."""
+
+
+@admin_required
+def schedule_members(request):
+    result = None
+    if request.method == "POST":
+        form = ScheduleForm(request.POST)
+        if form.is_valid():
+            result = scheduler.run(form, preview="apply" not in request.POST)
+    else:
+        form = ScheduleForm()
+    return render(request, "member/schedule_members.html", {"form": form, "result": result})
+
+
+"""job_list and job_detail views: These views show the background jobs queued by
+the delete and import views and their progress. Add format=json to job_detail
+to poll it."""
+
+JOB_LIST_SIZE = 50
+
+
+@admin_required
+def job_list(request):
+    return render(request, "jobs/job_list.html",
+                  {"jobs": Job.objects.select_related('created_by').order_by('-id')[:JOB_LIST_SIZE]})
+
+
+@admin_required
+def job_detail(request, id):
+    job = get_object_or_404(Job, pk=id)
+    if request.GET.get("format") == "json":
+        return JsonResponse({"id": job.id, "description": job.description, "status": job.status,
+                             "progress": job.progress, "total": job.total, "percent": job.percent,
+                             "result": job.result, "error": job.error if job.status == Job.FAILED else None})
+    return render(request, "jobs/job_detail.html", {"job": job})
+
+
+"""snapshot_list and snapshot_diff views: snapshot_list shows the org snapshots
+and takes a new one as a background job. snapshot_diff compares two snapshots,
+or a snapshot and the live tables ("now"), with planner.snapshots and lists the
+members, teams and managers that joined, left or moved. Add format=json for
+the full lists."""
+
+SNAPSHOT_LIST_SIZE = 50
+
+SNAPSHOT_DIFF_SHOWN = 100
+
+
+@admin_required
+def snapshot_list(request):
+    if request.method == "POST":
+        name = request.POST.get("name", "").strip()[:255]
+        job = jobs.enqueue("take_snapshot", f"Take snapshot {name}".strip(), request.user,
+                           name=name, user_id=request.user.pk)
+        return redirect("job_detail", id=job.pk)
+    return render(request, "snapshots/snapshot_list.html", {
+        "snapshots": Snapshot.objects.defer("data").select_related("created_by")
+                                     .order_by("-taken_at")[:SNAPSHOT_LIST_SIZE]})
+
+
+def snapshot_state(value):
+    """(label, state) for a snapshot id or "now"."""
+    if value == "now":
+        return "now", snapshots.current()
+    try:
+        snapshot = Snapshot.objects.get(pk=int(value))
+    except (TypeError, ValueError, Snapshot.DoesNotExist):
+        raise Http404("Unknown snapshot.")
+    return str(snapshot), snapshots.load(snapshot)
+
+
+def snapshot_rows(table_diff, labels):
+    """The first SNAPSHOT_DIFF_SHOWN joined, left and moved rows of one table,
+    with names in place of ids."""
+    def name(kind, pk):
+        return labels[kind].get(pk, f"#{pk} (deleted)") if pk else "-"
+
+    def assigned(assignment):
+        return [(field, name(field, pk)) for field, pk in zip(table_diff.fields, assignment)]
+
+    kind = table_diff.kind
+    return {
+        "joined": [(name(kind, pk), assigned(row)) for pk, row in table_diff.joined[:SNAPSHOT_DIFF_SHOWN]],
+        "left": [(name(kind, pk), assigned(row)) for pk, row in table_diff.left[:SNAPSHOT_DIFF_SHOWN]],
+        "moved": [(name(kind, pk), [(field, before, after) for (field, before), (_, after), changed
+                                    in zip(assigned(old), assigned(new), map(ne, old, new)) if changed])
+                  for pk, old, new in table_diff.moved[:SNAPSHOT_DIFF_SHOWN]],
+    }
+
+
+@admin_required
+def snapshot_diff(request):
+    old_label, old = snapshot_state(request.GET.get("from"))
+    new_label, new = snapshot_state(request.GET.get("to", "now"))
+    diffs = snapshots.diff(old, new)
+    if request.GET.get("format") == "json":
+        return JsonResponse({"from": old_label, "to": new_label,
+                             "tables": {kind: table_diff.as_dict() for kind, table_diff in diffs.items()}})
+    labels = snapshots.names(diffs, SNAPSHOT_DIFF_SHOWN)
+    tables = [(kind, table_diff.counts(), snapshot_rows(table_diff, labels))
+              for kind, table_diff in diffs.items()]
+    return render(request, "snapshots/snapshot_diff.html", {
+        "old_label": old_label, "new_label": new_label, "tables": tables, "shown": SNAPSHOT_DIFF_SHOWN})
+
+
+"""history view: This view pages through the audit log of one location, manager,
+team or member, newest change first. Location history is for admins, like the
+location pages."""
+
+HISTORY_MODELS = {"location": Location, "manager": Manager, "team": Team, "member": Member}
+
+HISTORY_PAGE_SIZE = 25
+
+
+@login_required
+def history(request, model, id):
+    if model not in HISTORY_MODELS:
+        raise Http404("Unknown model.")
+    if model == "location" and not has_role(request.user, ADMIN):
+        return redirect("access_denied")
+    model_class = HISTORY_MODELS[model]
+    entries, has_more = audit.history_page(model_class, id, HISTORY_PAGE_SIZE,
+                                           before=parse_cursor(request.GET.get("before")))
+    return render(request, "history/history.html",
+                  {"model": model, "object_id": id,
+                   "current": model_class.objects.filter(pk=id).first(),
+                   "entries": audit.describe(model_class, entries),
+                   "older": entries[-1].id if has_more else None})
+
+
 """login_view and logout_view views: These views handle user authentication and logging out."""
 
 
 def login_view(request):
     if request.method == 'POST':
-        form = AuthenticationForm(data=request.POST)
+        # The form authenticates the credentials; log in the user it found
+        # rather than checking the password a second time.
+        form = AuthenticationForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(request, username=username, password=password)
-            if user is not None:
-                login(request, user)
-                return redirect("welcome")
+            login(request, form.get_user())
+            return redirect("welcome")
     else:
         form = AuthenticationForm()
     return render(request, "login/login.html", {'form': form})
@@ -294,7 +600,7 @@ def logout_view(request):
 
 
 def access_denied(request):
-    return render(request, 'access_denied.html')
+    return render(request, 'login/access_denied.html')
 
 
 def admin_group(request):
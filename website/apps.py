@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class WebsiteConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'website'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from capstone.db import apply_sqlite_pragmas
+        from . import profiling  # noqa: F401
+
+        if settings.SQLITE_PRAGMAS:
+            connection_created.connect(apply_sqlite_pragmas)
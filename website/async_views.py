@@ -0,0 +1,33 @@
+"""Async versions of the website views, routed by capstone.urls_async when the
+project is served through ASGI."""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render
+from planner.cache import cache_response
+from planner.models import Manager, Team, Member, Location
+from planner.pagination import akeyset_page, acached_count
+from . import views
+
+
+async def dashboard_box(request, name, queryset):
+    page_size, after, before = views.box_params(request, name)
+    page = await akeyset_page(queryset.only('id', 'name'), page_size, after=after, before=before)
+    return views.box_context(request, name, page, await acached_count(queryset, name))
+
+
+@cache_response(Location, Manager, Team, Member)
+async def welcome(request):
+    if not settings.DASHBOARD_PAGINATED:
+        return await sync_to_async(views.welcome_page)(request)
+
+    names = [name for name, _ in views.DASHBOARD_BOXES]
+    boxes = dict(zip(names, await asyncio.gather(
+        *(dashboard_box(request, name, queryset()) for name, queryset in views.DASHBOARD_BOXES))))
+    return render(request, "website/welcome.html",
+                  {"team": boxes["team"]["page"],
+                   "manager": boxes["manager"]["page"],
+                   "member": boxes["member"]["page"],
+                   "location": boxes["location"]["page"],
+                   "boxes": boxes})
@@ -0,0 +1,209 @@
+"""Route benchmark harness used by the benchmark_routes command.
+
+Every GET route in the URLconf is exercised, with path parameters filled
+from the first row of the matching model (a route whose model has no rows
+is skipped and reported), either in process through the
+Django test client or over HTTP against a running server with a pool of
+threads. A request counts as an error unless it returns 2xx or 3xx; a run
+with errors is not saved, so it never becomes the baseline the next run is
+compared with. Results are written as JSON so each run can be compared with
+the previous one.
+"""
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from importlib import import_module
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.test import Client, override_settings
+from django.urls import URLPattern, get_resolver
+
+from planner.models import Job, Manager, Member, Team, Location, Snapshot
+from .profiling import percentile
+
+"""Routes that change data or the session on GET, or only accept POST, so are
+never benchmarked."""
+SKIPPED_ROUTES = {'logout', 'admin_group', 'user_group', 'bulk_members_api'}
+
+"""Path parameter -> model whose first id fills it. Plain <id> parameters are
+resolved through ID_MODELS by route name."""
+PARAMETER_MODELS = {
+    'member_id': Member,
+    'manager_id': Manager,
+    'team_id': Team,
+    'location_id': Location,
+}
+
+ID_MODELS = {
+    'manager_detail': Manager,
+    'manager_org_chart': Manager,
+    'member': Member,
+    'team': Team,
+    'location_detail': Location,
+    'api_detail': Member,
+    'job_detail': Job,
+    # With PARAMETER_VALUES['model'] below.
+    'history': Member,
+}
+
+PARAMETER_VALUES = {
+    'model': 'member',
+    'resource': 'members',
+    'kind': 'team',
+}
+
+"""Route name -> (query parameter, model whose first id fills it), for routes
+that need a query string. The route is skipped while the model has no rows."""
+QUERY_MODELS = {
+    'snapshot_diff': ('from', Snapshot),
+}
+
+
+def first_id(model):
+    return model.objects.order_by('pk').values_list('pk', flat=True).first()
+
+
+def benchmark_routes():
+    """Return ([(route name, path)] for every GET route that can be filled
+    in, [names of the routes that cannot])."""
+    routes, skipped = [], []
+    for pattern in get_resolver().url_patterns:
+        if not isinstance(pattern, URLPattern) or pattern.name in SKIPPED_ROUTES:
+            continue
+        name = pattern.name or pattern.lookup_str
+        path = str(pattern.pattern)
+        for parameter in pattern.pattern.converters:
+            if parameter == 'id':
+                model = ID_MODELS.get(pattern.name)
+                value = first_id(model) if model else None
+            elif parameter in PARAMETER_MODELS:
+                value = first_id(PARAMETER_MODELS[parameter])
+            else:
+                value = PARAMETER_VALUES.get(parameter)
+            if value is None:
+                skipped.append(name)
+                break
+            path = path.replace(f"<int:{parameter}>", str(value)).replace(f"<str:{parameter}>", str(value))
+        else:
+            if pattern.name in QUERY_MODELS:
+                parameter, model = QUERY_MODELS[pattern.name]
+                value = first_id(model)
+                if value is None:
+                    skipped.append(name)
+                    continue
+                path = f"{path}?{parameter}={value}"
+            if (name, '/' + path) not in routes:
+                routes.append((name, '/' + path))
+    return routes, skipped
+
+
+def session_cookie(user):
+    """Create a logged-in session for ``user`` and return its cookie value."""
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return session.session_key
+
+
+def summarize(timings, errors, elapsed):
+    ordered = sorted(timings)
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'throughput': len(timings) / elapsed if elapsed else 0.0,
+        'p50': percentile(ordered, 0.50) * 1000,
+        'p95': percentile(ordered, 0.95) * 1000,
+        'p99': percentile(ordered, 0.99) * 1000,
+        'mean': statistics.fmean(ordered) * 1000 if ordered else 0.0,
+    }
+
+
+def failed(status_code):
+    return not 200 <= status_code < 400
+
+
+def run_in_process(user, path, requests, concurrency):
+    """Drive ``path`` through the test client from ``concurrency`` threads.
+    The client sends Host: testserver, so that host is allowed for the run."""
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(count):
+        nonlocal errors
+        client = Client(raise_request_exception=False)
+        if user is not None:
+            client.force_login(user)
+        timings = []
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.get(path)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            timings.append(time.perf_counter() - start)
+            if failed(response.status_code):
+                with lock:
+                    errors += 1
+        return timings
+
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        return _run_workers(worker, requests, concurrency, lambda: errors)
+
+
+def run_over_http(base_url, cookie, path, requests, concurrency):
+    """Drive ``base_url + path`` over HTTP from ``concurrency`` threads."""
+    errors = 0
+    lock = threading.Lock()
+    headers = {'Cookie': f"{settings.SESSION_COOKIE_NAME}={cookie}"} if cookie else {}
+
+    def worker(count):
+        nonlocal errors
+        timings = []
+        for _ in range(count):
+            request = urllib.request.Request(base_url.rstrip('/') + path, headers=headers)
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError):
+                with lock:
+                    errors += 1
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    return _run_workers(worker, requests, concurrency, lambda: errors)
+
+
+def _run_workers(worker, requests, concurrency, errors):
+    counts = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        timings = [t for batch in pool.map(worker, [c for c in counts if c]) for t in batch]
+    return summarize(timings, errors(), time.perf_counter() - start)
+
+
+def save_results(directory, results, meta):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    path = directory / f"routes-{stamp}.json"
+    path.write_text(json.dumps({'meta': meta, 'results': results}, indent=2))
+    return path
+
+
+def previous_results(directory, exclude=None):
+    """Results of the latest earlier run in ``directory``, or None."""
+    runs = sorted(Path(directory).glob("routes-*.json")) if Path(directory).is_dir() else []
+    runs = [run for run in runs if run != exclude]
+    if not runs:
+        return None
+    return json.loads(runs[-1].read_text())['results']
@@ -0,0 +1,97 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from planner import auth
+
+DJANGO_AUTHENTICATION = 'django.contrib.auth.middleware.AuthenticationMiddleware'
+CACHED_AUTHENTICATION = 'planner.auth.CachedAuthenticationMiddleware'
+
+"""(name, SESSION_ENGINE, authentication middleware) compared by the command."""
+PROFILES = [
+    ('database sessions', 'django.contrib.sessions.backends.db', DJANGO_AUTHENTICATION),
+    ('cached_db sessions', 'django.contrib.sessions.backends.cached_db', DJANGO_AUTHENTICATION),
+    ('cached_db + user cache', 'django.contrib.sessions.backends.cached_db', CACHED_AUTHENTICATION),
+    ('signed cookies + user cache', 'django.contrib.sessions.backends.signed_cookies', CACHED_AUTHENTICATION),
+]
+
+SESSION_TABLE = '"django_session"'
+USER_TABLE = 'FROM "auth_user"'
+
+
+def profile_middleware(authentication):
+    return [authentication if middleware in (DJANGO_AUTHENTICATION, CACHED_AUTHENTICATION) else middleware
+            for middleware in settings.MIDDLEWARE]
+
+
+class Command(BaseCommand):
+    help = ("Request one page as a logged-in user under each combination of session engine and "
+            "authentication middleware, and report time and queries per request, split into "
+            "session and user lookups. With --password, also time logging in.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="Existing user to log in as.")
+        parser.add_argument('--password', help="The user's password, to also time the login form.")
+        parser.add_argument('--path', default='/location/',
+                            help="Page to request; the default is a cached page behind a role check, "
+                                 "so nearly all of its cost is authentication.")
+        parser.add_argument('--requests', type=int, default=500)
+
+    def measure(self, client, path, requests):
+        for _ in range(5):
+            client.get(path)
+        timings, queries = [], []
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = client.get(path)
+                timings.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise CommandError(f"{path} returned {response.status_code}.")
+            queries.append([query['sql'] for query in captured.captured_queries])
+        return timings, queries
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"No user named '{options['username']}'.")
+
+        # The test client sends Host: testserver.
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        self.stdout.write(f"{'profile':<30}{'mean ms':>9}{'p50 ms':>9}{'queries':>9}{'session':>9}{'user':>7}")
+        for name, engine, authentication in PROFILES:
+            auth.forget_users(user.pk)
+            with override_settings(SESSION_ENGINE=engine, MIDDLEWARE=profile_middleware(authentication),
+                                   ALLOWED_HOSTS=allowed_hosts):
+                client = Client()
+                client.force_login(user)
+                timings, queries = self.measure(client, options['path'], options['requests'])
+
+            def per_request(test):
+                return sum(1 for request in queries for sql in request if test(sql)) / len(queries)
+            self.stdout.write(
+                f"{name:<30}{statistics.fmean(timings) * 1000:>9.2f}{statistics.median(timings) * 1000:>9.2f}"
+                f"{per_request(lambda sql: True):>9.2f}"
+                f"{per_request(lambda sql: SESSION_TABLE in sql):>9.2f}"
+                f"{per_request(lambda sql: USER_TABLE in sql):>7.2f}")
+
+        if options['password']:
+            client = Client()
+            data = {'username': options['username'], 'password': options['password']}
+            timings = []
+            with override_settings(ALLOWED_HOSTS=allowed_hosts):
+                for _ in range(3):
+                    start = time.perf_counter()
+                    response = client.post(reverse('login'), data)
+                    timings.append(time.perf_counter() - start)
+                    if response.status_code != 302:
+                        raise CommandError("Logging in failed; check the password.")
+                    client.logout()
+            self.stdout.write(f"login: {statistics.median(timings) * 1000:.1f} ms")
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from website import benchmarking
+
+
+class Command(BaseCommand):
+    help = ("Benchmark every GET route in the URLconf, in process or against a running server, "
+            "report throughput and p50/p95/p99 latency per route, save the results and flag "
+            "regressions against the previous run. Fails, without saving, if any request "
+            "returns an error status.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="User to log in as; superusers see every route.")
+        parser.add_argument('--requests', type=int, default=100, help="Requests per route.")
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--url', help="Base URL of a running server to load over HTTP, "
+                                          "e.g. http://127.0.0.1:8000. Defaults to the in-process test client.")
+        parser.add_argument('--route', action='append', help="Only benchmark this route name (repeatable).")
+        parser.add_argument('--output-dir', default=str(settings.BASE_DIR / 'benchmarks'))
+        parser.add_argument('--regression', type=float, default=20.0,
+                            help="Flag routes whose p95 grew by more than this percentage.")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['username']:
+            user = get_user_model().objects.filter(username=options['username']).first()
+            if user is None:
+                raise CommandError(f"No user named '{options['username']}'.")
+        routes, skipped = benchmarking.benchmark_routes()
+        if options['route']:
+            routes = [(name, path) for name, path in routes if name in options['route']]
+            skipped = [name for name in skipped if name in options['route']]
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped (no rows to fill their parameters): {', '.join(skipped)}"))
+        cookie = benchmarking.session_cookie(user) if user is not None and options['url'] else None
+
+        results = {}
+        self.stdout.write(f"{'route':<22}{'path':<30}{'req/s':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'errors':>8}")
+        for name, path in routes:
+            if options['url']:
+                result = benchmarking.run_over_http(options['url'], cookie, path,
+                                                    options['requests'], options['concurrency'])
+            else:
+                result = benchmarking.run_in_process(user, path, options['requests'], options['concurrency'])
+            results[name] = dict(result, path=path)
+            self.stdout.write(f"{name:<22}{path:<30}{result['throughput']:>8.0f}{result['p50']:>8.1f}"
+                              f"{result['p95']:>8.1f}{result['p99']:>8.1f}{result['errors']:>8}")
+
+        failing = [name for name, result in results.items() if result['errors']]
+        if failing:
+            raise CommandError(f"Not saved: {', '.join(failing)} returned error statuses. Fix the routes "
+                               f"(or use --route to leave them out) before recording a baseline.")
+
+        saved = benchmarking.save_results(options['output_dir'], results, {
+            'mode': 'http' if options['url'] else 'in-process',
+            'url': options['url'],
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+        })
+        self.stdout.write(f"Saved {saved}")
+
+        previous = benchmarking.previous_results(options['output_dir'], exclude=saved)
+        if previous is None:
+            return
+        for name, result in results.items():
+            before = previous.get(name)
+            if not before or not before['p95']:
+                continue
+            change = (result['p95'] - before['p95']) / before['p95'] * 100
+            if change > options['regression']:
+                self.stdout.write(self.style.WARNING(
+                    f"{name}: p95 {before['p95']:.1f} ms -> {result['p95']:.1f} ms (+{change:.0f}%)"))
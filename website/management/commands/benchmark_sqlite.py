@@ -0,0 +1,107 @@
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from capstone.db import PRODUCTION_PRAGMAS
+
+READ_SQL = ("SELECT m.id, m.name, t.name, l.name FROM planner_member m "
+            "LEFT JOIN planner_team t ON t.id = m.team_id "
+            "JOIN planner_location l ON l.id = m.location_id WHERE m.id = ?")
+
+WRITE_SQL = "UPDATE planner_member SET name = ? WHERE id = ?"
+
+
+class Command(BaseCommand):
+    help = ("Run concurrent member reads and writes against a copy of the database, first with "
+            "SQLite's defaults and then with the production pragmas (WAL, busy_timeout, ...), "
+            "and compare throughput and 'database is locked' errors.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run.")
+
+    def handle(self, *args, **options):
+        source = connections['default'].settings_dict['NAME']
+        if connections['default'].vendor != 'sqlite' or not Path(str(source)).exists():
+            raise CommandError("The default database must be an SQLite file.")
+        with tempfile.TemporaryDirectory() as directory:
+            copy = Path(directory) / 'benchmark.sqlite3'
+            shutil.copyfile(source, copy)
+            with sqlite3.connect(copy) as connection:
+                ids = [row[0] for row in connection.execute("SELECT id FROM planner_member")]
+            if not ids:
+                raise CommandError("There are no members to read; run generate_org first.")
+
+            self.stdout.write(f"{'profile':<12}{'reads/s':>10}{'writes/s':>10}{'locked errors':>15}"
+                              f"{'read p99 ms':>13}")
+            for name, pragmas in (('default', {}), ('production', PRODUCTION_PRAGMAS)):
+                reads, writes, errors, read_p99 = self.run(copy, ids, pragmas, options)
+                self.stdout.write(f"{name:<12}{reads / options['seconds']:>10.0f}"
+                                  f"{writes / options['seconds']:>10.0f}{errors:>15}{read_p99:>13.2f}")
+
+    @staticmethod
+    def connect(path, pragmas):
+        # The same 5 second timeout Django uses when OPTIONS has none.
+        connection = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        for pragma, value in pragmas.items():
+            connection.execute(f"PRAGMA {pragma} = {value}")
+        return connection
+
+    def run(self, path, ids, pragmas, options):
+        if not pragmas:
+            self.connect(path, {'journal_mode': 'DELETE'}).close()
+        stop = time.perf_counter() + options['seconds']
+        lock = threading.Lock()
+        totals = {'reads': 0, 'writes': 0, 'errors': 0}
+        read_times = []
+
+        def reader():
+            connection = self.connect(path, pragmas)
+            rng, reads, errors, timings = random.Random(), 0, 0, []
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                try:
+                    connection.execute(READ_SQL, [rng.choice(ids)]).fetchall()
+                    reads += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+                timings.append(time.perf_counter() - start)
+            with lock:
+                totals['reads'] += reads
+                totals['errors'] += errors
+                read_times.extend(timings)
+
+        def writer():
+            connection = self.connect(path, pragmas)
+            rng, writes, errors = random.Random(), 0, 0
+            while time.perf_counter() < stop:
+                try:
+                    connection.execute("BEGIN IMMEDIATE")
+                    connection.execute(WRITE_SQL, [f"Member {rng.random():.6f}", rng.choice(ids)])
+                    connection.execute("COMMIT")
+                    writes += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if connection.in_transaction:
+                        connection.execute("ROLLBACK")
+            with lock:
+                totals['writes'] += writes
+                totals['errors'] += errors
+
+        threads = ([threading.Thread(target=reader) for _ in range(options['readers'])] +
+                   [threading.Thread(target=writer) for _ in range(options['writers'])])
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        read_times.sort()
+        read_p99 = read_times[int(0.99 * (len(read_times) - 1))] * 1000 if read_times else 0.0
+        return totals['reads'], totals['writes'], totals['errors'], read_p99
@@ -0,0 +1,119 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+from planner.models import Manager, Member, Team, Location
+
+
+def read_routes():
+    """The pages that have async versions, pointed at real rows."""
+    def first(model):
+        pk = model.objects.order_by('pk').values_list('pk', flat=True).first()
+        if pk is None:
+            raise CommandError(f"Add at least one {model._meta.verbose_name} first (see generate_org).")
+        return pk
+    return [
+        '/',
+        '/manager',
+        '/location/',
+        f'/manager/{first(Manager)}/',
+        f'/member/{first(Member)}/',
+        f'/team/{first(Team)}/',
+        f'/location/{first(Location)}.html',
+    ]
+
+
+def check_status(route, handler, statuses):
+    """Abort if any request to ``route`` did not return 200, so error pages are never timed."""
+    wrong = sorted(status for status in set(statuses) if status != 200)
+    if wrong:
+        raise CommandError(f"{route} returned {', '.join(map(str, wrong))} under {handler}, expected 200.")
+
+
+def summarize(timings, elapsed):
+    timings = sorted(timings)
+    return {
+        'rps': len(timings) / elapsed,
+        'p50': statistics.median(timings) * 1000,
+        'p95': timings[int(0.95 * (len(timings) - 1))] * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = ("Drive the read-only pages through the WSGI handler (sync views, a thread per "
+            "concurrent request) and the ASGI handler (async views on one event loop) in "
+            "this process, and compare throughput and latency.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="Existing superuser or admin to log in as.")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per page and handler.")
+        parser.add_argument('--concurrency', type=int, default=16)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"No user named '{options['username']}'.")
+        routes = read_routes()
+        total, concurrency = options['requests'], options['concurrency']
+
+        self.stdout.write(f"{'page':<22}{'WSGI req/s':>12}{'p50 ms':>9}{'p95 ms':>9}"
+                          f"{'ASGI req/s':>13}{'p50 ms':>9}{'p95 ms':>9}")
+        # The test clients send Host: testserver.
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        for route in routes:
+            with override_settings(ROOT_URLCONF='capstone.urls', ALLOWED_HOSTS=allowed_hosts):
+                wsgi = self.run_wsgi(user, route, total, concurrency)
+            with override_settings(ROOT_URLCONF='capstone.urls_async', ALLOWED_HOSTS=allowed_hosts):
+                asgi = asyncio.run(self.run_asgi(user, route, total, concurrency))
+            self.stdout.write(f"{route:<22}{wsgi['rps']:>12.0f}{wsgi['p50']:>9.1f}{wsgi['p95']:>9.1f}"
+                              f"{asgi['rps']:>13.0f}{asgi['p50']:>9.1f}{asgi['p95']:>9.1f}")
+
+    @staticmethod
+    def url(route, i):
+        # A unique query string keeps the response cache from answering.
+        return f"{route}{'&' if '?' in route else '?'}bench={i}"
+
+    def run_wsgi(self, user, route, total, concurrency):
+        def worker(indices):
+            client = Client()
+            client.force_login(user)
+            timings, statuses = [], []
+            for i in indices:
+                start = time.perf_counter()
+                statuses.append(client.get(self.url(route, i)).status_code)
+                timings.append(time.perf_counter() - start)
+            return timings, statuses
+
+        batches = [range(n, total, concurrency) for n in range(concurrency)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(worker, batches))
+        elapsed = time.perf_counter() - start
+        check_status(route, 'WSGI', [status for _, statuses in results for status in statuses])
+        return summarize([t for timings, _ in results for t in timings], elapsed)
+
+    async def run_asgi(self, user, route, total, concurrency):
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(user)
+        semaphore = asyncio.Semaphore(concurrency)
+        timings, statuses = [], []
+
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(self.url(route, i))
+                timings.append(time.perf_counter() - start)
+                statuses.append(response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+        check_status(route, 'ASGI', statuses)
+        return summarize(timings, elapsed)
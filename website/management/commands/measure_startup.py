@@ -0,0 +1,80 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+"""Run in a fresh interpreter for each sample: time loading the WSGI
+application and serving its first request, then report the process's
+resident memory. Prints one JSON object."""
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from capstone.wsgi import application
+booted = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': 'localhost', 'SERVER_NAME': 'localhost'}
+setup_testing_defaults(environ)
+statuses = []
+body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+b''.join(body)
+served = time.perf_counter()
+rss = 0
+try:
+    with open('/proc/self/status') as status:
+        rss = next(int(line.split()[1]) for line in status if line.startswith('VmRSS:'))
+except OSError:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+import django.apps
+print(json.dumps({'boot': booted - start, 'first_request': served - booted, 'rss_kb': rss,
+                  'status': statuses[0], 'modules': len(sys.modules),
+                  'apps': len(django.apps.apps.get_app_configs())}))
+"""
+
+
+class Command(BaseCommand):
+    help = ("Start fresh worker processes under each settings module and report the median cold "
+            "start (loading the WSGI application), first request time and resident memory. "
+            "Run collectstatic first for settings that use the manifest static storage.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('settings_modules', nargs='*',
+                            default=['capstone.settings', 'capstone.settings_production'])
+        parser.add_argument('--runs', type=int, default=5, help="Processes started per settings module.")
+        parser.add_argument('--path', default='/login/login.html', help="URL of the first request.")
+        parser.add_argument('--preload', action='store_true',
+                            help="Set CAPSTONE_PRELOAD=1 so the production profile warms up at boot.")
+
+    def sample(self, settings_module, options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+        # settings_production needs these; measure against the current database.
+        env.setdefault('CAPSTONE_SECRET_KEY', 'measure-startup')
+        env.setdefault('CAPSTONE_DB_PATH', str(connections['default'].settings_dict['NAME']))
+        if options['preload']:
+            env['CAPSTONE_PRELOAD'] = '1'
+        process = subprocess.run([sys.executable, '-c', CHILD_SCRIPT, options['path']], env=env,
+                                 cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if process.returncode:
+            raise CommandError(f"{settings_module} failed to start:\n{process.stderr}")
+        sample = json.loads(process.stdout.strip().splitlines()[-1])
+        if not sample['status'].startswith('200 '):
+            raise CommandError(f"{options['path']} returned {sample['status']} under {settings_module}, "
+                               f"expected 200.")
+        return sample
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'settings':<32}{'boot ms':>9}{'first request ms':>18}{'RSS MB':>8}"
+                          f"{'modules':>9}{'apps':>6}")
+        for settings_module in options['settings_modules']:
+            samples = [self.sample(settings_module, options) for _ in range(options['runs'])]
+
+            def median(key):
+                return statistics.median(sample[key] for sample in samples)
+            self.stdout.write(f"{settings_module:<32}{median('boot') * 1000:>9.1f}"
+                              f"{median('first_request') * 1000:>18.1f}{median('rss_kb') / 1024:>8.1f}"
+                              f"{median('modules'):>9.0f}{median('apps'):>6.0f}")
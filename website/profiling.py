@@ -0,0 +1,180 @@
+"""Request profiling: wall time, query count, SQL time and duplicate queries
+per resolved URL name.
+
+RequestProfilingMiddleware hands each request a QueryRecorder through a
+context variable. Every database connection gets an execute wrapper (so this
+works with DEBUG off) that reports to the current request's recorder; the
+context variable follows the request into the worker threads that async
+views run their queries in. The middleware adds a Server-Timing header to the response and hands the measurements to
+the process-wide ProfileStore. The store keeps running totals and the last
+PROFILING_WINDOW samples per view, from which the report computes
+percentiles. Recording a request costs a few dictionary updates, so the
+middleware can stay on in production.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+class QueryRecorder:
+    """Execute wrapper counting queries, their time, and repeats of the same
+    statement with the same parameters."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.seen = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.seen[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        return sum(times - 1 for times in self.seen.values() if times > 1)
+
+
+class ViewProfile:
+    def __init__(self, window):
+        self.requests = 0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.duplicates = 0
+        self.wall_times = deque(maxlen=window)
+        self.query_counts = deque(maxlen=window)
+
+    def add(self, wall_time, recorder):
+        self.requests += 1
+        self.queries += recorder.count
+        self.sql_time += recorder.duration
+        self.duplicates += recorder.duplicates
+        self.wall_times.append(wall_time)
+        self.query_counts.append(recorder.count)
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class ProfileStore:
+    def __init__(self, window):
+        self.window = window
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def add(self, name, wall_time, recorder):
+        with self.lock:
+            profile = self.views.get(name)
+            if profile is None:
+                profile = self.views[name] = ViewProfile(self.window)
+            profile.add(wall_time, recorder)
+
+    def report(self):
+        """One dict per view, slowest p95 first. Times are in milliseconds."""
+        with self.lock:
+            snapshot = [(name, profile.requests, profile.queries, profile.sql_time, profile.duplicates,
+                         sorted(profile.wall_times), max(profile.query_counts, default=0))
+                        for name, profile in self.views.items()]
+        rows = []
+        for name, requests, queries, sql_time, duplicates, wall_times, max_queries in snapshot:
+            rows.append({
+                "view": name,
+                "requests": requests,
+                "p50": percentile(wall_times, 0.50) * 1000,
+                "p95": percentile(wall_times, 0.95) * 1000,
+                "p99": percentile(wall_times, 0.99) * 1000,
+                "queries_per_request": queries / requests,
+                "max_queries": max_queries,
+                "sql_ms_per_request": sql_time / requests * 1000,
+                "duplicates_per_request": duplicates / requests,
+            })
+        rows.sort(key=lambda row: row["p95"], reverse=True)
+        return rows
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+store = ProfileStore(getattr(settings, 'PROFILING_WINDOW', 1000))
+
+
+def record_queries(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection."""
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(sender=None, connection=None, **kwargs):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+# Connected at import, which WebsiteConfig.ready() triggers before any
+# request can open a connection.
+connection_created.connect(install_recorder)
+
+
+class RequestProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        for connection in connections.all():
+            install_recorder(connection=connection)
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function so Django awaits it.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.finish(request, response, recorder, time.perf_counter() - start)
+
+    @staticmethod
+    def finish(request, response, recorder, wall_time):
+        match = request.resolver_match
+        store.add(match.view_name if match else "<unresolved>", wall_time, recorder)
+        response["Server-Timing"] = (f'total;dur={wall_time * 1000:.1f}, '
+                                     f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"')
+        return response
@@ -0,0 +1,99 @@
+// Search-as-you-type for the <select data-lookup="..."> pickers rendered by
+// planner.lookups. The page only carries the chosen options; typing in the
+// search box (or focusing the list) fetches matching rows from the lookup
+// view a page at a time, and "More" appends the next page.
+(function () {
+    'use strict';
+
+    function setUp(select) {
+        var search = document.createElement('input');
+        search.type = 'search';
+        search.placeholder = 'Type to search';
+        search.setAttribute('aria-label', 'Search ' + (select.name || ''));
+        var more = document.createElement('button');
+        more.type = 'button';
+        more.textContent = 'More';
+        more.hidden = true;
+        select.parentNode.insertBefore(search, select);
+        select.parentNode.insertBefore(more, select.nextSibling);
+
+        var nextUrl = null;
+        var latest = 0;
+        var loaded = false;
+        var timer = null;
+
+        function keep(option) {
+            return option.selected || option.value === '';
+        }
+
+        function show(data, append) {
+            if (!append) {
+                Array.prototype.slice.call(select.options).forEach(function (option) {
+                    if (!keep(option)) {
+                        select.removeChild(option);
+                    }
+                });
+            }
+            var present = {};
+            Array.prototype.forEach.call(select.options, function (option) {
+                present[option.value] = true;
+            });
+            data.results.forEach(function (row) {
+                if (!present[String(row.id)]) {
+                    select.appendChild(new Option(row.name, row.id));
+                }
+            });
+            nextUrl = data.next;
+            more.hidden = !nextUrl;
+        }
+
+        function load(url, append) {
+            var request = ++latest;
+            fetch(url, {credentials: 'same-origin', headers: {'Accept': 'application/json'}})
+                .then(function (response) { return response.ok ? response.json() : null; })
+                .then(function (data) {
+                    if (data && request === latest) {
+                        show(data, append);
+                    }
+                });
+        }
+
+        function find() {
+            loaded = true;
+            load(select.dataset.lookup + '?q=' + encodeURIComponent(search.value.trim()), false);
+        }
+
+        search.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(find, 250);
+        });
+        search.addEventListener('keydown', function (event) {
+            // Enter searches at once rather than submitting the form.
+            if (event.key === 'Enter') {
+                event.preventDefault();
+                clearTimeout(timer);
+                find();
+            }
+        });
+        select.addEventListener('focus', function () {
+            if (!loaded) {
+                find();
+            }
+        });
+        more.addEventListener('click', function () {
+            if (nextUrl) {
+                load(nextUrl, true);
+            }
+        });
+    }
+
+    function setUpAll() {
+        Array.prototype.forEach.call(document.querySelectorAll('select[data-lookup]'), setUp);
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', setUpAll);
+    } else {
+        setUpAll();
+    }
+}());
@@ -0,0 +1,262 @@
+"""Production static files: hashed names, pre-built variants, and serving
+from the application with far-future cache headers.
+
+PipelineStaticFilesStorage (STATICFILES_STORAGE in capstone.settings_production)
+extends ManifestStaticFilesStorage. collectstatic writes every file under a
+content-hashed name, with CSS url()s rewritten to match, and then adds:
+
+- gzip and, if the brotli package is installed, brotli copies of text files
+  (``style.<hash>.css.gz``, ``.br``);
+- if Pillow is installed, copies of large images resized to each of
+  settings.STATIC_IMAGE_WIDTHS that is narrower than the original
+  (``background.640w.<hash>.jpg``). These are recorded in the manifest, so
+  ``{% static 'website/background.640w.jpg' %}`` and image_variants() find them;
+- again with Pillow, WebP (and AVIF, where Pillow supports it) copies of
+  every image and resized image (``background.<hash>.jpg.webp``).
+
+A copy is only kept if it is smaller than the file it stands in for.
+
+StaticFilesMiddleware serves STATIC_ROOT when settings.SERVE_STATIC is on, so
+no separate web server is needed. It indexes the directory once at startup;
+a request is then a dictionary lookup. It picks the smallest variant that
+the Accept-Encoding or Accept header allows, and marks hashed files
+immutable for a year.
+"""
+import asyncio
+import gzip
+import mimetypes
+import os
+from io import BytesIO
+from pathlib import Path, PurePosixPath
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.xml', '.html', '.map'}
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+"""Content-Encoding -> suffix of the pre-compressed copy, best first."""
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+"""Image media type -> suffix of the converted copy, best first."""
+IMAGE_FORMATS = [('image/avif', '.avif'), ('image/webp', '.webp')]
+
+"""Cache-Control for files whose name contains their content hash."""
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def resized_name(name, width):
+    path = PurePosixPath(name)
+    return str(path.with_name(f"{path.stem}.{width}w{path.suffix}"))
+
+
+# brotli and Pillow are optional, and only collectstatic needs them: they are
+# imported there rather than in every worker.
+
+def import_brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def import_pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def image_formats():
+    """Pillow format names this installation can write, as (media type, suffix, format)."""
+    from PIL import features
+    return [(media_type, suffix, suffix[1:].upper()) for media_type, suffix in IMAGE_FORMATS
+            if features.check(suffix[1:])]
+
+
+class PipelineStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        pillow = import_pillow()
+        for name, hashed_name in list(self.hashed_files.items()):
+            extension = PurePosixPath(name).suffix.lower()
+            if extension in COMPRESSIBLE_EXTENSIONS:
+                for variant in self.compress(hashed_name):
+                    yield name, variant, True
+            elif extension in IMAGE_EXTENSIONS and pillow is not None:
+                for variant in self.image_variants_of(pillow, name, hashed_name):
+                    yield name, variant, True
+        # Record the resized images added above.
+        self.save_manifest()
+
+    def save_variant(self, name, data, replaces):
+        """Store ``data`` as ``name`` if smaller than ``replaces`` bytes."""
+        if len(data) >= replaces:
+            return False
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(data))
+        return True
+
+    def compress(self, hashed_name):
+        with self.open(hashed_name) as original:
+            data = original.read()
+        compressors = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+        brotli = import_brotli()
+        if brotli is not None:
+            compressors.insert(0, ('.br', lambda data: brotli.compress(data, quality=11)))
+        for suffix, compress in compressors:
+            if self.save_variant(hashed_name + suffix, compress(data), len(data)):
+                yield hashed_name + suffix
+
+    def image_variants_of(self, pillow, name, hashed_name):
+        with self.open(hashed_name) as original:
+            data = original.read()
+        image = pillow.open(BytesIO(data))
+        image.load()
+        sizes = [(hashed_name, image, len(data))]
+        for width in settings.STATIC_IMAGE_WIDTHS:
+            if width >= image.width:
+                continue
+            resized = image.resize((width, round(image.height * width / image.width)), pillow.LANCZOS)
+            content = self.encode(resized, image.format)
+            resized_hashed = self.hashed_name(resized_name(name, width), ContentFile(content))
+            if self.save_variant(resized_hashed, content, len(data)):
+                self.hashed_files[self.hash_key(resized_name(name, width))] = resized_hashed
+                sizes.append((resized_hashed, resized, len(content)))
+                yield resized_hashed
+        for sized_name, sized_image, size in sizes:
+            for _, suffix, image_format in image_formats():
+                if self.save_variant(sized_name + suffix, self.encode(sized_image, image_format), size):
+                    yield sized_name + suffix
+
+    @staticmethod
+    def encode(image, image_format):
+        buffer = BytesIO()
+        if image_format == 'JPEG':
+            image.convert('RGB').save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+        elif image_format == 'WEBP':
+            image.save(buffer, 'WEBP', quality=75, method=6)
+        elif image_format == 'AVIF':
+            image.save(buffer, 'AVIF', quality=50)
+        else:
+            image.save(buffer, image_format, optimize=True)
+        return buffer.getvalue()
+
+    def image_variants(self, name):
+        """[(width, name)] of the resized copies of image ``name``, narrowest first."""
+        return [(width, resized_name(name, width)) for width in settings.STATIC_IMAGE_WIDTHS
+                if self.hash_key(resized_name(name, width)) in self.hashed_files]
+
+
+def image_variants(name):
+    """Resized copies of a static image, or [] where there are none (e.g. in
+    development, where files are served as they are)."""
+    if not isinstance(staticfiles_storage, PipelineStaticFilesStorage):
+        return []
+    return staticfiles_storage.image_variants(name)
+
+
+class StaticFile:
+    """One file under STATIC_ROOT and the headers it is served with."""
+
+    def __init__(self, path, stat):
+        self.path = path
+        self.size = stat.st_size
+        self.etag = quote_etag(f"{int(stat.st_mtime):x}-{stat.st_size:x}")
+
+
+class StaticFilesMiddleware:
+    """Serve STATIC_URL from STATIC_ROOT ahead of the rest of the stack."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVE_STATIC or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.files = self.scan(Path(settings.STATIC_ROOT))
+        hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+        self.immutable = set(hashed_files.values())
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function so Django awaits it.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    @staticmethod
+    def scan(root):
+        files = {}
+        for directory, _, names in os.walk(root):
+            for filename in names:
+                path = Path(directory) / filename
+                files[path.relative_to(root).as_posix()] = StaticFile(path, path.stat())
+        return files
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        response = self.serve(request)
+        if response is not None:
+            return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        response = self.serve(request)
+        if response is not None:
+            return response
+        return await self.get_response(request)
+
+    def choose(self, request, name):
+        """The StaticFile to send for ``name``, its content type, and the headers
+        that depend on the choice: the smallest copy the request accepts."""
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        extension = PurePosixPath(name).suffix.lower()
+        candidates = [(self.files[name], content_type, {})]
+        if extension in COMPRESSIBLE_EXTENSIONS:
+            vary = 'Accept-Encoding'
+            accepted = request.headers.get('Accept-Encoding', '')
+            candidates += [(self.files[name + suffix], content_type, {'Content-Encoding': encoding})
+                           for encoding, suffix in ENCODINGS
+                           if encoding in accepted and name + suffix in self.files]
+        elif extension in IMAGE_EXTENSIONS and any(name + suffix in self.files for _, suffix in IMAGE_FORMATS):
+            vary = 'Accept'
+            accepted = request.headers.get('Accept', '')
+            candidates += [(self.files[name + suffix], media_type, {})
+                           for media_type, suffix in IMAGE_FORMATS
+                           if media_type in accepted and name + suffix in self.files]
+        else:
+            return candidates[0]
+        static_file, content_type, headers = min(candidates, key=lambda candidate: candidate[0].size)
+        return static_file, content_type, dict(headers, Vary=vary)
+
+    def serve(self, request):
+        if not request.path_info.startswith(self.prefix):
+            return None
+        name = request.path_info[len(self.prefix):]
+        if name not in self.files:
+            return None
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponse(status=405, headers={'Allow': 'GET, HEAD'})
+        static_file, content_type, headers = self.choose(request, name)
+        headers['ETag'] = static_file.etag
+        headers['Cache-Control'] = IMMUTABLE if name in self.immutable else 'public, max-age=60'
+        headers['X-Content-Type-Options'] = 'nosniff'
+        if static_file.etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return HttpResponseNotModified(headers=headers)
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type, headers=headers)
+        else:
+            response = FileResponse(open(static_file.path, 'rb'), content_type=content_type, headers=headers)
+            response.headers.pop('Content-Disposition', None)
+        response['Content-Length'] = static_file.size
+        return response
@@ -0,0 +1,18 @@
+from django import template
+from django.templatetags.static import static
+
+from website import staticfiles
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_variants(name):
+    """Resized copies of static image ``name`` as [{'width': ..., 'url': ...}],
+    widest first, so that in CSS the narrowest matching max-width rule wins.
+    Empty when the storage does not build them.
+
+        {% image_variants 'website/background.jpg' as backgrounds %}
+    """
+    variants = staticfiles.image_variants(name)
+    return [{'width': width, 'url': static(variant)} for width, variant in reversed(variants)]
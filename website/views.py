@@ -1,15 +1,78 @@
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.conf import settings
 from datetime import datetime
 from planner.models import Manager, Team, Member, Location
+from planner.pagination import keyset_page, parse_cursor, clamp_page_size, cached_count
+from planner.cache import cache_response
+from planner.roles import staff_required
+from .profiling import store
 
 
+"""Dashboard boxes shown on the welcome page, as (name, queryset) pairs.
+The name prefixes the box's query string parameters, e.g. member_after."""
+DASHBOARD_BOXES = [
+    ('member', Member.objects.all),
+    ('team', Team.objects.all),
+    ('manager', Manager.objects.all),
+    ('location', Location.objects.all),
+]
+
+
+def box_params(request, name):
+    """Return (page_size, after, before) for one box from the query string."""
+    page_size = clamp_page_size(request.GET.get(f"{name}_size"),
+                                settings.DASHBOARD_PAGE_SIZES[name])
+    return (page_size,
+            parse_cursor(request.GET.get(f"{name}_after")),
+            parse_cursor(request.GET.get(f"{name}_before")))
+
+
+def box_context(request, name, page, total):
+    """Template context for one box, keeping the other boxes' cursors in its links."""
+    def link(cursor_param, cursor):
+        params = request.GET.copy()
+        params.pop(f"{name}_after", None)
+        params.pop(f"{name}_before", None)
+        params[cursor_param] = cursor
+        return "?" + params.urlencode()
+
+    return {
+        "page": page,
+        "total": total,
+        "next_url": link(f"{name}_after", page.next_cursor) if page.has_next else None,
+        "previous_url": link(f"{name}_before", page.previous_cursor) if page.has_previous else None,
+    }
+
+
+def dashboard_box(request, name, queryset):
+    page_size, after, before = box_params(request, name)
+    page = keyset_page(queryset.only('id', 'name'), page_size, after=after, before=before)
+    return box_context(request, name, page, cached_count(queryset, name))
+
+
+@cache_response(Location, Manager, Team, Member)
 def welcome(request):
+    return welcome_page(request)
+
+
+def welcome_page(request):
+    """The welcome page, rendered without the page cache that welcome() and
+    the async view add."""
+    if not settings.DASHBOARD_PAGINATED:
+        return render(request, "website/welcome.html",
+                      {"team": Team.objects.all(),
+                       "manager": Manager.objects.all(),
+                       "member": Member.objects.all(),
+                       "location": Location.objects.all()})
+
+    boxes = {name: dashboard_box(request, name, queryset()) for name, queryset in DASHBOARD_BOXES}
     return render(request, "website/welcome.html",
-                  {"team": Team.objects.all(),
-                   "manager": Manager.objects.all(),
-                   "member": Member.objects.all(),
-                   "location": Location.objects.all()})
+                  {"team": boxes["team"]["page"],
+                   "manager": boxes["manager"]["page"],
+                   "member": boxes["member"]["page"],
+                   "location": boxes["location"]["page"],
+                   "boxes": boxes})
 
 
 def date(request):
@@ -18,3 +81,13 @@ def date(request):
 
 def about(request):
     return HttpResponse("Iain Watson Capstone Project.")
+
+
+@staff_required
+def profiling_report(request):
+    if request.method == "POST":
+        store.reset()
+    rows = store.report()
+    if request.GET.get("format") == "json":
+        return JsonResponse({"views": rows})
+    return render(request, "website/profiling_report.html", {"rows": rows})